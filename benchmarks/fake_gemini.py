@@ -0,0 +1,300 @@
+"""
+Fake Gemini Backends
+
+Local stand-ins for the Gemini API used by the benchmarks, so performance can
+be measured without spending API quota:
+
+- :class:`FakeGeminiServer` speaks the ``generateContent`` and
+  ``streamGenerateContent`` REST endpoints over HTTP. Point the formatting
+  server (``GEMINI_BASE_URL``) or the client (``gemini.api_endpoint`` with
+  ``transport: rest``) at it.
+- :func:`scripted_model` builds an in-process ``GenerativeModel`` that
+  returns the same scripted responses without any network stack, for the
+  client's async chat path.
+
+Both follow a :class:`GeminiScript`: a list of steps, each either a batch of
+function calls or a text answer, plus a simulated latency per response.
+"""
+
+import asyncio
+import functools
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+_GENERATE_PATH = re.compile(r"/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)")
+
+
+@dataclass
+class GeminiScript:
+    """
+    Scripted model behaviour for one user turn.
+
+    Each step answers one request of the turn: the first request gets
+    ``steps[0]``, the request carrying its function responses gets
+    ``steps[1]`` and so on. Requests beyond the script get the last step.
+    """
+
+    steps: list[dict[str, Any]] = field(default_factory=lambda: [{"text": "OK"}])
+    latency: float = 0.05
+    jitter: float = 0.0
+    seconds_per_output_token: float = 0.0
+
+    @classmethod
+    def from_file(cls, path: str) -> "GeminiScript":
+        """Load a script from a JSON file with ``steps`` and timing keys."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            steps=data.get("steps") or [{"text": "OK"}],
+            latency=data.get("latency", 0.05),
+            jitter=data.get("jitter", 0.0),
+            seconds_per_output_token=data.get("seconds_per_output_token", 0.0),
+        )
+
+    def step_for(self, contents: list[dict[str, Any]]) -> dict[str, Any]:
+        """Pick the step answering a request, given its contents as dicts."""
+        model_turns = 0
+        for content in reversed(contents):
+            parts = content.get("parts") or []
+            is_function_response = any(
+                "function_response" in part or "functionResponse" in part for part in parts
+            )
+            if content.get("role") == "user" and not is_function_response:
+                break
+            if content.get("role") == "model":
+                model_turns += 1
+        return self.steps[min(model_turns, len(self.steps) - 1)]
+
+    def delay_for(self, step: dict[str, Any]) -> float:
+        """Simulated latency of a response."""
+        output_tokens = len(step.get("text", "")) // 4
+        jitter = random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, self.latency + jitter + output_tokens * self.seconds_per_output_token)
+
+    def response_json(self, step: dict[str, Any], prompt_chars: int) -> dict[str, Any]:
+        """REST ``GenerateContentResponse`` body for a step."""
+        if step.get("function_calls"):
+            parts = [
+                {"functionCall": {"name": call["name"], "args": call.get("args", {})}}
+                for call in step["function_calls"]
+            ]
+        else:
+            parts = [{"text": step.get("text", "")}]
+
+        output_tokens = max(1, len(json.dumps(parts)) // 4)
+        prompt_tokens = max(1, prompt_chars // 4)
+        return {
+            "candidates": [{
+                "content": {"role": "model", "parts": parts},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": output_tokens,
+                "totalTokenCount": prompt_tokens + output_tokens,
+            },
+        }
+
+
+def _chunk_text(text: str, chunks: int) -> list[str]:
+    size = max(1, -(-len(text) // chunks))
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_FakeHTTPServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, body: dict[str, Any]) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        # Model lookups, e.g. the formatting server's warm-up
+        match = re.search(r"/models/([^/:?]+)", self.path)
+        if match:
+            self._send_json(200, {"name": f"models/{match.group(1)}"})
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b"{}"
+        match = _GENERATE_PATH.search(self.path)
+        if not match:
+            # Cached contents, file uploads and the like are not emulated;
+            # callers fall back to plain requests.
+            self._send_json(400, {"error": {"code": 400, "message": "Not supported by the fake", "status": "INVALID_ARGUMENT"}})
+            return
+
+        request = json.loads(raw or b"{}")
+        script = self.server.script
+        step = script.step_for(request.get("contents") or [])
+        self.server.record_request()
+        time.sleep(script.delay_for(step))
+        body = script.response_json(step, len(raw))
+
+        if match.group("method") == "generateContent":
+            self._send_json(200, body)
+            return
+
+        # Server-sent events, with text split over a few chunks
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        parts = body["candidates"][0]["content"]["parts"]
+        if "text" in parts[0]:
+            pieces = _chunk_text(parts[0]["text"], self.server.stream_chunks)
+        else:
+            pieces = [None]
+        for index, piece in enumerate(pieces):
+            chunk = json.loads(json.dumps(body))
+            if piece is not None:
+                chunk["candidates"][0]["content"]["parts"] = [{"text": piece}]
+            if index < len(pieces) - 1:
+                chunk.pop("usageMetadata")
+                chunk["candidates"][0].pop("finishReason")
+            self.wfile.write(b"data: " + json.dumps(chunk).encode("utf-8") + b"\r\n\r\n")
+            self.wfile.flush()
+        self.close_connection = True
+
+
+class _FakeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], script: GeminiScript, stream_chunks: int):
+        super().__init__(address, _Handler)
+        self.script = script
+        self.stream_chunks = stream_chunks
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+
+class FakeGeminiServer:
+    """
+    Threaded HTTP server emulating the Gemini REST API.
+
+    Use as a context manager; :attr:`base_url` is the value for
+    ``GEMINI_BASE_URL`` and :attr:`endpoint` for ``gemini.api_endpoint``.
+    """
+
+    def __init__(
+        self,
+        script: Optional[GeminiScript] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        stream_chunks: int = 4,
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            script: Responses to serve.
+            host: Interface to bind.
+            port: Port to bind; 0 picks a free one.
+            stream_chunks: Number of chunks a streamed text answer is split into.
+        """
+        self._httpd = _FakeHTTPServer((host, port), script or GeminiScript(), stream_chunks)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.endpoint}"
+
+    @property
+    def requests(self) -> int:
+        """Number of generate requests served."""
+        return self._httpd.requests
+
+    def start(self) -> "FakeGeminiServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-gemini", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeGeminiServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def scripted_model(script: GeminiScript, model_name: str = "models/fake-gemini", **kwargs: Any) -> Any:
+    """
+    Create an in-process model that answers from a script.
+
+    Args:
+        script: Responses to serve.
+        model_name: Model name reported by the model.
+        **kwargs: Extra ``GenerativeModel`` arguments, e.g. ``generation_config``.
+
+    Returns:
+        A ``ScriptedGenerativeModel``.
+    """
+    return _scripted_model_class()(script, model_name, **kwargs)
+
+
+@functools.lru_cache(maxsize=None)
+def _scripted_model_class() -> type:
+    # The SDK is only imported when the in-process model is actually used
+    import google.generativeai as genai
+    from google.generativeai.types import generation_types
+
+    class ScriptedGenerativeModel(genai.GenerativeModel):
+        """``GenerativeModel`` whose async generation is served from a script."""
+
+        def __init__(self, script: GeminiScript, model_name: str = "models/fake-gemini", **kwargs: Any):
+            super().__init__(model_name, **kwargs)
+            self.script = script
+            self.requests = 0
+
+        async def generate_content_async(self, contents: Any, *, stream: bool = False, **kwargs: Any) -> Any:
+            history = [
+                type(content).to_dict(content) if isinstance(content, genai.protos.Content) else content
+                for content in (contents if isinstance(contents, list) else [contents])
+            ]
+            step = self.script.step_for(history)
+            self.requests += 1
+            await asyncio.sleep(self.script.delay_for(step))
+
+            body = self.script.response_json(step, len(json.dumps(history, default=str)))
+            response = genai.protos.GenerateContentResponse.from_json(json.dumps(body), ignore_unknown_fields=True)
+            if not stream:
+                return generation_types.AsyncGenerateContentResponse.from_response(response)
+
+            async def chunks():
+                yield response
+
+            return await generation_types.AsyncGenerateContentResponse.from_aiterator(chunks())
+
+    return ScriptedGenerativeModel
+
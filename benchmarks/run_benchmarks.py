@@ -0,0 +1,387 @@
+"""
+Benchmark runner
+
+Measures throughput, latency percentiles and peak memory of the report
+pipeline at several concurrency levels, against local stand-ins instead of the
+real Gemini API and real tool servers:
+
+- ``client``: ``MCPClient.process_message`` (or ``stream_message`` with
+  ``--stream``) with a scripted Gemini and the stub stdio MCP server
+- ``format_report``: the formatting server's ``format_report`` tool against
+  the fake Gemini REST server
+- ``html_to_pdf``: PDF rendering on the shared browser pool
+
+Run from the repository root, e.g.::
+
+    python -m benchmarks.run_benchmarks client --concurrency 1,4,16 --requests 64
+    python -m benchmarks.run_benchmarks format_report --mode sections --gemini-latency-ms 800
+    python -m benchmarks.run_benchmarks html_to_pdf --output pdf.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+import yaml
+
+from benchmarks.fake_gemini import FakeGeminiServer, GeminiScript, scripted_model
+from src.backend.tracing import InMemoryExporter, tracer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+FORMATTING_DIR = REPO_ROOT / "src" / "backend" / "mcp_servers" / "mcp_formatting"
+STUB_SERVER = Path(__file__).resolve().parent / "stub_mcp_server.py"
+
+TICKERS = ("AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "JPM")
+
+Request = Callable[[int], Awaitable[Any]]
+
+
+@dataclass
+class LevelResult:
+    """Measurements for one scenario at one concurrency level."""
+
+    scenario: str
+    concurrency: int
+    requests: int
+    errors: int
+    wall_seconds: float
+    throughput: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    peak_traced_mb: Optional[float]
+    max_rss_mb: Optional[float]
+    stages: dict[str, dict[str, float]] = field(default_factory=dict)
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def max_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def stage_summary(exporter: InMemoryExporter) -> dict[str, dict[str, float]]:
+    """Per-stage span counts and latency percentiles in milliseconds."""
+    names = sorted({span.name for span in exporter.spans})
+    summary = {}
+    for name in names:
+        durations = sorted(exporter.durations(name))
+        summary[name] = {
+            "count": len(durations),
+            "p50_ms": percentile(durations, 0.50) * 1000,
+            "p95_ms": percentile(durations, 0.95) * 1000,
+        }
+    return summary
+
+
+async def run_level(
+    scenario: str,
+    request: Request,
+    concurrency: int,
+    requests: int,
+    warmup: int,
+    exporter: InMemoryExporter,
+) -> LevelResult:
+    """
+    Issue ``requests`` calls with at most ``concurrency`` in flight.
+
+    Args:
+        scenario: Scenario name for the report.
+        request: Coroutine function issuing request number ``i``.
+        concurrency: Maximum number of requests in flight.
+        requests: Number of measured requests.
+        warmup: Unmeasured requests issued first.
+        exporter: Span buffer, used for the per-stage breakdown.
+
+    Returns:
+        The measurements.
+    """
+    for i in range(warmup):
+        await request(-1 - i)
+
+    exporter.clear()
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await request(i)
+            except Exception as e:
+                errors += 1
+                if errors <= 3:
+                    print(f"  request {i} failed: {e!r}", file=sys.stderr)
+                return
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if tracemalloc.is_tracing() else None
+    return LevelResult(
+        scenario=scenario,
+        concurrency=concurrency,
+        requests=requests,
+        errors=errors,
+        wall_seconds=wall,
+        throughput=len(latencies) / wall if wall else 0.0,
+        mean_ms=statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        p50_ms=percentile(latencies, 0.50) * 1000,
+        p95_ms=percentile(latencies, 0.95) * 1000,
+        p99_ms=percentile(latencies, 0.99) * 1000,
+        peak_traced_mb=peak,
+        max_rss_mb=max_rss_mb(),
+        stages=stage_summary(exporter),
+    )
+
+
+def build_script(args: argparse.Namespace, default_steps: list[dict[str, Any]]) -> GeminiScript:
+    """The Gemini script from ``--script``, or the scenario default."""
+    if args.script:
+        return GeminiScript.from_file(args.script)
+    return GeminiScript(
+        steps=default_steps,
+        latency=args.gemini_latency_ms / 1000,
+        jitter=args.gemini_jitter_ms / 1000,
+    )
+
+
+@asynccontextmanager
+async def client_target(args: argparse.Namespace) -> AsyncIterator[Request]:
+    """MCPClient with the stub tool server and a fake Gemini."""
+    from src.backend.mcp_client import MCPClient
+
+    script = build_script(args, [
+        {"function_calls": [
+            {"name": "get_price", "args": {"ticker": "AAPL"}},
+            {"name": "get_fundamentals", "args": {"ticker": "AAPL"}},
+        ]},
+        {"text": "AAPL trades near its highs with a moderate valuation. " * 8},
+    ])
+    fake_server = FakeGeminiServer(script).start() if args.gemini == "http" else None
+
+    gemini_cfg: dict[str, Any] = {"api_key": "benchmark", "model": "gemini-1.5-pro"}
+    if fake_server:
+        gemini_cfg.update(api_endpoint=fake_server.endpoint, transport="rest")
+    config = {
+        "gemini": gemini_cfg,
+        "client": {"max_concurrent_tool_calls": 64, "max_concurrent_calls_per_server": 64},
+        "mcp_servers": [{
+            "name": "stub",
+            "command": sys.executable,
+            "args": [str(STUB_SERVER)],
+            "env": {
+                "STUB_LATENCY_MS": str(args.tool_latency_ms),
+                "STUB_CPU_MS": str(args.tool_cpu_ms),
+            },
+        }],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = Path(tmp) / "config.yml"
+        config_path.write_text(yaml.safe_dump(config))
+
+        client = MCPClient(str(config_path))
+        client.load_config()
+        await client.connect_all_servers()
+        await client.discover_tools()
+        client._initialize_gemini()
+        if not fake_server:
+            client._model = scripted_model(script, generation_config=client._model._generation_config)
+
+        async def request(i: int) -> Any:
+            message = f"How is {TICKERS[i % len(TICKERS)]} doing today?"
+            if not args.stream:
+                return await client.process_message(message)
+            return [event async for event in client.stream_message(message)]
+
+        try:
+            yield request
+        finally:
+            await client.close()
+            if fake_server:
+                fake_server.stop()
+
+
+def _import_formatting_modules(base_url: str, report_cache: bool) -> Any:
+    """Import the formatting server configured for the fake Gemini."""
+    sys.path.insert(0, str(FORMATTING_DIR))
+    import config as formatting_config
+
+    formatting_config.GOOGLE_API_KEY = "benchmark"
+    formatting_config.GEMINI_BASE_URL = base_url
+    formatting_config.GEMINI_WARMUP = False
+    formatting_config.CACHE_ENABLED = report_cache
+    formatting_config.CACHE_DIR = ""
+
+    import server as formatting_server
+    return formatting_server
+
+
+def sample_blocks(i: int) -> list[str]:
+    """Report text for request ``i``; varied so the report cache does not hide generation cost."""
+    ticker = TICKERS[i % len(TICKERS)]
+    return [
+        f"{ticker} Quarterly Review (NASDAQ: {ticker})\nRequest {i}: shares gained on strong services revenue.",
+        "Key Metrics\nRevenue | Growth | Margin\n$94.9B | +6.1% | 46.2%\n$85.8B | +4.9% | 45.9%",
+        "Risks\nSupply chain concentration and regulatory scrutiny remain the main headwinds.",
+        "Executive Summary\nFundamentals stay solid; valuation leaves limited room for error.",
+    ]
+
+
+@asynccontextmanager
+async def format_report_target(args: argparse.Namespace) -> AsyncIterator[Request]:
+    """The formatting server's format_report tool against the fake Gemini."""
+    html = "<!DOCTYPE html><html><body>" + "<section><h2>Section</h2><p>Body text.</p></section>" * 40 + "</body></html>"
+    script = build_script(args, [{"text": html}])
+
+    with FakeGeminiServer(script) as fake_server:
+        formatting_server = _import_formatting_modules(fake_server.base_url, args.report_cache)
+
+        async def request(i: int) -> Any:
+            result = await formatting_server.format_report(
+                text_blocks=sample_blocks(i),
+                images=[],
+                use_cache=args.report_cache,
+                mode=args.mode,
+            )
+            if result.startswith('{"error"'):
+                raise RuntimeError(result)
+            return result
+
+        try:
+            yield request
+        finally:
+            await formatting_server.client_manager.aclose()
+
+
+@asynccontextmanager
+async def html_to_pdf_target(args: argparse.Namespace) -> AsyncIterator[Request]:
+    """PDF rendering of template reports on the shared browser pool."""
+    sys.path.insert(0, str(FORMATTING_DIR))
+    import pdf_converter
+    from src.backend.formatting.template_formatter import TemplateFormatter
+
+    formatter = TemplateFormatter()
+    pool = pdf_converter.get_browser_pool()
+    await pool.start()
+
+    async def request(i: int) -> Any:
+        return await pool.render(formatter.render(sample_blocks(i), []))
+
+    try:
+        yield request
+    finally:
+        await pdf_converter.shutdown_browser_pool()
+
+
+SCENARIOS = {
+    "client": client_target,
+    "format_report": format_report_target,
+    "html_to_pdf": html_to_pdf_target,
+}
+
+
+def print_results(results: list[LevelResult], show_stages: bool) -> None:
+    """Print a results table, optionally with the per-stage breakdown."""
+    header = f"{'scenario':<14}{'conc':>6}{'reqs':>7}{'err':>5}{'req/s':>9}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'peak MB':>9}{'rss MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        peak = f"{r.peak_traced_mb:.1f}" if r.peak_traced_mb is not None else "-"
+        rss = f"{r.max_rss_mb:.1f}" if r.max_rss_mb is not None else "-"
+        print(
+            f"{r.scenario:<14}{r.concurrency:>6}{r.requests:>7}{r.errors:>5}{r.throughput:>9.2f}"
+            f"{r.mean_ms:>9.1f}{r.p50_ms:>9.1f}{r.p95_ms:>9.1f}{r.p99_ms:>9.1f}{peak:>9}{rss:>9}"
+        )
+        if show_stages:
+            for stage, values in r.stages.items():
+                print(f"    {stage:<32}{values['count']:>7}  p50 {values['p50_ms']:>8.1f}  p95 {values['p95_ms']:>8.1f}")
+
+
+async def run(args: argparse.Namespace) -> list[LevelResult]:
+    """Run every requested concurrency level of the scenario."""
+    exporter = InMemoryExporter(max_spans=1_000_000)
+    tracer.add_exporter(exporter)
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    results = []
+    async with SCENARIOS[args.scenario](args) as request:
+        for concurrency in levels:
+            result = await run_level(args.scenario, request, concurrency, args.requests, args.warmup, exporter)
+            results.append(result)
+    return results
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the report pipeline against local stand-ins.")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="Measured requests per level")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured requests before each level")
+    parser.add_argument("--script", help="JSON Gemini script with steps and timing (overrides the latency flags)")
+    parser.add_argument("--gemini", choices=("scripted", "http"), default="scripted",
+                        help="client scenario: in-process scripted model or the fake REST server")
+    parser.add_argument("--gemini-latency-ms", type=float, default=200.0)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--tool-latency-ms", type=float, default=20.0)
+    parser.add_argument("--tool-cpu-ms", type=float, default=0.0)
+    parser.add_argument("--stream", action="store_true", help="client scenario: use stream_message")
+    parser.add_argument("--mode", default="single", help="format_report generation mode")
+    parser.add_argument("--report-cache", action="store_true", help="format_report: keep the report cache on")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip Python allocation tracking")
+    parser.add_argument("--stages", action="store_true", help="Print the per-stage latency breakdown")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+
+    results = asyncio.run(run(args))
+    print_results(results, args.stages)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Stub MCP server for benchmarks.
+
+A stdio MCP server with market-data shaped tools that answer from generated
+data after a configurable delay. Behaviour is set through environment
+variables so the benchmark config can vary it per run:
+
+- ``STUB_LATENCY_MS``: simulated I/O latency per call (default 20)
+- ``STUB_CPU_MS``: busy CPU time per call, for CPU-bound servers (default 0)
+- ``STUB_PAYLOAD_BYTES``: approximate size of ``get_filings`` results (default 4096)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from mcp.server.fastmcp import FastMCP
+
+LATENCY_SECONDS = float(os.environ.get("STUB_LATENCY_MS", "20")) / 1000
+CPU_SECONDS = float(os.environ.get("STUB_CPU_MS", "0")) / 1000
+PAYLOAD_BYTES = int(os.environ.get("STUB_PAYLOAD_BYTES", "4096"))
+
+mcp = FastMCP("stub-market-data")
+
+
+async def _simulate_work() -> None:
+    if CPU_SECONDS:
+        deadline = time.perf_counter() + CPU_SECONDS
+        while time.perf_counter() < deadline:
+            pass
+    if LATENCY_SECONDS:
+        await asyncio.sleep(LATENCY_SECONDS)
+
+
+def _seed(ticker: str) -> int:
+    return int(hashlib.sha256(ticker.upper().encode("utf-8")).hexdigest()[:8], 16)
+
+
+@mcp.tool()
+async def get_price(ticker: str) -> str:
+    """
+    Get the latest price of a stock.
+
+    Args:
+        ticker: Stock ticker symbol
+    """
+    await _simulate_work()
+    seed = _seed(ticker)
+    return json.dumps({
+        "ticker": ticker.upper(),
+        "price": round(50 + seed % 45000 / 100, 2),
+        "change_pct": round((seed % 800 - 400) / 100, 2),
+    })
+
+
+@mcp.tool()
+async def get_fundamentals(ticker: str) -> str:
+    """
+    Get key fundamentals of a company.
+
+    Args:
+        ticker: Stock ticker symbol
+    """
+    await _simulate_work()
+    seed = _seed(ticker)
+    return json.dumps({
+        "ticker": ticker.upper(),
+        "pe_ratio": round(8 + seed % 4000 / 100, 2),
+        "market_cap_billions": round(1 + seed % 300000 / 100, 2),
+        "dividend_yield_pct": round(seed % 500 / 100, 2),
+    })
+
+
+@mcp.tool()
+async def get_filings(ticker: str, size_bytes: int = 0) -> str:
+    """
+    Get a dump of recent filings text.
+
+    Args:
+        ticker: Stock ticker symbol
+        size_bytes: Approximate result size; 0 uses STUB_PAYLOAD_BYTES
+    """
+    await _simulate_work()
+    line = f"{ticker.upper()},10-K,2024-12-31,Revenue grew while margins held steady.\n"
+    return line * max(1, (size_bytes or PAYLOAD_BYTES) // len(line))
+
+
+if __name__ == "__main__":
+    mcp.run()
@@ -0,0 +1,147 @@
+"""
+Conversation Sessions
+
+This module provides a long-lived conversation whose Gemini history is kept
+already converted and grows by appending only the new turns. A token budget
+keeps the history inside the model's context window by dropping or
+summarizing the oldest turns.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from typing import Optional
+
+from .lazy_imports import lazy_import
+
+genai = lazy_import("google.generativeai")
+
+logger = logging.getLogger(__name__)
+
+TRIM_STRATEGIES = ("drop", "summarize")
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+SUMMARY_ACK = "Understood, I will continue the conversation with that context."
+
+
+def content_size(content: genai.protos.Content) -> int:
+    """Approximate token count of a single content entry."""
+    return len(type(content).serialize(content)) // 4 + 1
+
+
+class ConversationSession:
+    """
+    A conversation whose Gemini history is maintained incrementally.
+
+    Pass the session to :meth:`MCPClient.process_message` or
+    :meth:`MCPClient.stream_message` instead of a ``conversation_history``
+    list. Calls on the same session are serialized, and their Gemini
+    requests share the session's ``id`` as their fair-queuing key.
+    """
+
+    def __init__(
+        self,
+        history: Optional[list[genai.protos.Content]] = None,
+        token_budget: int = 32000,
+        trim_strategy: str = "drop",
+        keep_recent_turns: int = 6,
+        trim_target: float = 0.75,
+    ):
+        """
+        Initialize the session.
+
+        Args:
+            history: Already converted Gemini history to start from.
+            token_budget: Estimated history size that triggers trimming.
+            trim_strategy: "drop" removes the oldest turns; "summarize" replaces
+                them with a model-written summary.
+            keep_recent_turns: Most recent entries that are never trimmed.
+            trim_target: Fraction of the budget to trim down to, so trimming
+                does not run again on the very next turn.
+        """
+        if trim_strategy not in TRIM_STRATEGIES:
+            raise ValueError(f"Unknown trim strategy: {trim_strategy}")
+
+        self.id = uuid.uuid4().hex
+        self.history: list[genai.protos.Content] = []
+        self.token_budget = token_budget
+        self.trim_strategy = trim_strategy
+        self.keep_recent_turns = keep_recent_turns
+        self.trim_target = trim_target
+        self.lock = asyncio.Lock()
+        self._sizes: list[int] = []
+        self._scale = 1.0
+        self.extend(history or [])
+
+    @property
+    def estimated_tokens(self) -> int:
+        """Estimated token count of the history."""
+        return int(sum(self._sizes) * self._scale)
+
+    def needs_trimming(self) -> bool:
+        """Whether the history has outgrown its token budget."""
+        return self.estimated_tokens > self.token_budget
+
+    def extend(self, contents: list[genai.protos.Content]) -> None:
+        """Append new turns to the history."""
+        self.history.extend(contents)
+        self._sizes.extend(content_size(content) for content in contents)
+
+    def observe_prompt_tokens(self, prompt_tokens: Optional[int], history_length: int) -> None:
+        """
+        Calibrate the size estimate against the prompt size Gemini reported.
+
+        Args:
+            prompt_tokens: ``prompt_token_count`` of a request sent with this history.
+            history_length: Number of history entries that request contained.
+        """
+        estimated = sum(self._sizes[:history_length])
+        if prompt_tokens and estimated:
+            self._scale = max(1.0, prompt_tokens / estimated)
+
+    def trim_index(self) -> int:
+        """
+        Index of the first entry to keep when trimming to the target size.
+
+        Cuts only before a user text turn so tool calls stay paired with
+        their responses; returns 0 when nothing can be trimmed.
+        """
+        target = self.token_budget * self.trim_target / self._scale
+        remaining = sum(self._sizes)
+        last_allowed = len(self.history) - self.keep_recent_turns
+        cut = 0
+
+        for index in range(1, max(last_allowed, 0) + 1):
+            remaining -= self._sizes[index - 1]
+            if self._is_cut_point(index):
+                cut = index
+                if remaining <= target:
+                    break
+
+        return cut
+
+    def _is_cut_point(self, index: int) -> bool:
+        if index >= len(self.history):
+            return False
+        content = self.history[index]
+        return content.role == "user" and not any(part.function_response.name for part in content.parts)
+
+    def replace_prefix(self, index: int, summary: Optional[str] = None) -> None:
+        """
+        Remove ``history[:index]``, optionally replacing it with a summary exchange.
+
+        Args:
+            index: Number of leading entries to remove.
+            summary: Summary of the removed entries, or None to drop them.
+        """
+        kept = self.history[index:]
+        self.history, self._sizes = [], []
+        if summary:
+            self.extend([
+                genai.protos.Content(role="user", parts=[genai.protos.Part(text=SUMMARY_PREFIX + summary)]),
+                genai.protos.Content(role="model", parts=[genai.protos.Part(text=SUMMARY_ACK)]),
+            ])
+        self.extend(kept)
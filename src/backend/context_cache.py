@@ -0,0 +1,275 @@
+"""
+Gemini Context Cache
+
+This module manages server-side cached contexts for the stable prefix of a
+conversation: the tool declarations plus the earlier conversation turns. A
+request whose prefix is cached only sends the new turns, which cuts both the
+input token cost and the prefill latency of long conversations.
+
+Caches are created in the background and reused on later turns. Entries are
+refreshed before their TTL runs out and evicted least recently used first.
+Whenever no usable cache exists, or the API refuses one, callers fall back to
+plain requests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from .lazy_imports import lazy_import
+
+genai = lazy_import("google.generativeai")
+
+logger = logging.getLogger(__name__)
+
+
+def is_cache_rejection(error: Exception) -> bool:
+    """
+    Whether a request failed because the API refused its cached context.
+
+    A cache that expired, was deleted or does not match the request is
+    reported as NotFound, InvalidArgument or FailedPrecondition. Quota,
+    network and server errors are not the cache's fault; retrying them
+    uncached right away would only add load.
+    """
+    from google.api_core import exceptions
+
+    return isinstance(error, (exceptions.NotFound, exceptions.InvalidArgument, exceptions.FailedPrecondition))
+
+
+@dataclass
+class CachedPrefix:
+    """A model bound to a cached context and how much history the cache covers."""
+
+    model: genai.GenerativeModel
+    history_length: int
+    key: str
+
+
+@dataclass
+class _CacheEntry:
+    cached_content: Any
+    model: genai.GenerativeModel
+    history_length: int
+    expires_at: float
+    last_used: float
+
+
+class ContextCacheManager:
+    """
+    Creates, reuses, refreshes and evicts Gemini cached contexts.
+
+    Entries are keyed by a rolling hash over the tools fingerprint and each
+    history turn, so a conversation reuses the longest cached prefix of its
+    history and only the turns after it are sent with each request.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        generation_config: Any = None,
+        ttl_seconds: float = 3600.0,
+        refresh_margin: float = 300.0,
+        min_tokens: int = 4096,
+        min_new_turns: int = 4,
+        max_entries: int = 16,
+        failure_backoff: float = 600.0,
+    ):
+        """
+        Initialize the manager.
+
+        Args:
+            model_name: Model the cached contexts are created for.
+            generation_config: Generation config for models built on a cache.
+            ttl_seconds: Lifetime of each cached context.
+            refresh_margin: Extend a cache's TTL when less than this many
+                seconds remain and it is still being used.
+            min_tokens: Estimated prefix size below which no cache is created;
+                the API rejects caches smaller than the model's minimum.
+            min_new_turns: Uncached turns needed before a longer prefix is cached.
+            max_entries: Maximum number of live cached contexts.
+            failure_backoff: Seconds to wait before retrying a failed prefix.
+        """
+        self.model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+        self.generation_config = generation_config
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self.min_tokens = min_tokens
+        self.min_new_turns = min_new_turns
+        self.max_entries = max_entries
+        self.failure_backoff = failure_backoff
+        self._entries: dict[str, _CacheEntry] = {}
+        self._failed: dict[str, float] = {}
+        self._pending: dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def prefix_keys(tools_fingerprint: str, history: list[genai.protos.Content]) -> list[str]:
+        """Rolling hashes of the cacheable prefixes; ``keys[n]`` covers ``history[:n]``."""
+        digest = hashlib.sha256(tools_fingerprint.encode("utf-8"))
+        keys = [digest.hexdigest()]
+        for content in history:
+            digest = digest.copy()
+            digest.update(type(content).serialize(content))
+            keys.append(digest.hexdigest())
+        return keys
+
+    @staticmethod
+    def _is_boundary(history: list[genai.protos.Content], index: int) -> bool:
+        """Whether a cache may end right before ``history[index]``."""
+        if index == len(history):
+            return index == 0 or history[-1].role == "model"
+        content = history[index]
+        return content.role == "user" and not any(part.function_response.name for part in content.parts)
+
+    def lookup(
+        self,
+        tools: Optional[list[genai.protos.Tool]],
+        tools_fingerprint: str,
+        history: list[genai.protos.Content],
+    ) -> Optional[CachedPrefix]:
+        """
+        Find the longest cached prefix of a conversation.
+
+        A longer prefix is cached in the background when enough new turns have
+        accumulated since the cached one, so later turns can use it.
+
+        Args:
+            tools: Tool declarations sent with the conversation.
+            tools_fingerprint: Fingerprint of those declarations.
+            history: Converted conversation history.
+
+        Returns:
+            The cached prefix to use, or None to send a plain request.
+        """
+        now = time.time()
+        self._drop_expired(now)
+        keys = self.prefix_keys(tools_fingerprint, history)
+
+        found: Optional[CachedPrefix] = None
+        for length in range(len(history), -1, -1):
+            entry = self._entries.get(keys[length])
+            if entry:
+                entry.last_used = now
+                if entry.expires_at - now < self.refresh_margin:
+                    self._spawn(f"refresh:{keys[length]}", self._refresh(keys[length], entry))
+                found = CachedPrefix(entry.model, length, keys[length])
+                break
+
+        covered = found.history_length if found else -1
+        target = self._cache_target(tools, history, covered)
+        if target is not None:
+            key = keys[target]
+            if key not in self._pending and now >= self._failed.get(key, 0.0):
+                self._spawn(key, self._create(key, tools, history[:target]))
+
+        return found
+
+    def invalidate(self, key: str) -> None:
+        """Forget a cache the API refused, e.g. because it already expired."""
+        entry = self._entries.pop(key, None)
+        self._failed[key] = time.time() + self.failure_backoff
+        if entry:
+            self._spawn(f"delete:{key}", self._delete(entry))
+
+    async def close(self) -> None:
+        """Cancel background work and delete every cached context."""
+        for task in list(self._pending.values()):
+            task.cancel()
+        await asyncio.gather(*self._pending.values(), return_exceptions=True)
+        self._pending.clear()
+
+        entries, self._entries = list(self._entries.values()), {}
+        await asyncio.gather(*(self._delete(entry) for entry in entries), return_exceptions=True)
+
+    def _cache_target(
+        self,
+        tools: Optional[list[genai.protos.Tool]],
+        history: list[genai.protos.Content],
+        covered: int,
+    ) -> Optional[int]:
+        """Length of the history prefix worth caching next, if any."""
+        tools_size = sum(len(type(tool).serialize(tool)) for tool in tools or [])
+        for length in range(len(history), covered, -1):
+            if covered >= 0 and length - covered < self.min_new_turns:
+                return None
+            if self._is_boundary(history, length):
+                size = tools_size + sum(len(type(c).serialize(c)) for c in history[:length])
+                return length if size // 4 >= self.min_tokens else None
+        return None
+
+    def _spawn(self, key: str, coro: Any) -> None:
+        if key in self._pending:
+            coro.close()
+            return
+        task = asyncio.create_task(coro)
+        self._pending[key] = task
+        task.add_done_callback(lambda _: self._pending.pop(key, None))
+
+    async def _create(
+        self,
+        key: str,
+        tools: Optional[list[genai.protos.Tool]],
+        contents: list[genai.protos.Content],
+    ) -> None:
+        try:
+            cached_content = await asyncio.to_thread(
+                genai.caching.CachedContent.create,
+                model=self.model_name,
+                tools=tools,
+                contents=contents or None,
+                ttl=datetime.timedelta(seconds=self.ttl_seconds),
+            )
+            model = genai.GenerativeModel.from_cached_content(
+                cached_content=cached_content,
+                generation_config=self.generation_config,
+            )
+        except Exception as e:
+            logger.info(f"Context cache not created, using plain requests: {e}")
+            self._failed[key] = time.time() + self.failure_backoff
+            return
+
+        now = time.time()
+        self._entries[key] = _CacheEntry(
+            cached_content=cached_content,
+            model=model,
+            history_length=len(contents),
+            expires_at=now + self.ttl_seconds,
+            last_used=now,
+        )
+        logger.debug(f"Created context cache covering {len(contents)} turns")
+        self._evict()
+
+    async def _refresh(self, key: str, entry: _CacheEntry) -> None:
+        try:
+            await asyncio.to_thread(
+                entry.cached_content.update,
+                ttl=datetime.timedelta(seconds=self.ttl_seconds),
+            )
+            entry.expires_at = time.time() + self.ttl_seconds
+        except Exception as e:
+            logger.info(f"Context cache refresh failed: {e}")
+            self.invalidate(key)
+
+    async def _delete(self, entry: _CacheEntry) -> None:
+        try:
+            await asyncio.to_thread(entry.cached_content.delete)
+        except Exception as e:
+            logger.debug(f"Context cache delete failed: {e}")
+
+    def _drop_expired(self, now: float) -> None:
+        for key in [k for k, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[key]
+        for key in [k for k, until in self._failed.items() if until <= now]:
+            del self._failed[key]
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            key = min(self._entries, key=lambda k: self._entries[k].last_used)
+            entry = self._entries.pop(key)
+            self._spawn(f"delete:{key}", self._delete(entry))
@@ -1,18 +1,30 @@
-from abc import ACB, abstractmethod
+import asyncio
+from abc import ABC, abstractmethod
 from typing import List
 
-class Formatter:
+class Formatter(ABC):
     """
-    
+    Turns report text and images into a formatted HTML report.
     """
 
     @abstractmethod
-    def format(image_paths: List[str], text: List[str]) -> str:
+    def format(self, image_paths: List[str], text: List[str]) -> str:
         """
-        Formats a pdf into text
+        Formats images and text into a report
         Params:
-            paths to images
+            paths or URLs of images
             text to put in report
         Returns:
-            path to pdf
-        """
\ No newline at end of file
+            report HTML
+        """
+
+    async def format_async(self, image_paths: List[str], text: List[str]) -> str:
+        """
+        Formats images and text into a report without blocking the event loop
+        Params:
+            paths or URLs of images
+            text to put in report
+        Returns:
+            report HTML
+        """
+        return await asyncio.to_thread(self.format, image_paths, text)
@@ -0,0 +1,140 @@
+"""
+Shared report layout
+
+The CSS theme and document skeleton used for every locally assembled report,
+following the layout rules of the formatting prompt: a hero header, zebra
+tables, callout boxes and print-color-adjust so backgrounds survive PDF export.
+"""
+
+import html
+from typing import Any, Optional
+
+REPORT_CSS = """
+* { box-sizing: border-box; }
+html, body {
+  margin: 0;
+  padding: 0;
+  background: #fdfdfd;
+  color: #1a202c;
+  -webkit-print-color-adjust: exact;
+  print-color-adjust: exact;
+}
+body {
+  font-family: system-ui, -apple-system, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
+  font-size: 15px;
+  line-height: 1.6;
+}
+.report { max-width: 800px; margin: 0 auto; padding: 0 32px 48px; }
+.hero {
+  background: #1a202c;
+  color: #f7fafc;
+  margin: 0 -32px 32px;
+  padding: 40px 32px 32px;
+}
+.hero .ticker {
+  font-size: clamp(2.5rem, 6vw, 3.5rem);
+  font-weight: 800;
+  letter-spacing: 0.04em;
+  margin: 0;
+}
+.hero .subtitle { font-size: 1.1rem; color: #cbd5e0; margin: 8px 0 0; }
+.report-section { margin: 0 0 28px; padding: 20px 24px; border-radius: 12px; }
+.report-section h2 {
+  font-size: clamp(1.3rem, 3vw, 1.6rem);
+  margin: 0 0 12px;
+  color: #1a202c;
+}
+.report-section p { margin: 0 0 12px; }
+.tint-growth { background: #ecfdf5; }
+.tint-technical { background: #eef2f7; }
+.tint-risk { background: #fff5f5; border-left: 4px solid #ef4444; }
+.tint-risk h2 { color: #ef4444; }
+.callout {
+  background: #f7fafc;
+  border-radius: 12px;
+  box-shadow: 0 2px 10px rgba(26, 32, 44, 0.08);
+  padding: 20px 24px;
+  margin: 0 0 28px;
+  page-break-inside: avoid;
+}
+.callout h2 { margin-top: 0; }
+.metric-positive {
+  background: #10b981;
+  color: #ffffff;
+  border-radius: 12px;
+  padding: 12px 16px;
+  page-break-inside: avoid;
+}
+.metric-negative { color: #ef4444; border: 1px solid #ef4444; border-radius: 12px; padding: 12px 16px; }
+table.data-table {
+  width: 100%;
+  border-collapse: collapse;
+  margin: 12px 0 20px;
+  font-variant-numeric: tabular-nums;
+  page-break-inside: avoid;
+}
+table.data-table th {
+  background: #1a202c;
+  color: #f7fafc;
+  text-align: left;
+  padding: 8px 12px;
+  font-weight: 600;
+}
+table.data-table td { padding: 8px 12px; border-bottom: 1px solid #e2e8f0; }
+table.data-table tr:nth-child(even) td { background: #f1f5f9; }
+table.data-table td.num { text-align: right; }
+table.data-table td.up { color: #047857; font-weight: 600; }
+table.data-table td.down { color: #ef4444; font-weight: 600; }
+figure.figure { margin: 0 0 28px; text-align: center; page-break-inside: avoid; }
+figure.figure img { max-width: 100%; height: auto; border-radius: 8px; }
+figure.figure figcaption { font-size: 0.9rem; color: #4a5568; margin-top: 8px; }
+"""
+
+
+def image_block(image: Any, block_count: int) -> Optional[int]:
+    """
+    Index of the text block an image asks to follow, if any.
+
+    An image dict's "section" key is the index of a text block in the
+    report input as given, before empty blocks are dropped or blocks are
+    grouped into sections.
+
+    Args:
+        image: Image dict or bare image string.
+        block_count: Number of text blocks in the report input.
+
+    Returns:
+        The block index, or None if the image has no valid one.
+    """
+    index = image.get("section") if isinstance(image, dict) else None
+    if isinstance(index, int) and not isinstance(index, bool) and 0 <= index < block_count:
+        return index
+    return None
+
+
+def wrap_document(body: str, title: str = "Stock Performance Report", css: Optional[str] = None) -> str:
+    """
+    Wrap report body HTML in the shared document skeleton.
+
+    Args:
+        body: HTML for the report content.
+        title: Document title.
+        css: Extra CSS appended after the shared theme.
+
+    Returns:
+        A complete HTML5 document.
+    """
+    styles = REPORT_CSS + (css or "")
+    return (
+        "<!DOCTYPE html>\n"
+        '<html lang="en">\n'
+        "<head>\n"
+        '<meta charset="utf-8">\n'
+        f"<title>{html.escape(title)}</title>\n"
+        f"<style>{styles}</style>\n"
+        "</head>\n"
+        "<body>\n"
+        f'<main class="report">\n{body}\n</main>\n'
+        "</body>\n"
+        "</html>\n"
+    )
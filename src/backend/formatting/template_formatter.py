@@ -0,0 +1,275 @@
+"""
+Template-based report formatter
+
+A deterministic, LLM-free renderer for regular report input. It lays text
+blocks and images out with the shared report layout (hero header, zebra
+tables, callout boxes and tinted sections) in milliseconds, so routine reports
+do not need a Gemini round trip.
+"""
+
+import base64
+import html
+import logging
+import mimetypes
+import re
+from pathlib import Path
+from typing import Any, List, Optional
+
+from .formater import Formatter
+from .layout import image_block, wrap_document
+
+logger = logging.getLogger(__name__)
+
+# Headings that mark a block as an executive summary callout
+CALLOUT_HEADINGS = ("executive summary", "summary", "key takeaways", "highlights", "bottom line", "outlook")
+
+# Heading keywords mapped to section tints
+SECTION_TINTS = (
+    (("risk", "bear", "downside", "headwind"), "tint-risk"),
+    (("growth", "revenue", "earnings", "bull", "upside"), "tint-growth"),
+    (("technical", "chart", "momentum", "moving average", "rsi", "macd"), "tint-technical"),
+)
+
+_TICKER_PATTERNS = (
+    re.compile(r"\((?:NYSE|NASDAQ|AMEX|TSX|LSE)?:?\s*([A-Z]{1,5}(?:\.[A-Z])?)\)"),
+    re.compile(r"\b(?:NYSE|NASDAQ|AMEX|Ticker|Symbol)\s*[:\-]\s*\$?([A-Z]{1,5}(?:\.[A-Z])?)\b"),
+    re.compile(r"\$([A-Z]{1,5})\b"),
+)
+_NUMBER = re.compile(r"^[\s$€£(+\-]*\d[\d,]*(\.\d+)?\s*[%xXkKmMbB)]*\s*$")
+_MARKDOWN_RULE = re.compile(r"^\s*\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?\s*$")
+_KEY_VALUE = re.compile(r"^\s*([^:]{1,60}):\s+(\S.*)$")
+_BASE64_SIGNATURES = (
+    ("/9j/", "image/jpeg"),
+    ("iVBOR", "image/png"),
+    ("R0lGOD", "image/gif"),
+    ("UklGR", "image/webp"),
+    ("PHN2Zy", "image/svg+xml"),
+)
+
+
+def _is_number(cell: str) -> bool:
+    return bool(_NUMBER.match(cell))
+
+
+def _trend_class(cell: str) -> str:
+    """CSS classes for a numeric table cell, marking signed changes up or down."""
+    stripped = cell.strip()
+    if not _is_number(stripped):
+        return ""
+    if stripped.startswith("+"):
+        return "num up"
+    if stripped.startswith(("-", "(")):
+        return "num down"
+    return "num"
+
+
+def _split_row(line: str, delimiter: str) -> List[str]:
+    if delimiter == "|":
+        line = line.strip().strip("|")
+    return [cell.strip() for cell in line.split(delimiter)]
+
+
+def _parse_table(lines: List[str]) -> Optional[List[List[str]]]:
+    """Parse delimited or key/value lines into rows, or None if they are not a table."""
+    lines = [line for line in lines if line.strip() and not _MARKDOWN_RULE.match(line)]
+    if len(lines) < 2:
+        return None
+
+    for delimiter in ("|", "\t", ","):
+        if not all(delimiter in line for line in lines):
+            continue
+        rows = [_split_row(line, delimiter) for line in lines]
+        width = len(rows[0])
+        if width < 2 or any(len(row) != width for row in rows):
+            continue
+        if any(_is_number(cell) for row in rows[1:] for cell in row):
+            return rows
+
+    pairs = [_KEY_VALUE.match(line) for line in lines]
+    if all(pairs) and any(_is_number(match.group(2)) for match in pairs):
+        return [["Metric", "Value"]] + [[match.group(1).strip(), match.group(2).strip()] for match in pairs]
+
+    return None
+
+
+def _render_table(rows: List[List[str]]) -> str:
+    header, body = rows[0], rows[1:]
+    head_html = "".join(f"<th>{html.escape(cell)}</th>" for cell in header)
+    body_html = "".join(
+        "<tr>" + "".join(
+            f'<td class="{_trend_class(cell)}">{html.escape(cell)}</td>' if _trend_class(cell)
+            else f"<td>{html.escape(cell)}</td>"
+            for cell in row
+        ) + "</tr>"
+        for row in body
+    )
+    return f'<table class="data-table"><thead><tr>{head_html}</tr></thead><tbody>{body_html}</tbody></table>'
+
+
+def _render_paragraphs(lines: List[str]) -> str:
+    """Render lines as paragraphs, splitting on blank lines and keeping line breaks."""
+    paragraphs: List[List[str]] = [[]]
+    for line in lines:
+        if line.strip():
+            paragraphs[-1].append(html.escape(line.strip()))
+        elif paragraphs[-1]:
+            paragraphs.append([])
+    return "".join(f"<p>{'<br>'.join(p)}</p>" for p in paragraphs if p)
+
+
+def _looks_like_heading(line: str) -> bool:
+    line = line.strip().lstrip("#").strip()
+    return 0 < len(line) <= 80 and not line.endswith((".", ",", ";")) and not _is_number(line)
+
+
+def _image_source(data: str) -> str:
+    """Turn a URL, data URI or bare base64 string into an img src value."""
+    data = data.strip()
+    if data.startswith(("http://", "https://", "data:", "file:")):
+        return data
+    mime_type = next((mime for prefix, mime in _BASE64_SIGNATURES if data.startswith(prefix)), "image/png")
+    return f"data:{mime_type};base64,{data}"
+
+
+def find_ticker(text: str) -> Optional[str]:
+    """Find a stock ticker mentioned in text, if any."""
+    for pattern in _TICKER_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    return None
+
+
+def load_images(image_paths: List[str]) -> List[dict]:
+    """
+    Turn image paths or URLs into image dicts with data and caption.
+
+    Local files are read and inlined as data URIs; URLs and data URIs are
+    passed through.
+    """
+    images = []
+    for path in image_paths:
+        if path.startswith(("http://", "https://", "data:")):
+            images.append({"data": path, "caption": ""})
+            continue
+        file_path = Path(path)
+        mime_type = mimetypes.guess_type(file_path.name)[0] or "image/png"
+        encoded = base64.b64encode(file_path.read_bytes()).decode("ascii")
+        images.append({"data": f"data:{mime_type};base64,{encoded}", "caption": ""})
+    return images
+
+
+class TemplateFormatter(Formatter):
+    """Deterministic formatter that renders reports without an LLM."""
+
+    def format(self, image_paths: List[str], text: List[str]) -> str:
+        """
+        Formats images and text into a report
+        Params:
+            paths or URLs of images
+            text to put in report
+        Returns:
+            report HTML
+        """
+        return self.render(text, load_images(image_paths))
+
+    def render(self, text_blocks: List[str], images: List[Any]) -> str:
+        """
+        Render text blocks and images into a complete HTML report.
+
+        Args:
+            text_blocks: Text content of the report.
+            images: Images as dicts with data and caption (and an optional
+                "section" index into text_blocks of the block they follow),
+                or bare strings.
+
+        Returns:
+            The report HTML.
+        """
+        blocks = []
+        # Rendered block each input block ends up at or after, so image
+        # indexes into the input survive dropping empty blocks
+        rendered_at = []
+        for index, block in enumerate(text_blocks or []):
+            if not isinstance(block, str):
+                logger.warning(f"Skipping text block {index} with non-string content ({type(block).__name__})")
+            elif block.strip():
+                blocks.append(block)
+            rendered_at.append(len(blocks) - 1)
+        placed = self._place_images(rendered_at, len(blocks), images)
+
+        parts = [self._render_hero(blocks[0] if blocks else "")]
+        for index, block in enumerate(blocks):
+            if index == 0:
+                # The hero header already shows the first line
+                block = "\n".join(block.strip().splitlines()[1:])
+            parts.append(self._render_block(block))
+            parts.extend(self._render_figure(image) for image in placed.get(index, []))
+        parts.extend(self._render_figure(image) for image in placed.get(-1, []))
+
+        title_line = blocks[0].strip().splitlines()[0] if blocks else ""
+        return wrap_document("\n".join(part for part in parts if part), title=title_line[:120] or "Stock Performance Report")
+
+    def _place_images(self, rendered_at: List[int], block_count: int, images: List[Any]) -> dict:
+        """Map each image to the index of the rendered block it follows (-1 for the end)."""
+        placed: dict = {}
+        unplaced = []
+        for image in images or []:
+            data = image.get("data") if isinstance(image, dict) else image
+            if not isinstance(data, str):
+                logger.warning(f"Skipping image with non-string data ({type(data).__name__})")
+                continue
+            index = image_block(image, len(rendered_at))
+            if index is not None and block_count:
+                placed.setdefault(max(rendered_at[index], 0), []).append(image)
+            else:
+                unplaced.append(image)
+
+        for i, image in enumerate(unplaced):
+            index = (i + 1) * block_count // len(unplaced) - 1 if block_count else -1
+            placed.setdefault(index, []).append(image)
+        return placed
+
+    def _render_hero(self, first_block: str) -> str:
+        first_line = first_block.strip().splitlines()[0].strip() if first_block.strip() else ""
+        ticker = find_ticker(first_block)
+        title = ticker or first_line or "Stock Performance Report"
+        subtitle = first_line if ticker else ""
+        subtitle_html = f'<p class="subtitle">{html.escape(subtitle)}</p>' if subtitle else ""
+        return f'<header class="hero"><h1 class="ticker">{html.escape(title)}</h1>{subtitle_html}</header>'
+
+    def _render_block(self, block: str) -> str:
+        lines = block.strip().splitlines()
+        if not lines:
+            return ""
+
+        heading = None
+        rows = _parse_table(lines)
+        if not rows and len(lines) > 1 and _looks_like_heading(lines[0]):
+            heading = lines[0].strip().lstrip("#").strip().rstrip(":")
+            lines = lines[1:]
+            rows = _parse_table(lines)
+
+        body = _render_table(rows) if rows else _render_paragraphs(lines)
+        heading_html = f"<h2>{html.escape(heading)}</h2>" if heading else ""
+
+        lowered = (heading or "").lower()
+        if lowered and any(lowered.startswith(name) for name in CALLOUT_HEADINGS):
+            return f'<div class="callout">{heading_html}{body}</div>'
+
+        tint = next((css for keywords, css in SECTION_TINTS if any(k in lowered for k in keywords)), "")
+        classes = f"report-section {tint}".strip()
+        return f'<section class="{classes}">{heading_html}{body}</section>'
+
+    def _render_figure(self, image: Any) -> str:
+        if isinstance(image, dict):
+            data, caption = image.get("data") or "", str(image.get("caption") or "")
+        else:
+            data, caption = image or "", ""
+        if not data:
+            return ""
+        caption_html = f"<figcaption>{html.escape(caption)}</figcaption>" if caption else ""
+        return (
+            f'<figure class="figure"><img src="{html.escape(_image_source(data), quote=True)}" '
+            f'alt="{html.escape(caption, quote=True)}">{caption_html}</figure>'
+        )
@@ -0,0 +1,278 @@
+"""
+Gemini Request Scheduler
+
+This module coordinates Gemini API calls made by concurrent conversations so
+they stay within the project's quota. Requests wait in a priority queue, are
+admitted fairly across conversations, and are only released when both the
+requests-per-minute and tokens-per-minute token buckets allow it.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket that refills continuously up to its capacity.
+
+    The balance may go negative when a request turns out to have cost more than
+    was reserved for it; later requests then wait until the debt is repaid.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        """
+        Initialize a full bucket.
+
+        Args:
+            capacity: Maximum number of tokens the bucket holds.
+            refill_per_second: Tokens added per second.
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    @classmethod
+    def per_minute(cls, limit: float) -> "TokenBucket":
+        """Create a bucket that admits ``limit`` units per minute."""
+        return cls(capacity=limit, refill_per_second=limit / 60.0)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) / self.refill_per_second
+
+    def take(self, amount: float) -> None:
+        """Remove ``amount`` tokens, capped at the bucket capacity."""
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Debit (positive) or credit (negative) tokens after the fact."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens - amount)
+
+
+@dataclass
+class RequestTicket:
+    """Admission granted to a single Gemini request."""
+
+    estimated_tokens: int
+    actual_tokens: Optional[int] = None
+
+
+@dataclass(order=True)
+class _Waiter:
+    """Queued request, ordered by priority, fair-share finish time and arrival."""
+
+    sort_key: tuple
+    key: Hashable = field(compare=False)
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class GeminiScheduler:
+    """
+    Shared admission control for Gemini requests.
+
+    Requests with a higher ``priority`` are admitted first. Within a priority
+    level, requests are admitted in fair-share order across ``key`` values
+    (typically one key per conversation), so a conversation with many queued
+    requests cannot starve the others.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            requests_per_minute: Request quota. None or 0 disables the limit.
+            tokens_per_minute: Token quota. None or 0 disables the limit.
+            max_concurrency: Maximum number of in-flight requests. None or 0
+                disables the limit.
+        """
+        self._requests = TokenBucket.per_minute(requests_per_minute) if requests_per_minute else None
+        self._tokens = TokenBucket.per_minute(tokens_per_minute) if tokens_per_minute else None
+        self._max_concurrency = max_concurrency or None
+        self._in_flight = 0
+        self._queue: list[_Waiter] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0
+        self._key_finish: dict[Hashable, int] = {}
+        self._key_queued: dict[Hashable, int] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @property
+    def queued(self) -> int:
+        """Number of requests waiting for admission."""
+        return len(self._queue)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of admitted requests that have not finished yet."""
+        return self._in_flight
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        estimated_tokens: int = 0,
+        priority: int = 0,
+        key: Optional[Hashable] = None,
+    ) -> AsyncIterator[RequestTicket]:
+        """
+        Wait for admission and hold a request slot for the duration of the block.
+
+        Set ``actual_tokens`` on the yielded ticket once the response reports its
+        usage; the difference from the estimate is settled with the token bucket.
+
+        Args:
+            estimated_tokens: Tokens to reserve before the request is sent.
+            priority: Higher values are admitted first.
+            key: Fairness key, e.g. a conversation identifier.
+
+        Yields:
+            The ticket for this request.
+        """
+        ticket = RequestTicket(estimated_tokens=estimated_tokens)
+        future = self._enqueue(estimated_tokens, priority, key)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(ticket)
+            raise
+
+        try:
+            yield ticket
+        finally:
+            self._release(ticket)
+
+    async def close(self) -> None:
+        """Stop the dispatcher and fail any requests still queued."""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+
+        for waiter in self._queue:
+            if not waiter.future.done():
+                waiter.future.set_exception(RuntimeError("Gemini scheduler closed"))
+        self._queue.clear()
+        self._key_finish.clear()
+        self._key_queued.clear()
+
+    def _enqueue(self, tokens: int, priority: int, key: Optional[Hashable]) -> asyncio.Future:
+        """Queue a request and make sure the dispatcher is running."""
+        loop = asyncio.get_running_loop()
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch(), name="gemini-scheduler")
+
+        sequence = next(self._sequence)
+        key = key if key is not None else sequence
+        start = max(self._virtual_time, self._key_finish.get(key, 0))
+        finish = start + 1
+        self._key_finish[key] = finish
+        self._key_queued[key] = self._key_queued.get(key, 0) + 1
+
+        future = loop.create_future()
+        heapq.heappush(self._queue, _Waiter((-priority, finish, sequence), key, tokens, future))
+        self._wakeup.set()
+        return future
+
+    def _release(self, ticket: RequestTicket) -> None:
+        """Free a request slot and settle the token estimate."""
+        self._in_flight -= 1
+        if self._tokens and ticket.actual_tokens is not None:
+            self._tokens.adjust(ticket.actual_tokens - ticket.estimated_tokens)
+        if self._wakeup:
+            self._wakeup.set()
+
+    def _forget(self, waiter: _Waiter) -> None:
+        """Drop fairness bookkeeping for a key with nothing left in the queue."""
+        remaining = self._key_queued.get(waiter.key, 1) - 1
+        if remaining <= 0:
+            self._key_queued.pop(waiter.key, None)
+            self._key_finish.pop(waiter.key, None)
+        else:
+            self._key_queued[waiter.key] = remaining
+
+    def _admission_delay(self, tokens: int) -> float:
+        """Seconds until the buckets can admit a request of ``tokens`` tokens."""
+        delay = 0.0
+        if self._requests:
+            delay = max(delay, self._requests.delay_for(1))
+        if self._tokens and tokens:
+            delay = max(delay, self._tokens.delay_for(tokens))
+        return delay
+
+    async def _dispatch(self) -> None:
+        """Admit queued requests as concurrency and quota allow."""
+        assert self._wakeup is not None
+
+        while True:
+            self._wakeup.clear()
+
+            while self._queue and self._queue[0].future.done():
+                self._forget(heapq.heappop(self._queue))
+
+            timeout: Optional[float] = None
+            at_capacity = self._max_concurrency is not None and self._in_flight >= self._max_concurrency
+            if self._queue and not at_capacity:
+                waiter = self._queue[0]
+                delay = self._admission_delay(waiter.tokens)
+                if delay <= 0:
+                    heapq.heappop(self._queue)
+                    self._forget(waiter)
+                    if self._requests:
+                        self._requests.take(1)
+                    if self._tokens and waiter.tokens:
+                        self._tokens.take(waiter.tokens)
+                    self._virtual_time = max(self._virtual_time, waiter.sort_key[1])
+                    self._in_flight += 1
+                    waiter.future.set_result(None)
+                    continue
+                timeout = delay
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+def estimate_tokens(*contents: Any) -> int:
+    """Rough token estimate (about four characters per token) for quota reservation."""
+    return sum(len(str(content)) for content in contents) // 4
+
+
+def usage_tokens(response: Any) -> Optional[int]:
+    """Total token count reported by a Gemini response, if available."""
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None)
+    return total or None
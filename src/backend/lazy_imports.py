@@ -0,0 +1,44 @@
+"""
+Deferred Module Imports
+
+Importing ``google.generativeai``, ``yaml`` or the MCP SDK takes a noticeable
+part of the client's startup. Modules loaded through :func:`lazy_import` are
+only executed when one of their attributes is first used, so short-lived
+invocations that never reach Gemini or a server do not pay for them.
+"""
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Import a module whose code runs on first attribute access.
+
+    Annotations that name the module's types must not be evaluated at import
+    time, so modules using this need ``from __future__ import annotations``.
+
+    Args:
+        name: Absolute module name, e.g. ``"google.generativeai"``.
+
+    Returns:
+        The module, already loaded if it was imported before.
+
+    Raises:
+        ModuleNotFoundError: If the module is not installed.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -6,17 +6,32 @@ Google's Gemini API as the underlying LLM for processing requests and
 handling tool calls.
 """
 
+from __future__ import annotations
+
 import asyncio
 import json
 import logging
+import time
+from contextlib import suppress
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Optional
-
-import google.generativeai as genai
-import yaml
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from typing import Any, AsyncIterator, Callable, Optional, Union
+
+from .chat_session import ConversationSession
+from .context_cache import ContextCacheManager, is_cache_rejection
+from .gemini_scheduler import GeminiScheduler, estimate_tokens, usage_tokens
+from .lazy_imports import lazy_import
+from .replica_pool import Replica, ReplicaPool
+from .result_store import READ_TOOL_DECLARATION, READ_TOOL_NAME, ResultStore
+from .tool_cache import ToolResultCache
+from .tool_catalog import ToolCatalog
+from .tool_registry import ToolRegistry
+from .tracing import configure_tracing, current_span, record_usage, tracer
+from .transports import TRANSPORTS, open_transport, shutdown_loaded_servers
+
+genai = lazy_import("google.generativeai")
+mcp = lazy_import("mcp")
+yaml = lazy_import("yaml")
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +44,15 @@ class MCPServerConfig:
     command: str
     args: list[str] = field(default_factory=list)
     env: dict[str, str] = field(default_factory=dict)
+    transport: str = "stdio"
+    url: Optional[str] = None
+    connect_timeout: Optional[float] = None
+    lazy: Optional[bool] = None
+    tools: list[dict[str, Any]] = field(default_factory=list)
+    max_concurrent_calls: Optional[int] = None
+    replicas: int = 1
+    tool_cache: dict[str, float] = field(default_factory=dict)
+    result_limits: dict[str, int] = field(default_factory=dict)
 
 
 @dataclass
@@ -39,6 +63,72 @@ class GeminiConfig:
     model: str = "gemini-1.5-pro"
     temperature: float = 0.7
     max_output_tokens: int = 8192
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    max_concurrent_requests: Optional[int] = None
+    api_endpoint: Optional[str] = None
+    transport: Optional[str] = None
+    context_cache: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ClientConfig:
+    """Configuration for client-side connection behaviour."""
+
+    connect_timeout: float = 30.0
+    startup_timeout: float = 60.0
+    lazy_connect: bool = False
+    background_connect: bool = False
+    tool_catalog_path: Optional[str] = None
+    max_concurrent_tool_calls: int = 16
+    max_concurrent_calls_per_server: int = 4
+    health_check_interval: float = 30.0
+    health_check_timeout: float = 10.0
+    session_token_budget: int = 32000
+    session_trim_strategy: str = "drop"
+    session_keep_recent_turns: int = 6
+    trace_jsonl_path: Optional[str] = None
+    trace_prometheus_path: Optional[str] = None
+    tool_cache_max_entries: int = 1024
+    tool_result_max_bytes: int = 0
+    tool_result_preview_bytes: int = 4096
+    tool_result_dir: Optional[str] = None
+
+
+@dataclass
+class TextChunk:
+    """A piece of response text streamed from Gemini."""
+
+    text: str
+
+
+@dataclass
+class ToolCallStarted:
+    """Emitted when a tool requested by Gemini starts executing."""
+
+    tool_name: str
+    arguments: dict[str, Any]
+
+
+@dataclass
+class ToolCallFinished:
+    """Emitted when a tool call completes, successfully or not."""
+
+    tool_name: str
+    result: Optional[str] = None
+    error: Optional[str] = None
+    duration: float = 0.0
+
+
+StreamEvent = Union[TextChunk, ToolCallStarted, ToolCallFinished]
+
+
+@dataclass
+class _ServerConnection:
+    """Background task that owns the transport and session of one server."""
+
+    task: asyncio.Task
+    stop: asyncio.Event
 
 
 class MCPClient:
@@ -49,21 +139,42 @@ class MCPClient:
     and uses Gemini to process user requests while handling tool calls.
     """
 
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(
+        self,
+        config_path: Optional[str] = None,
+        scheduler: Optional[GeminiScheduler] = None,
+    ):
         """
         Initialize the MCP Client.
 
         Args:
             config_path: Path to the config.yml file. If None, uses default location.
+            scheduler: Gemini request scheduler to share with other clients. If
+                None, the client creates its own from the ``gemini`` config.
         """
         self.config_path = Path(config_path) if config_path else self._get_default_config_path()
         self.config: dict[str, Any] = {}
         self.gemini_config: Optional[GeminiConfig] = None
+        self.client_config = ClientConfig()
         self.server_configs: list[MCPServerConfig] = []
-        self.sessions: dict[str, ClientSession] = {}
+        self.sessions: dict[str, Union[mcp.ClientSession, ReplicaPool]] = {}
         self.tools: dict[str, dict[str, Any]] = {}
         self.tool_to_server: dict[str, str] = {}
+        self.tool_registry = ToolRegistry()
+        self.tool_cache = ToolResultCache()
+        self.tool_catalog: Optional[ToolCatalog] = None
+        self.result_store: Optional[ResultStore] = None
+        self.scheduler = scheduler
+        self._owns_scheduler = scheduler is None
+        self.context_cache: Optional[ContextCacheManager] = None
         self._model: Optional[genai.GenerativeModel] = None
+        self._connections: dict[str, _ServerConnection] = {}
+        self._pools: dict[str, ReplicaPool] = {}
+        self._lazy_servers: dict[str, MCPServerConfig] = {}
+        self._connect_locks: dict[str, asyncio.Lock] = {}
+        self._background_connects: dict[str, asyncio.Task] = {}
+        self._tool_semaphore: Optional[asyncio.Semaphore] = None
+        self._server_semaphores: dict[str, asyncio.Semaphore] = {}
 
     def _get_default_config_path(self) -> Path:
         """Get the default config path relative to this file."""
@@ -71,6 +182,10 @@ class MCPClient:
 
     def load_config(self) -> None:
         """Load configuration from the YAML config file."""
+        with tracer.span("client.load_config", path=str(self.config_path)):
+            self._load_config()
+
+    def _load_config(self) -> None:
         if not self.config_path.exists():
             raise FileNotFoundError(f"Config file not found: {self.config_path}")
 
@@ -88,6 +203,41 @@ class MCPClient:
             model=gemini_cfg.get("model", "gemini-1.5-pro"),
             temperature=gemini_cfg.get("temperature", 0.7),
             max_output_tokens=gemini_cfg.get("max_output_tokens", 8192),
+            requests_per_minute=gemini_cfg.get("requests_per_minute"),
+            tokens_per_minute=gemini_cfg.get("tokens_per_minute"),
+            max_concurrent_requests=gemini_cfg.get("max_concurrent_requests"),
+            api_endpoint=gemini_cfg.get("api_endpoint"),
+            transport=gemini_cfg.get("transport"),
+            context_cache=gemini_cfg.get("context_cache") or {},
+        )
+
+        client_cfg = self.config.get("client", {}) or {}
+        self.client_config = ClientConfig(
+            connect_timeout=client_cfg.get("connect_timeout", 30.0),
+            startup_timeout=client_cfg.get("startup_timeout", 60.0),
+            lazy_connect=client_cfg.get("lazy_connect", False),
+            background_connect=client_cfg.get("background_connect", False),
+            tool_catalog_path=client_cfg.get("tool_catalog_path"),
+            max_concurrent_tool_calls=client_cfg.get("max_concurrent_tool_calls", 16),
+            max_concurrent_calls_per_server=client_cfg.get("max_concurrent_calls_per_server", 4),
+            health_check_interval=client_cfg.get("health_check_interval", 30.0),
+            health_check_timeout=client_cfg.get("health_check_timeout", 10.0),
+            session_token_budget=client_cfg.get("session_token_budget", 32000),
+            session_trim_strategy=client_cfg.get("session_trim_strategy", "drop"),
+            session_keep_recent_turns=client_cfg.get("session_keep_recent_turns", 6),
+            trace_jsonl_path=client_cfg.get("trace_jsonl_path"),
+            trace_prometheus_path=client_cfg.get("trace_prometheus_path"),
+            tool_cache_max_entries=client_cfg.get("tool_cache_max_entries", 1024),
+            tool_result_max_bytes=client_cfg.get("tool_result_max_bytes", 0),
+            tool_result_preview_bytes=client_cfg.get("tool_result_preview_bytes", 4096),
+            tool_result_dir=client_cfg.get("tool_result_dir"),
+        )
+        self.tool_cache = ToolResultCache(self.client_config.tool_cache_max_entries)
+        if self.client_config.tool_catalog_path:
+            self.tool_catalog = ToolCatalog(self.client_config.tool_catalog_path)
+        configure_tracing(
+            jsonl_path=self.client_config.trace_jsonl_path,
+            prometheus_path=self.client_config.trace_prometheus_path,
         )
 
         servers_cfg = self.config.get("mcp_servers", [])
@@ -98,6 +248,15 @@ class MCPClient:
                     command=server.get("command", ""),
                     args=server.get("args", []),
                     env=server.get("env", {}),
+                    transport=server.get("transport", "stdio"),
+                    url=server.get("url"),
+                    connect_timeout=server.get("connect_timeout"),
+                    lazy=server.get("lazy"),
+                    tools=server.get("tools", []),
+                    max_concurrent_calls=server.get("max_concurrent_calls"),
+                    replicas=server.get("replicas", 1),
+                    tool_cache=server.get("tool_cache") or {},
+                    result_limits=server.get("result_limits") or {},
                 )
                 for i, server in enumerate(servers_cfg)
             ]
@@ -107,19 +266,89 @@ class MCPClient:
         if not self.gemini_config:
             raise RuntimeError("Config not loaded. Call load_config() first.")
 
-        genai.configure(api_key=self.gemini_config.api_key)
+        configure_kwargs: dict[str, Any] = {"api_key": self.gemini_config.api_key}
+        if self.gemini_config.transport:
+            configure_kwargs["transport"] = self.gemini_config.transport
+        if self.gemini_config.api_endpoint:
+            configure_kwargs["client_options"] = {"api_endpoint": self.gemini_config.api_endpoint}
+        genai.configure(**configure_kwargs)
 
+        generation_config = genai.GenerationConfig(
+            temperature=self.gemini_config.temperature,
+            max_output_tokens=self.gemini_config.max_output_tokens,
+        )
         self._model = genai.GenerativeModel(
             model_name=self.gemini_config.model,
-            generation_config=genai.GenerationConfig(
-                temperature=self.gemini_config.temperature,
-                max_output_tokens=self.gemini_config.max_output_tokens,
-            ),
+            generation_config=generation_config,
         )
 
+        cache_cfg = self.gemini_config.context_cache
+        if cache_cfg.get("enabled", False):
+            self.context_cache = ContextCacheManager(
+                model_name=self.gemini_config.model,
+                generation_config=generation_config,
+                ttl_seconds=cache_cfg.get("ttl_seconds", 3600.0),
+                refresh_margin=cache_cfg.get("refresh_margin", 300.0),
+                min_tokens=cache_cfg.get("min_tokens", 4096),
+                min_new_turns=cache_cfg.get("min_new_turns", 4),
+                max_entries=cache_cfg.get("max_entries", 16),
+            )
+
+        if self.scheduler is None:
+            self.scheduler = GeminiScheduler(
+                requests_per_minute=self.gemini_config.requests_per_minute,
+                tokens_per_minute=self.gemini_config.tokens_per_minute,
+                max_concurrency=self.gemini_config.max_concurrent_requests,
+            )
+
         logger.info(f"Initialized Gemini model: {self.gemini_config.model}")
 
-    async def connect_to_server(self, server_config: MCPServerConfig) -> ClientSession:
+    async def _serve_session(
+        self,
+        server_config: MCPServerConfig,
+        ready: asyncio.Future,
+        stop: asyncio.Event,
+        on_lost: Optional[Callable[[mcp.ClientSession], None]] = None,
+    ) -> None:
+        """
+        Own the transport and session of a server until asked to stop.
+
+        The transport and session context managers are entered and exited in
+        this task, so servers can be connected concurrently and shut down
+        cleanly from anywhere.
+
+        Args:
+            server_config: Configuration for the server to connect to.
+            ready: Future resolved with the session once it is initialized.
+            stop: Event that tells the task to close the connection.
+            on_lost: Called with the session if the connection terminates
+                without being asked to. By default the session is dropped.
+        """
+        try:
+            async with open_transport(server_config) as (read_stream, write_stream):
+                async with mcp.ClientSession(read_stream, write_stream) as session:
+                    with tracer.span("mcp.initialize", server=server_config.name):
+                        await session.initialize()
+                    if ready.done():
+                        return
+                    ready.set_result(session)
+                    await stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.error(f"Connection to {server_config.name} terminated: {e}")
+        finally:
+            if not ready.done():
+                ready.cancel()
+            elif not stop.is_set() and not ready.cancelled() and not ready.exception():
+                if on_lost:
+                    on_lost(ready.result())
+                elif self.sessions.get(server_config.name) is ready.result():
+                    del self.sessions[server_config.name]
+                    self._connections.pop(server_config.name, None)
+
+    async def connect_to_server(self, server_config: MCPServerConfig) -> Union[mcp.ClientSession, ReplicaPool]:
         """
         Connect to an MCP server.
 
@@ -127,50 +356,255 @@ class MCPClient:
             server_config: Configuration for the server to connect to.
 
         Returns:
-            The connected ClientSession.
-        """
-        server_params = StdioServerParameters(
-            command=server_config.command,
-            args=server_config.args,
-            env=server_config.env if server_config.env else None,
-        )
+            The connected ClientSession, or the pool of its replicas when the
+            server is configured with more than one.
 
-        stdio_transport = await stdio_client(server_params).__aenter__()
-        read_stream, write_stream = stdio_transport
-
-        session = ClientSession(read_stream, write_stream)
-        await session.__aenter__()
-        await session.initialize()
+        Raises:
+            asyncio.TimeoutError: If the server does not finish its initialize
+                handshake within its connect timeout.
+        """
+        if server_config.replicas > 1:
+            session = await self._connect_replicas(server_config)
+        else:
+            session, connection = await self._open_connection(server_config)
+            self._connections[server_config.name] = connection
 
         self.sessions[server_config.name] = session
+        self._lazy_servers.pop(server_config.name, None)
         logger.info(f"Connected to MCP server: {server_config.name}")
 
         return session
 
+    async def _open_connection(
+        self,
+        server_config: MCPServerConfig,
+        replica: Optional[int] = None,
+        on_lost: Optional[Callable[[mcp.ClientSession], None]] = None,
+    ) -> tuple[mcp.ClientSession, _ServerConnection]:
+        """Spawn one server process and wait for its session to initialize."""
+        timeout = server_config.connect_timeout or self.client_config.connect_timeout
+        ready: asyncio.Future = asyncio.get_running_loop().create_future()
+        stop = asyncio.Event()
+        suffix = f"-{replica}" if replica is not None else ""
+        task = asyncio.create_task(
+            self._serve_session(server_config, ready, stop, on_lost),
+            name=f"mcp-server-{server_config.name}{suffix}",
+        )
+
+        attributes = {"replica": replica} if replica is not None else {}
+        try:
+            with tracer.span("mcp.connect", server=server_config.name, **attributes):
+                session = await asyncio.wait_for(asyncio.shield(ready), timeout)
+        except BaseException:
+            stop.set()
+            task.cancel()
+            with suppress(BaseException):
+                await task
+            raise
+
+        return session, _ServerConnection(task=task, stop=stop)
+
+    async def _connect_replicas(self, server_config: MCPServerConfig) -> ReplicaPool:
+        """Spawn the replicas of a server and route its calls through a pool."""
+        timeout = server_config.connect_timeout or self.client_config.connect_timeout
+
+        async def connect(index: int, on_lost: Callable[[mcp.ClientSession], None]) -> Replica:
+            session, connection = await self._open_connection(server_config, index, on_lost)
+            return Replica(index, session, close=lambda: self._close_connection(connection, timeout))
+
+        pool = ReplicaPool(
+            server_config.name,
+            server_config.replicas,
+            connect,
+            health_check_interval=self.client_config.health_check_interval,
+            health_check_timeout=self.client_config.health_check_timeout,
+            acquire_timeout=timeout,
+        )
+        await pool.start()
+        self._pools[server_config.name] = pool
+        logger.info(f"Started {pool.live} of {server_config.replicas} replicas of {server_config.name}")
+        return pool
+
+    async def _close_connection(self, connection: _ServerConnection, timeout: float) -> None:
+        """Ask a connection to close, cancelling it if it does not within ``timeout``."""
+        connection.stop.set()
+        with suppress(Exception):
+            await asyncio.wait_for(connection.task, timeout)
+
+    async def _try_connect(self, server_config: MCPServerConfig) -> None:
+        """Connect to a server, logging instead of raising on failure."""
+        try:
+            await self.connect_to_server(server_config)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out connecting to server {server_config.name}")
+        except Exception as e:
+            logger.error(f"Failed to connect to server {server_config.name}: {e}")
+
+    def _is_lazy(self, server_config: MCPServerConfig) -> bool:
+        """Whether a server should only be spawned on first use."""
+        if server_config.lazy is not None:
+            return server_config.lazy
+        return self.client_config.lazy_connect
+
+    def _register_lazy_server(self, server_config: MCPServerConfig) -> None:
+        """Register a lazily connected server and the tools declared for it."""
+        self._lazy_servers[server_config.name] = server_config
+        if not self._declared_tools(server_config):
+            logger.warning(
+                f"Lazy server {server_config.name} declares no tools; "
+                f"its tools are unavailable until it is connected"
+            )
+        self._register_declared_tools(server_config)
+
+    def _declared_tools(self, server_config: MCPServerConfig) -> list[dict[str, Any]]:
+        """Tools of a not-yet-connected server, from the tool catalog or else from config."""
+        if self.tool_catalog:
+            cached = self.tool_catalog.get(server_config)
+            if cached is not None:
+                return cached
+        return server_config.tools
+
+    def _register_declared_tools(self, server_config: MCPServerConfig) -> None:
+        """Add the known tools of a not-yet-connected server."""
+        for tool in self._declared_tools(server_config):
+            tool_name = tool.get("name")
+            if not tool_name:
+                continue
+            self.tools[tool_name] = {
+                "name": tool_name,
+                "description": tool.get("description", ""),
+                "input_schema": tool.get("input_schema", {}),
+            }
+            self.tool_to_server[tool_name] = server_config.name
+
     async def connect_all_servers(self) -> None:
-        """Connect to all configured MCP servers."""
+        """
+        Connect to all configured MCP servers concurrently.
+
+        Each server gets its own connect timeout and the whole startup is bounded
+        by ``client.startup_timeout``; servers still connecting when the budget
+        runs out are abandoned. Lazy servers are only registered here and are
+        spawned the first time one of their tools is called.
+
+        With ``client.background_connect``, servers whose tools are in the tool
+        catalog are registered from it and connected in the background, so the
+        client can serve requests right away; calls to their tools wait for
+        the connection.
+        """
+        eager: list[MCPServerConfig] = []
         for server_config in self.server_configs:
-            if not server_config.command:
+            if server_config.transport not in TRANSPORTS:
+                logger.warning(f"Skipping server {server_config.name}: unknown transport {server_config.transport!r}")
+                continue
+            if server_config.transport == "stdio" and not server_config.command:
                 logger.warning(f"Skipping server {server_config.name}: no command specified")
                 continue
+            if server_config.transport == "memory" and server_config.replicas > 1:
+                # In-process replicas would all share the one loaded server instance
+                logger.warning(f"Skipping server {server_config.name}: the memory transport does not support replicas")
+                continue
+            if self._is_lazy(server_config):
+                self._register_lazy_server(server_config)
+                continue
+            if self.client_config.background_connect and self._has_cached_tools(server_config):
+                self._register_lazy_server(server_config)
+                self._connect_in_background(server_config)
+                continue
+            eager.append(server_config)
+
+        if not eager:
+            return
+
+        pending_tasks = {
+            asyncio.create_task(self._try_connect(server_config)): server_config
+            for server_config in eager
+        }
+        _, pending = await asyncio.wait(
+            pending_tasks,
+            timeout=self.client_config.startup_timeout,
+        )
+
+        for task in pending:
+            logger.error(
+                f"Server {pending_tasks[task].name} did not connect within the "
+                f"{self.client_config.startup_timeout}s startup budget"
+            )
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def _has_cached_tools(self, server_config: MCPServerConfig) -> bool:
+        """Whether the tool catalog has a current entry for a server."""
+        return self.tool_catalog is not None and self.tool_catalog.get(server_config) is not None
+
+    def _connect_in_background(self, server_config: MCPServerConfig) -> None:
+        """Start connecting a server whose tools are already registered."""
+
+        async def connect() -> None:
             try:
-                await self.connect_to_server(server_config)
+                await self._get_session(server_config.name)
             except Exception as e:
-                logger.error(f"Failed to connect to server {server_config.name}: {e}")
+                # Still registered as lazy, so the next call of one of its tools retries
+                logger.error(f"Background connect to server {server_config.name} failed: {e}")
+            finally:
+                self._background_connects.pop(server_config.name, None)
+
+        self._background_connects[server_config.name] = asyncio.create_task(
+            connect(),
+            name=f"mcp-connect-{server_config.name}",
+        )
+
+    async def _get_session(self, server_name: str) -> Union[mcp.ClientSession, ReplicaPool]:
+        """Return the session for a server, connecting lazy servers on demand."""
+        session = self.sessions.get(server_name)
+        if session:
+            return session
+
+        server_config = self._lazy_servers.get(server_name)
+        if not server_config:
+            raise RuntimeError(f"No session for server: {server_name}")
+
+        lock = self._connect_locks.setdefault(server_name, asyncio.Lock())
+        async with lock:
+            session = self.sessions.get(server_name)
+            if not session:
+                logger.info(f"Lazily connecting to MCP server: {server_name}")
+                session = await self.connect_to_server(server_config)
+                await self.discover_tools([server_name])
+        return session
 
-    async def discover_tools(self) -> dict[str, dict[str, Any]]:
+    async def discover_tools(
+        self,
+        server_names: Optional[list[str]] = None,
+    ) -> dict[str, dict[str, Any]]:
         """
         Discover all available tools from connected MCP servers.
 
+        Args:
+            server_names: Only refresh the tools of these servers, e.g. after a
+                reconnect. If None, tools are rediscovered from every server.
+
         Returns:
             Dictionary mapping tool names to their schemas.
         """
-        self.tools = {}
-        self.tool_to_server = {}
-
-        for server_name, session in self.sessions.items():
+        if server_names is None:
+            self.tools = {}
+            self.tool_to_server = {}
+            refresh = list(self.sessions)
+        else:
+            refresh = [name for name in server_names if name in self.sessions]
+            for tool_name, server_name in list(self.tool_to_server.items()):
+                if server_name in refresh:
+                    del self.tool_to_server[tool_name]
+                    self.tools.pop(tool_name, None)
+
+        for server_name in refresh:
+            session = self.sessions[server_name]
             try:
-                tools_response = await session.list_tools()
+                with tracer.span("mcp.list_tools", server=server_name) as span:
+                    tools_response = await session.list_tools()
+                    span.set_attribute("tools", len(tools_response.tools))
+                discovered = []
                 for tool in tools_response.tools:
                     tool_name = tool.name
                     self.tools[tool_name] = {
@@ -179,36 +613,33 @@ class MCPClient:
                         "input_schema": tool.inputSchema,
                     }
                     self.tool_to_server[tool_name] = server_name
+                    discovered.append(self.tools[tool_name])
                     logger.debug(f"Discovered tool: {tool_name} from {server_name}")
+                self._update_catalog(server_name, discovered)
             except Exception as e:
                 logger.error(f"Failed to discover tools from {server_name}: {e}")
 
-        logger.info(f"Discovered {len(self.tools)} tools from {len(self.sessions)} servers")
-        return self.tools
-
-    def _convert_tools_to_gemini_format(self) -> list[dict[str, Any]]:
-        """Convert MCP tools to Gemini function declarations format."""
-        gemini_tools = []
+        for server_config in self._lazy_servers.values():
+            self._register_declared_tools(server_config)
+        self._register_local_tools()
 
-        for tool_name, tool_info in self.tools.items():
-            input_schema = tool_info.get("input_schema", {})
+        self.tool_registry.sync(self.tools)
 
-            properties = input_schema.get("properties", {})
-            required = input_schema.get("required", [])
-
-            parameters = {
-                "type": "object",
-                "properties": properties,
-                "required": required,
-            }
+        logger.info(f"Discovered {len(self.tools)} tools from {len(self.sessions)} servers")
+        return self.tools
 
-            gemini_tools.append({
-                "name": tool_name,
-                "description": tool_info.get("description", ""),
-                "parameters": parameters,
-            })
+    def _update_catalog(self, server_name: str, tools: list[dict[str, Any]]) -> None:
+        """Persist the tools just discovered from a server."""
+        if not self.tool_catalog:
+            return
+        for server_config in self.server_configs:
+            if server_config.name == server_name:
+                self.tool_catalog.put(server_config, tools)
 
-        return gemini_tools
+    def _register_local_tools(self) -> None:
+        """Add the client's built-in tools, unless a server already provides one of that name."""
+        if self._result_limits_enabled() and READ_TOOL_NAME not in self.tool_to_server:
+            self.tools[READ_TOOL_NAME] = READ_TOOL_DECLARATION
 
     async def call_tool(self, tool_name: str, arguments: dict[str, Any]) -> Any:
         """
@@ -225,20 +656,256 @@ class MCPClient:
             raise ValueError(f"Unknown tool: {tool_name}")
 
         server_name = self.tool_to_server[tool_name]
-        session = self.sessions.get(server_name)
 
-        if not session:
-            raise RuntimeError(f"No session for server: {server_name}")
+        with tracer.span("mcp.call_tool", tool=tool_name, server=server_name) as span:
+            ttl = self._tool_cache_ttl(server_name, tool_name)
+            if ttl:
+                result, cached = await self.tool_cache.get_or_call(
+                    tool_name,
+                    arguments,
+                    ttl,
+                    lambda: self._call_server_tool(server_name, tool_name, arguments),
+                )
+                span.set_attribute("cache_hit", cached)
+            else:
+                result = await self._call_server_tool(server_name, tool_name, arguments)
+            span.set_attribute("is_error", bool(getattr(result, "isError", False)))
+        return result
+
+    async def _call_server_tool(self, server_name: str, tool_name: str, arguments: dict[str, Any]) -> Any:
+        """Forward a tool call to its server's session, within the concurrency caps."""
+        session = await self._get_session(server_name)
 
         logger.debug(f"Calling tool {tool_name} on {server_name} with args: {arguments}")
 
-        result = await session.call_tool(tool_name, arguments)
-        return result
+        # Take the per-server slot first so calls queued behind a busy server
+        # do not hold global slots that other servers could use.
+        waited = time.perf_counter()
+        async with self._get_server_semaphore(server_name), self._get_tool_semaphore():
+            span = current_span()
+            if span:
+                span.set_attribute("queued_seconds", round(time.perf_counter() - waited, 6))
+            return await session.call_tool(tool_name, arguments)
+
+    def _tool_cache_ttl(self, server_name: str, tool_name: str) -> Optional[float]:
+        """Result cache TTL configured for a tool, or None if it is not cached."""
+        for server_config in self.server_configs:
+            if server_config.name == server_name:
+                return server_config.tool_cache.get(tool_name, server_config.tool_cache.get("*"))
+        return None
+
+    def _get_tool_semaphore(self) -> asyncio.Semaphore:
+        """Semaphore capping concurrent tool calls across all servers."""
+        if self._tool_semaphore is None:
+            self._tool_semaphore = asyncio.Semaphore(self.client_config.max_concurrent_tool_calls)
+        return self._tool_semaphore
+
+    def _get_server_semaphore(self, server_name: str) -> asyncio.Semaphore:
+        """Semaphore capping concurrent tool calls to a single server, per replica."""
+        semaphore = self._server_semaphores.get(server_name)
+        if semaphore is None:
+            limit = self.client_config.max_concurrent_calls_per_server
+            replicas = 1
+            for server_config in self.server_configs:
+                if server_config.name == server_name:
+                    limit = server_config.max_concurrent_calls or limit
+                    replicas = max(1, server_config.replicas)
+            semaphore = asyncio.Semaphore(limit * replicas)
+            self._server_semaphores[server_name] = semaphore
+        return semaphore
+
+    async def _execute_function_call(self, tool_name: str, arguments: dict[str, Any]) -> dict[str, Any]:
+        """
+        Execute one Gemini function call and return its function response payload.
+
+        Failures are reported back to the model as an error response rather than
+        raised, so one failing tool does not abort the other calls of the turn.
+        """
+        if tool_name == READ_TOOL_NAME and tool_name not in self.tool_to_server:
+            return await self._read_stored_result(arguments)
+
+        try:
+            result = await self.call_tool(tool_name, arguments)
+            content = result.content if hasattr(result, "content") else str(result)
+            if hasattr(content, "__iter__") and not isinstance(content, str):
+                chunks = [item.text if hasattr(item, "text") else str(item) for item in content]
+            else:
+                chunks = [content]
+
+            limit = self._result_limit(tool_name)
+            if limit and self._exceeds_limit(chunks, limit):
+                # Stream the result to disk instead of joining it into the conversation
+                store = self._get_result_store()
+                stored = await asyncio.to_thread(store.spill, tool_name, chunks)
+                logger.info(f"Stored {stored.size} byte result of {tool_name} as {stored.handle}")
+                return store.preview(stored, limit)
+
+            return {"result": chunks[0] if isinstance(content, str) else "\n".join(chunks)}
+        except Exception as e:
+            logger.error(f"Tool call failed for {tool_name}: {e}")
+            return {"error": str(e)}
+
+    def _result_limits_enabled(self) -> bool:
+        """Whether any tool result can be spilled to the result store."""
+        return bool(self.client_config.tool_result_max_bytes) or any(
+            any(server_config.result_limits.values()) for server_config in self.server_configs
+        )
+
+    def _result_limit(self, tool_name: str) -> int:
+        """Size limit in bytes for a tool's result; 0 means unlimited."""
+        server_name = self.tool_to_server.get(tool_name)
+        for server_config in self.server_configs:
+            if server_config.name == server_name:
+                limits = server_config.result_limits
+                if tool_name in limits or "*" in limits:
+                    return limits.get(tool_name, limits.get("*")) or 0
+        return self.client_config.tool_result_max_bytes
+
+    @staticmethod
+    def _exceeds_limit(chunks: list[str], limit: int) -> bool:
+        """Whether a result's encoded text, newlines included, is larger than ``limit`` bytes."""
+        chars = sum(len(chunk) for chunk in chunks) + len(chunks) - 1
+        if chars > limit:
+            return True
+        # UTF-8 needs at most four bytes per character; only encode when in doubt
+        if chars * 4 <= limit:
+            return False
+        return sum(len(chunk.encode("utf-8")) for chunk in chunks) + len(chunks) - 1 > limit
+
+    def _get_result_store(self) -> ResultStore:
+        """The store for oversized results, created on first use."""
+        if self.result_store is None:
+            self.result_store = ResultStore(
+                directory=self.client_config.tool_result_dir,
+                preview_bytes=self.client_config.tool_result_preview_bytes,
+            )
+        return self.result_store
+
+    async def _read_stored_result(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        """Serve the built-in read_tool_result tool."""
+        if self.result_store is None:
+            return {"error": "No stored results"}
+        try:
+            offset = int(arguments.get("offset") or 0)
+            max_bytes = int(arguments.get("max_bytes") or 0) or None
+        except (TypeError, ValueError):
+            return {"error": "offset and max_bytes must be integers"}
+        return await asyncio.to_thread(
+            self.result_store.read,
+            str(arguments.get("result_handle", "")),
+            offset,
+            max_bytes,
+        )
+
+    async def _run_function_call(self, function_call: Any) -> genai.protos.Part:
+        """Execute one Gemini function call and wrap the outcome as a response part."""
+        tool_name = function_call.name
+        arguments = dict(function_call.args) if function_call.args else {}
+        response = await self._execute_function_call(tool_name, arguments)
+        return self._function_response_part(tool_name, response)
+
+    def _function_response_part(self, tool_name: str, response: dict[str, Any]) -> genai.protos.Part:
+        """Wrap a function response payload in a Gemini part."""
+        return genai.protos.Part(
+            function_response=genai.protos.FunctionResponse(
+                name=tool_name,
+                response=response,
+            )
+        )
+
+    async def _send_message(
+        self,
+        chat: genai.ChatSession,
+        content: Any,
+        priority: int,
+        estimated_tokens: int,
+        key: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Send a chat message through the shared scheduler using the async SDK.
+
+        Args:
+            chat: The chat session to send on.
+            content: Message text or function response parts.
+            priority: Scheduling priority of the request.
+            estimated_tokens: Tokens to reserve against the quota up front.
+            key: Fair-queuing key of the conversation, stable across its turns.
+            **kwargs: Extra arguments for ``send_message_async``.
+
+        Returns:
+            The Gemini response.
+        """
+        with tracer.span("gemini.send", model=self.gemini_config.model) as span:
+            async with self.scheduler.slot(estimated_tokens, priority, key=key) as ticket:
+                span.set_attribute("queued_seconds", round(time.time() - span.start_time, 6))
+                response = await chat.send_message_async(content, **kwargs)
+                ticket.actual_tokens = usage_tokens(response)
+            record_usage(span, response)
+        return response
+
+    def _start_chat(
+        self,
+        history: list[genai.protos.Content],
+    ) -> tuple[genai.ChatSession, dict[str, Any], Optional[str]]:
+        """
+        Start a chat, on a cached context of the conversation prefix if one exists.
+
+        Returns:
+            The chat, the keyword arguments for its first message and the key of
+            the cached context in use (None for a plain chat).
+        """
+        tools_config = self.tool_registry.gemini_tools()
+
+        if self.context_cache:
+            cached = self.context_cache.lookup(tools_config, self.tool_registry.fingerprint, history)
+            if cached:
+                # Tools and the cached turns live in the cached context
+                chat = cached.model.start_chat(history=history[cached.history_length:])
+                return chat, {}, cached.key
+
+        return self._model.start_chat(history=history), {"tools": tools_config}, None
+
+    def _plain_chat(
+        self,
+        history: list[genai.protos.Content],
+        cache_key: str,
+    ) -> tuple[genai.ChatSession, dict[str, Any]]:
+        """Drop a cached context the API refused and start a plain chat instead."""
+        logger.info("Cached context was rejected, retrying with a plain request")
+        self.context_cache.invalidate(cache_key)
+        chat = self._model.start_chat(history=history)
+        return chat, {"tools": self.tool_registry.gemini_tools()}
+
+    def create_session(
+        self,
+        conversation_history: Optional[list[dict[str, Any]]] = None,
+    ) -> ConversationSession:
+        """
+        Create a persistent conversation session.
+
+        The history is converted once; later calls with the session only append
+        the new turns, and old turns are trimmed to the configured token budget.
+
+        Args:
+            conversation_history: Optional list of previous messages to start from.
+
+        Returns:
+            The new session.
+        """
+        return ConversationSession(
+            history=self._convert_history_to_gemini(conversation_history or []),
+            token_budget=self.client_config.session_token_budget,
+            trim_strategy=self.client_config.session_trim_strategy,
+            keep_recent_turns=self.client_config.session_keep_recent_turns,
+        )
 
     async def process_message(
         self,
         message: str,
         conversation_history: Optional[list[dict[str, Any]]] = None,
+        priority: int = 0,
+        session: Optional[ConversationSession] = None,
     ) -> str:
         """
         Process a user message using Gemini and available MCP tools.
@@ -246,6 +913,11 @@ class MCPClient:
         Args:
             message: The user's message.
             conversation_history: Optional list of previous messages for context.
+                Ignored when ``session`` is given.
+            priority: Scheduling priority of this conversation's Gemini requests;
+                higher values are admitted first.
+            session: Persistent session to continue; the new turns are appended
+                to it and its history is trimmed to its token budget.
 
         Returns:
             The assistant's response.
@@ -253,40 +925,50 @@ class MCPClient:
         if not self._model:
             self._initialize_gemini()
 
-        history = conversation_history or []
-
-        gemini_tools = self._convert_tools_to_gemini_format()
-
-        tools_config = None
-        if gemini_tools:
-            tools_config = [genai.protos.Tool(
-                function_declarations=[
-                    genai.protos.FunctionDeclaration(
-                        name=t["name"],
-                        description=t["description"],
-                        parameters=genai.protos.Schema(
-                            type=genai.protos.Type.OBJECT,
-                            properties={
-                                k: genai.protos.Schema(
-                                    type=self._map_json_type_to_gemini(v.get("type", "string")),
-                                    description=v.get("description", ""),
-                                )
-                                for k, v in t["parameters"].get("properties", {}).items()
-                            },
-                            required=t["parameters"].get("required", []),
-                        ),
-                    )
-                    for t in gemini_tools
-                ]
-            )]
+        if session is None:
+            return await self._process_turn(message, self.create_session(conversation_history), priority)
 
-        chat = self._model.start_chat(history=self._convert_history_to_gemini(history))
+        async with session.lock:
+            response_text = await self._process_turn(message, session, priority)
+            await self._trim_session(session, priority)
+        return response_text
 
-        response = await asyncio.to_thread(
-            chat.send_message,
-            message,
-            tools=tools_config,
-        )
+    async def _process_turn(
+        self,
+        message: str,
+        session: ConversationSession,
+        priority: int,
+    ) -> str:
+        """Run one user turn to completion and record it in the session."""
+        contents = list(session.history)
+        estimated = estimate_tokens(message) + session.estimated_tokens
+
+        chat, send_kwargs, cache_key = self._start_chat(contents)
+        base = len(chat.history)
+
+        try:
+            response = await self._send_message(
+                chat,
+                message,
+                priority=priority,
+                estimated_tokens=estimated,
+                key=session.id,
+                **send_kwargs,
+            )
+        except Exception as e:
+            if cache_key is None or not is_cache_rejection(e):
+                raise
+            chat, send_kwargs = self._plain_chat(contents, cache_key)
+            base = len(chat.history)
+            response = await self._send_message(
+                chat,
+                message,
+                priority=priority,
+                estimated_tokens=estimated,
+                key=session.id,
+                **send_kwargs,
+            )
+        session.observe_prompt_tokens(getattr(response.usage_metadata, "prompt_token_count", None), len(contents))
 
         while response.candidates[0].content.parts:
             function_calls = [
@@ -298,43 +980,22 @@ class MCPClient:
             if not function_calls:
                 break
 
-            function_responses = []
-            for fc in function_calls:
-                tool_name = fc.name
-                arguments = dict(fc.args) if fc.args else {}
-
-                try:
-                    result = await self.call_tool(tool_name, arguments)
-                    content = result.content if hasattr(result, "content") else str(result)
-                    if hasattr(content, "__iter__") and not isinstance(content, str):
-                        content = "\n".join(
-                            item.text if hasattr(item, "text") else str(item)
-                            for item in content
-                        )
-                    function_responses.append(
-                        genai.protos.Part(
-                            function_response=genai.protos.FunctionResponse(
-                                name=tool_name,
-                                response={"result": content},
-                            )
-                        )
-                    )
-                except Exception as e:
-                    logger.error(f"Tool call failed for {tool_name}: {e}")
-                    function_responses.append(
-                        genai.protos.Part(
-                            function_response=genai.protos.FunctionResponse(
-                                name=tool_name,
-                                response={"error": str(e)},
-                            )
-                        )
-                    )
+            # Calls of the same turn are independent, so run them concurrently;
+            # gather keeps the response parts in the order Gemini asked for them.
+            function_responses = await asyncio.gather(
+                *(self._run_function_call(fc) for fc in function_calls)
+            )
 
-            response = await asyncio.to_thread(
-                chat.send_message,
-                function_responses,
+            response = await self._send_message(
+                chat,
+                list(function_responses),
+                priority=priority,
+                estimated_tokens=estimate_tokens(function_responses),
+                key=session.id,
             )
 
+        session.extend(chat.history[base:])
+
         response_text = ""
         for part in response.candidates[0].content.parts:
             if hasattr(part, "text"):
@@ -342,17 +1003,258 @@ class MCPClient:
 
         return response_text
 
-    def _map_json_type_to_gemini(self, json_type: str) -> int:
-        """Map JSON schema types to Gemini proto types."""
-        type_mapping = {
-            "string": genai.protos.Type.STRING,
-            "number": genai.protos.Type.NUMBER,
-            "integer": genai.protos.Type.INTEGER,
-            "boolean": genai.protos.Type.BOOLEAN,
-            "array": genai.protos.Type.ARRAY,
-            "object": genai.protos.Type.OBJECT,
-        }
-        return type_mapping.get(json_type, genai.protos.Type.STRING)
+    async def stream_message(
+        self,
+        message: str,
+        conversation_history: Optional[list[dict[str, Any]]] = None,
+        priority: int = 0,
+        session: Optional[ConversationSession] = None,
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        Process a user message like :meth:`process_message`, streaming the result.
+
+        Text is yielded as Gemini produces it, so callers can show the first
+        tokens before any tool round trips complete. Tool calls requested by the
+        model are announced with :class:`ToolCallStarted` and
+        :class:`ToolCallFinished` events as they run.
+
+        With a ``session``, the turn runs in a task that holds the session's
+        lock and buffers its events, so the lock is never held while the
+        caller is between events and is released when the turn finishes even
+        if the stream is not read to the end. Callers that may stop early
+        should wrap the stream in ``contextlib.aclosing()`` so the turn is
+        cancelled promptly instead of when the generator is collected.
+
+        Args:
+            message: The user's message.
+            conversation_history: Optional list of previous messages for context.
+                Ignored when ``session`` is given.
+            priority: Scheduling priority of this conversation's Gemini requests.
+            session: Persistent session to continue. The turn is recorded once
+                Gemini finishes it, unless the stream is closed before that.
+
+        Yields:
+            TextChunk, ToolCallStarted and ToolCallFinished events.
+        """
+        if not self._model:
+            self._initialize_gemini()
+
+        if session is None:
+            async for event in self._stream_turn(message, self.create_session(conversation_history), priority):
+                yield event
+            return
+
+        events: asyncio.Queue = asyncio.Queue()
+        turn = asyncio.create_task(self._run_stream_turn(message, session, priority, events))
+        turn.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            await turn
+        finally:
+            turn.cancel()
+
+    async def _run_stream_turn(
+        self,
+        message: str,
+        session: ConversationSession,
+        priority: int,
+        events: asyncio.Queue,
+    ) -> None:
+        """Stream a turn of a session into ``events`` while holding the session's lock."""
+        async with session.lock:
+            async for event in self._stream_turn(message, session, priority):
+                events.put_nowait(event)
+            await self._trim_session(session, priority)
+
+    async def _stream_turn(
+        self,
+        message: str,
+        session: ConversationSession,
+        priority: int,
+    ) -> AsyncIterator[StreamEvent]:
+        """Stream one user turn and record it in the session once complete."""
+        contents = list(session.history)
+
+        chat, send_kwargs, cache_key = self._start_chat(contents)
+        base = len(chat.history)
+        content: Any = message
+
+        estimated = estimate_tokens(message) + session.estimated_tokens
+
+        while True:
+            function_calls: list[Any] = []
+            chunks: asyncio.Queue = asyncio.Queue()
+            # The response is drained by a task so the scheduler slot and the
+            # span are released as soon as Gemini is done, however slowly the
+            # caller consumes the buffered chunks.
+            receiver = asyncio.create_task(
+                self._receive_stream(
+                    chat, content, send_kwargs, cache_key, contents, base,
+                    estimated, priority, session.id, chunks, function_calls,
+                )
+            )
+            receiver.add_done_callback(lambda _, queue=chunks: queue.put_nowait(None))
+            try:
+                while True:
+                    chunk = await chunks.get()
+                    if chunk is None:
+                        break
+                    yield chunk
+                chat, base = await receiver
+            finally:
+                receiver.cancel()
+            send_kwargs = {}
+            cache_key = None
+
+            if not function_calls:
+                session.extend(chat.history[base:])
+                return
+
+            calls = [
+                (fc.name, dict(fc.args) if fc.args else {})
+                for fc in function_calls
+            ]
+            for tool_name, arguments in calls:
+                yield ToolCallStarted(tool_name, arguments)
+
+            tasks = [
+                asyncio.create_task(self._timed_function_call(index, tool_name, arguments))
+                for index, (tool_name, arguments) in enumerate(calls)
+            ]
+            responses: list[Optional[dict[str, Any]]] = [None] * len(calls)
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    index, response_payload, duration = await next_done
+                    responses[index] = response_payload
+                    tool_name = calls[index][0]
+                    result = response_payload.get("result")
+                    yield ToolCallFinished(
+                        tool_name=tool_name,
+                        result=result if isinstance(result, str) or result is None else str(result),
+                        error=response_payload.get("error"),
+                        duration=duration,
+                    )
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+            content = [
+                self._function_response_part(tool_name, response_payload)
+                for (tool_name, _), response_payload in zip(calls, responses)
+            ]
+            estimated = estimate_tokens(responses)
+
+    async def _receive_stream(
+        self,
+        chat: Any,
+        content: Any,
+        send_kwargs: dict[str, Any],
+        cache_key: Optional[str],
+        contents: list[Any],
+        base: int,
+        estimated: int,
+        priority: int,
+        key: str,
+        chunks: asyncio.Queue,
+        function_calls: list[Any],
+    ) -> tuple[Any, int]:
+        """
+        Stream one Gemini response under a scheduler slot.
+
+        The slot is queued under the conversation's fair-queuing ``key``.
+        Text is put on ``chunks`` as it arrives and function calls are
+        collected in ``function_calls``.
+
+        Returns:
+            The chat the response was received on and its history length
+            before the request; both change if the cached context is refused.
+        """
+        with tracer.span("gemini.stream", model=self.gemini_config.model) as span:
+            async with self.scheduler.slot(estimated, priority, key=key) as ticket:
+                span.set_attribute("queued_seconds", round(time.time() - span.start_time, 6))
+                try:
+                    response = await chat.send_message_async(content, stream=True, **send_kwargs)
+                except Exception as e:
+                    if cache_key is None or not is_cache_rejection(e):
+                        raise
+                    chat, plain_kwargs = self._plain_chat(contents, cache_key)
+                    base = len(chat.history)
+                    response = await chat.send_message_async(content, stream=True, **plain_kwargs)
+
+                async for chunk in response:
+                    ticket.actual_tokens = usage_tokens(chunk) or ticket.actual_tokens
+                    if chunk.usage_metadata:
+                        record_usage(span, chunk)
+                    if not chunk.candidates:
+                        continue
+                    for part in chunk.candidates[0].content.parts:
+                        if part.function_call.name:
+                            function_calls.append(part.function_call)
+                        elif part.text:
+                            chunks.put_nowait(TextChunk(part.text))
+        return chat, base
+
+    async def _trim_session(self, session: ConversationSession, priority: int) -> None:
+        """Drop or summarize a session's oldest turns once it exceeds its token budget."""
+        if not session.needs_trimming():
+            return
+
+        index = session.trim_index()
+        if not index:
+            logger.warning("Session exceeds its token budget but has no turns that can be trimmed")
+            return
+
+        summary = None
+        if session.trim_strategy == "summarize":
+            try:
+                summary = await self._summarize_history(session.history[:index], priority)
+            except Exception as e:
+                logger.warning(f"Session summary failed, dropping old turns instead: {e}")
+
+        before = session.estimated_tokens
+        session.replace_prefix(index, summary)
+        logger.info(f"Trimmed {index} session turns (~{before} -> ~{session.estimated_tokens} tokens)")
+
+    async def _summarize_history(self, history: list[genai.protos.Content], priority: int) -> str:
+        """Ask Gemini for a short summary of earlier conversation turns."""
+        transcript = []
+        for content in history:
+            for part in content.parts:
+                if part.text:
+                    transcript.append(f"{content.role}: {part.text}")
+                elif part.function_call.name:
+                    transcript.append(f"{content.role} called tool {part.function_call.name}")
+                elif part.function_response.name:
+                    result = str(part.function_response.response)[:500]
+                    transcript.append(f"tool {part.function_response.name} returned: {result}")
+
+        prompt = (
+            "Summarize the following conversation so it can replace the original turns as context. "
+            "Keep facts, figures, tickers, decisions and open questions; omit pleasantries.\n\n"
+            + "\n".join(transcript)
+        )
+        # Housekeeping yields to the conversations' own requests
+        with tracer.span("gemini.summarize", model=self.gemini_config.model, turns=len(history)) as span:
+            async with self.scheduler.slot(estimate_tokens(prompt), priority - 1) as ticket:
+                response = await self._model.generate_content_async(prompt)
+                ticket.actual_tokens = usage_tokens(response)
+            record_usage(span, response)
+        return response.text
+
+    async def _timed_function_call(
+        self,
+        index: int,
+        tool_name: str,
+        arguments: dict[str, Any],
+    ) -> tuple[int, dict[str, Any], float]:
+        """Run a function call and report its position in the turn and duration."""
+        started = time.perf_counter()
+        response = await self._execute_function_call(tool_name, arguments)
+        return index, response, time.perf_counter() - started
 
     def _convert_history_to_gemini(
         self,
@@ -378,16 +1280,47 @@ class MCPClient:
 
     async def close(self) -> None:
         """Close all server connections."""
-        for server_name, session in self.sessions.items():
+        background = list(self._background_connects.values())
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+
+        for connection in self._connections.values():
+            connection.stop.set()
+
+        for server_name, connection in self._connections.items():
             try:
-                await session.__aexit__(None, None, None)
+                await connection.task
                 logger.info(f"Closed connection to {server_name}")
             except Exception as e:
                 logger.error(f"Error closing connection to {server_name}: {e}")
 
+        self._connections.clear()
+
+        for server_name, pool in self._pools.items():
+            try:
+                await pool.close()
+                logger.info(f"Closed replicas of {server_name}")
+            except Exception as e:
+                logger.error(f"Error closing replicas of {server_name}: {e}")
+
+        self._pools.clear()
         self.sessions.clear()
+        await shutdown_loaded_servers()
+
+        if self.context_cache:
+            await self.context_cache.close()
+
+        if self.scheduler and self._owns_scheduler:
+            await self.scheduler.close()
         self.tools.clear()
         self.tool_to_server.clear()
+        self.tool_registry.sync(self.tools)
+        self.tool_cache.clear()
+        if self.result_store:
+            self.result_store.close()
+            self.result_store = None
+        tracer.close()
 
 
 async def create_mcp_client(config_path: Optional[str] = None) -> MCPClient:
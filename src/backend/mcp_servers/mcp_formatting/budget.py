@@ -0,0 +1,44 @@
+"""Budget tracking for Gemini report generations."""
+
+import asyncio
+import time
+from collections import deque
+
+from google.genai import errors
+
+
+class LLMBudget:
+    """Sliding one-minute window of Gemini generations."""
+    
+    def __init__(self, calls_per_minute: int = 0):
+        """
+        Initialize the budget.
+        
+        Args:
+            calls_per_minute: Generations allowed per minute; 0 means unlimited
+        """
+        self.calls_per_minute = calls_per_minute
+        self._calls: deque[float] = deque()
+    
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - 60.0
+        while self._calls and self._calls[0] < cutoff:
+            self._calls.popleft()
+    
+    def exhausted(self) -> bool:
+        """Whether another generation would exceed the per-minute budget."""
+        if not self.calls_per_minute:
+            return False
+        self._prune()
+        return len(self._calls) >= self.calls_per_minute
+    
+    def record(self) -> None:
+        """Count a generation against the budget."""
+        self._calls.append(time.monotonic())
+
+
+def is_over_budget_error(error: Exception) -> bool:
+    """Whether an error means the LLM is out of quota or time."""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, errors.APIError) and error.code == 429
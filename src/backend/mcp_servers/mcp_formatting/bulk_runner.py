@@ -0,0 +1,393 @@
+"""
+Pipelined bulk report runner.
+
+Reads a JSONL manifest of report jobs and pushes them through three stages
+connected by bounded queues, each with its own number of workers:
+
+1. generate: the report HTML from a Formatter (Gemini or template)
+2. postprocess: strip stray markdown fences, optionally shrink inline images,
+   write the HTML file
+3. render: the PDF on the shared browser pool
+
+Network-bound generation overlaps with CPU-bound post-processing and
+rendering, and a full queue stalls the stage feeding it. Every stage
+transition is appended to a status log in the work directory and the
+generated HTML is checkpointed, so an interrupted run picks up where it
+stopped: finished jobs are skipped and generated reports are not generated
+again.
+
+Manifest lines look like:
+    {"id": "AAPL", "text_blocks": ["..."], "images": ["charts/aapl.png"], "output_path": "out/AAPL.pdf"}
+
+Usage:
+    python bulk_runner.py manifest.jsonl --work-dir runs/nightly
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+from common import strip_fences
+from config import (
+    BULK_LLM_CONCURRENCY,
+    BULK_POSTPROCESS_CONCURRENCY,
+    BULK_PDF_CONCURRENCY,
+    BULK_QUEUE_SIZE,
+    IMAGE_JPEG_QUALITY,
+)
+from images import compress_inline_images
+from src.backend.formatting.formater import Formatter
+from src.backend.tracing import tracer
+
+
+# Job states in the status log, in pipeline order
+GENERATED = "generated"
+POSTPROCESSED = "postprocessed"
+DONE = "done"
+FAILED = "failed"
+
+STATUS_LOG = "status.jsonl"
+
+# Characters not allowed in the file names derived from job ids
+_UNSAFE_FILE_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+@dataclass
+class ReportJob:
+    """One report of the manifest on its way through the pipeline."""
+
+    id: str
+    file_stem: str
+    text_blocks: list[str]
+    images: list[str]
+    output_path: Path
+    html: Optional[str] = None
+    started_at: float = field(default_factory=time.perf_counter)
+
+
+def file_stem(job_id: str) -> str:
+    """
+    File name stem for a job id, safe to use inside the work directory.
+
+    Path separators and other unsafe characters become underscores and
+    leading or trailing dots are dropped, so ``BRK/B`` becomes ``BRK_B``
+    and ``../x`` cannot leave the directory.
+    """
+    return _UNSAFE_FILE_CHARS.sub("_", job_id).strip("._")
+
+
+def read_manifest(path: Path, pdf_dir: Path) -> Iterator[ReportJob]:
+    """
+    Read report jobs from a JSONL manifest lazily.
+
+    Args:
+        path: Manifest with one JSON object per line
+        pdf_dir: Directory for PDFs of jobs without an output_path
+
+    Yields:
+        One job per manifest line
+
+    Raises:
+        ValueError: If a line is not a JSON object with text_blocks, or its
+            id is unusable or repeats an earlier one
+    """
+    # Ids and file stems seen so far; a repeat would share checkpoints and status
+    seen_ids: set[str] = set()
+    seen_stems: dict[str, str] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Manifest line {line_number} is not valid JSON: {e}") from None
+            if not isinstance(entry, dict) or not entry.get("text_blocks"):
+                raise ValueError(f"Manifest line {line_number} has no text_blocks")
+            job_id = str(entry.get("id") or f"line-{line_number}")
+            stem = file_stem(job_id)
+            if not stem:
+                raise ValueError(f"Manifest line {line_number} has an unusable id: {job_id!r}")
+            if job_id in seen_ids:
+                raise ValueError(f"Manifest line {line_number} repeats id {job_id!r}")
+            if stem in seen_stems:
+                raise ValueError(
+                    f"Manifest line {line_number}: id {job_id!r} maps to the same files as {seen_stems[stem]!r}"
+                )
+            seen_ids.add(job_id)
+            seen_stems[stem] = job_id
+            yield ReportJob(
+                id=job_id,
+                file_stem=stem,
+                text_blocks=list(entry["text_blocks"]),
+                images=list(entry.get("images") or []),
+                output_path=Path(entry.get("output_path") or pdf_dir / f"{stem}.pdf"),
+            )
+
+
+class BulkRunner:
+    """
+    Runs a manifest of reports through the generate, postprocess and render stages.
+    """
+
+    def __init__(
+        self,
+        formatter: Formatter,
+        work_dir: str,
+        llm_concurrency: int = BULK_LLM_CONCURRENCY,
+        postprocess_concurrency: int = BULK_POSTPROCESS_CONCURRENCY,
+        pdf_concurrency: int = BULK_PDF_CONCURRENCY,
+        queue_size: int = BULK_QUEUE_SIZE,
+        max_image_dimension: int = 0,
+        image_quality: int = IMAGE_JPEG_QUALITY,
+        render_pdf: Optional[Callable[[str, str], Awaitable[Any]]] = None):
+        """
+        Initialize the runner.
+
+        Args:
+            formatter: Produces the report HTML
+            work_dir: Directory for the status log, HTML files and default PDFs
+            llm_concurrency: Reports generated at once
+            postprocess_concurrency: HTML post-processing workers
+            pdf_concurrency: PDFs rendered at once
+            queue_size: Reports buffered between two stages
+            max_image_dimension: Downscale inline images to this longest side
+                before rendering; 0 leaves them as they are
+            image_quality: JPEG quality for recompressed images
+            render_pdf: Renders (html, output_path) to a PDF file; defaults
+                to the shared browser pool
+        """
+        self.formatter = formatter
+        self.work_dir = Path(work_dir)
+        self.html_dir = self.work_dir / "html"
+        self.pdf_dir = self.work_dir / "pdf"
+        self.llm_concurrency = max(1, llm_concurrency)
+        self.postprocess_concurrency = max(1, postprocess_concurrency)
+        self.pdf_concurrency = max(1, pdf_concurrency)
+        self.queue_size = max(1, queue_size)
+        self.max_image_dimension = max_image_dimension
+        self.image_quality = image_quality
+        self.render_pdf = render_pdf
+        self.counts = {DONE: 0, FAILED: 0, "skipped": 0}
+        self.manifest_error: Optional[str] = None
+        self._status_file = None
+
+    def load_status(self) -> dict[str, str]:
+        """Last recorded state of every job in the status log."""
+        states: dict[str, str] = {}
+        path = self.work_dir / STATUS_LOG
+        if not path.exists():
+            return states
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run
+                    continue
+                states[record["id"]] = record["status"]
+        return states
+
+    async def run(self, manifest_path: str) -> dict[str, int]:
+        """
+        Process every job of a manifest that has not finished in an earlier run.
+
+        Args:
+            manifest_path: JSONL manifest of report jobs
+
+        Returns:
+            Number of jobs done, failed and skipped as already done
+        """
+        self.html_dir.mkdir(parents=True, exist_ok=True)
+        self.pdf_dir.mkdir(parents=True, exist_ok=True)
+        shutdown_pool = None
+        if self.render_pdf is None:
+            from pdf_converter import get_browser_pool, shutdown_browser_pool
+            self.render_pdf = get_browser_pool().render
+            shutdown_pool = shutdown_browser_pool
+
+        states = self.load_status()
+        to_generate: asyncio.Queue = asyncio.Queue(self.queue_size)
+        to_postprocess: asyncio.Queue = asyncio.Queue(self.queue_size)
+        to_render: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        started = time.perf_counter()
+        self._status_file = open(self.work_dir / STATUS_LOG, "a", encoding="utf-8")
+        try:
+            await asyncio.gather(
+                self._feed(Path(manifest_path), states, to_generate, to_postprocess, to_render),
+                self._stage("generate", self._generate, to_generate, to_postprocess,
+                            self.llm_concurrency, self.postprocess_concurrency),
+                self._stage("postprocess", self._postprocess, to_postprocess, to_render,
+                            self.postprocess_concurrency, self.pdf_concurrency),
+                self._stage("render", self._render, to_render, None, self.pdf_concurrency, 0),
+            )
+        finally:
+            self._status_file.close()
+            self._status_file = None
+            if shutdown_pool:
+                self.render_pdf = None
+                await shutdown_pool()
+
+        sys.stderr.write(
+            f"Bulk run finished in {time.perf_counter() - started:.1f}s: {self.counts[DONE]} done, "
+            f"{self.counts[FAILED]} failed, {self.counts['skipped']} skipped\n"
+        )
+        sys.stderr.flush()
+        return dict(self.counts)
+
+    async def _feed(
+        self,
+        manifest_path: Path,
+        states: dict[str, str],
+        to_generate: asyncio.Queue,
+        to_postprocess: asyncio.Queue,
+        to_render: asyncio.Queue) -> None:
+        """Queue each unfinished job at the stage after its last checkpoint."""
+        try:
+            for job in read_manifest(manifest_path, self.pdf_dir):
+                state = states.get(job.id)
+                if state is None:
+                    await to_generate.put(job)
+                elif state == DONE and job.output_path.exists():
+                    self.counts["skipped"] += 1
+                elif state != GENERATED and self._html_path(job).exists():
+                    job.html = await asyncio.to_thread(self._html_path(job).read_text, encoding="utf-8")
+                    await to_render.put(job)
+                elif self._checkpoint_path(job).exists():
+                    job.html = await asyncio.to_thread(self._checkpoint_path(job).read_text, encoding="utf-8")
+                    await to_postprocess.put(job)
+                else:
+                    await to_generate.put(job)
+        except (OSError, ValueError) as e:
+            sys.stderr.write(f"Stopped reading manifest: {e}\n")
+            sys.stderr.flush()
+            self.manifest_error = str(e)
+        finally:
+            # Jobs already queued still finish after a manifest error
+            for _ in range(self.llm_concurrency):
+                await to_generate.put(None)
+
+    async def _stage(
+        self,
+        name: str,
+        handler: Callable[[ReportJob], Awaitable[None]],
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        workers: int,
+        downstream_workers: int) -> None:
+        """Run a stage's workers until the inbox is drained, then close the outbox."""
+
+        async def work() -> None:
+            while True:
+                job = await inbox.get()
+                if job is None:
+                    return
+                try:
+                    with tracer.span(f"bulk.{name}", job=job.id):
+                        await handler(job)
+                except Exception as e:
+                    sys.stderr.write(f"Job {job.id} failed in {name}: {e}\n")
+                    sys.stderr.flush()
+                    self.counts[FAILED] += 1
+                    self._record(job, FAILED, stage=name, error=str(e))
+                    continue
+                if outbox is not None:
+                    await outbox.put(job)
+
+        try:
+            await asyncio.gather(*(work() for _ in range(workers)))
+        finally:
+            if outbox is not None:
+                for _ in range(downstream_workers):
+                    await outbox.put(None)
+
+    async def _generate(self, job: ReportJob) -> None:
+        job.html = await self.formatter.format_async(job.images, job.text_blocks)
+        if not job.html:
+            raise ValueError("formatter returned no HTML")
+        await asyncio.to_thread(self._checkpoint_path(job).write_text, job.html, encoding="utf-8")
+        self._record(job, GENERATED)
+
+    async def _postprocess(self, job: ReportJob) -> None:
+        job.html = await asyncio.to_thread(self._clean_html, job.html)
+        await asyncio.to_thread(self._html_path(job).write_text, job.html, encoding="utf-8")
+        self._record(job, POSTPROCESSED)
+
+    async def _render(self, job: ReportJob) -> None:
+        job.output_path.parent.mkdir(parents=True, exist_ok=True)
+        await self.render_pdf(job.html, str(job.output_path))
+        # Keep only the jobs in flight in memory
+        job.html = None
+        self.counts[DONE] += 1
+        self._record(job, DONE, duration=round(time.perf_counter() - job.started_at, 3))
+
+    def _clean_html(self, html: str) -> str:
+        """Strip markdown fences around the document and shrink inline images."""
+        html = strip_fences(html)
+        if self.max_image_dimension > 0:
+            html = compress_inline_images(html, self.max_image_dimension, quality=self.image_quality)
+        return html
+
+    def _checkpoint_path(self, job: ReportJob) -> Path:
+        return self.html_dir / f"{job.file_stem}.generated.html"
+
+    def _html_path(self, job: ReportJob) -> Path:
+        return self.html_dir / f"{job.file_stem}.html"
+
+    def _record(self, job: ReportJob, status: str, **details: Any) -> None:
+        """Append a job's state change to the status log."""
+        record = {"id": job.id, "status": status, "time": time.time(), **details}
+        self._status_file.write(json.dumps(record) + "\n")
+        self._status_file.flush()
+
+
+def make_formatter(name: str) -> Formatter:
+    """Create the formatter selected on the command line."""
+    if name == "template":
+        from src.backend.formatting.template_formatter import TemplateFormatter
+        return TemplateFormatter()
+
+    from gemini_formatter import GeminiFormatter
+    return GeminiFormatter()
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate and render reports for every job in a JSONL manifest.")
+    parser.add_argument("manifest", help="JSONL file with one report job per line")
+    parser.add_argument("--work-dir", default="bulk_run", help="status log, HTML and default PDF directory")
+    parser.add_argument("--formatter", choices=("gemini", "template"), default="gemini")
+    parser.add_argument("--llm-concurrency", type=int, default=BULK_LLM_CONCURRENCY)
+    parser.add_argument("--postprocess-concurrency", type=int, default=BULK_POSTPROCESS_CONCURRENCY)
+    parser.add_argument("--pdf-concurrency", type=int, default=BULK_PDF_CONCURRENCY)
+    parser.add_argument("--queue-size", type=int, default=BULK_QUEUE_SIZE)
+    parser.add_argument("--max-image-dimension", type=int, default=0,
+                        help="downscale inline images to this longest side before rendering")
+    parser.add_argument("--image-quality", type=int, default=IMAGE_JPEG_QUALITY)
+    return parser.parse_args(argv)
+
+
+async def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    runner = BulkRunner(
+        make_formatter(args.formatter),
+        args.work_dir,
+        llm_concurrency=args.llm_concurrency,
+        postprocess_concurrency=args.postprocess_concurrency,
+        pdf_concurrency=args.pdf_concurrency,
+        queue_size=args.queue_size,
+        max_image_dimension=args.max_image_dimension,
+        image_quality=args.image_quality,
+    )
+    counts = await runner.run(args.manifest)
+    return 1 if counts[FAILED] or runner.manifest_error else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
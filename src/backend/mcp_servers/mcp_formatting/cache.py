@@ -0,0 +1,192 @@
+"""Content-addressed cache for generated reports."""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+
+def cache_key(
+    text_blocks: list[str],
+    images: list[Any],
+    system_prompt: str,
+    model: str,
+    temperature: float) -> str:
+    """
+    Compute the cache key for a report generation request.
+    
+    Args:
+        text_blocks: Text content of the report
+        images: Images with data and captions
+        system_prompt: System instruction sent to the model
+        model: Gemini model name
+        temperature: Generation temperature
+    
+    Returns:
+        Hex SHA-256 digest of the canonicalized inputs
+    """
+    payload = json.dumps(
+        {
+            "text_blocks": text_blocks,
+            "images": images,
+            "system_prompt": system_prompt,
+            "model": model,
+            "temperature": temperature,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ReportCache:
+    """
+    Two-tier report cache: an in-memory LRU backed by an optional directory.
+    
+    Entries older than the TTL are treated as misses in both tiers. The disk
+    tier is trimmed oldest-access-first once it grows past its size budget.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 128,
+        directory: Optional[str] = None,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: Optional[float] = None):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_entries: Maximum number of reports kept in memory
+            directory: Directory for the on-disk tier, or None to disable it
+            max_disk_bytes: Size budget of the on-disk tier
+            ttl_seconds: Lifetime of an entry, or None for no expiry
+        """
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+        
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.html"
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached HTML for a key, or None on a miss."""
+        entry = self._memory.get(key)
+        if entry is not None:
+            stored_at, html = entry
+            if not self._expired(stored_at):
+                self._memory.move_to_end(key)
+                return html
+            del self._memory[key]
+        
+        if not self.directory:
+            return None
+        
+        path = self._path(key)
+        try:
+            stat = path.stat()
+            if self._expired(stat.st_mtime):
+                self._remove_file(path)
+                return None
+            html = path.read_text(encoding="utf-8")
+            # Track last access in atime so eviction drops the coldest entries
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            sys.stderr.write(f"Cache read failed for {key}: {e}\n")
+            sys.stderr.flush()
+            return None
+        
+        self._remember(key, stat.st_mtime, html)
+        return html
+
+    def put(self, key: str, html: str) -> None:
+        """Store generated HTML under a key in every enabled tier."""
+        self._remember(key, time.time(), html)
+        
+        if not self.directory:
+            return
+        
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            previous = path.stat().st_size if path.exists() else 0
+            tmp_path.write_text(html, encoding="utf-8")
+            os.replace(tmp_path, path)
+        except OSError as e:
+            sys.stderr.write(f"Cache write failed for {key}: {e}\n")
+            sys.stderr.flush()
+            self._remove_file(tmp_path)
+            return
+        
+        if self._disk_bytes is not None:
+            self._disk_bytes += path.stat().st_size - previous
+        self._trim_disk()
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        self._memory.clear()
+        if self.directory:
+            for path in self.directory.glob("*.html"):
+                self._remove_file(path)
+        self._disk_bytes = 0
+
+    def _remember(self, key: str, stored_at: float, html: str) -> None:
+        self._memory[key] = (stored_at, html)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _remove_file(self, path: Path) -> None:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        if self._disk_bytes is not None and path.suffix == ".html":
+            self._disk_bytes -= size
+
+    def _trim_disk(self) -> None:
+        """Evict expired entries, then the least recently used, until under budget."""
+        if self._disk_bytes is not None and self._disk_bytes <= self.max_disk_bytes:
+            return
+        
+        entries = []
+        total = 0
+        for path in self.directory.glob("*.html"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if self._expired(stat.st_mtime):
+                self._remove_file(path)
+                continue
+            entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+            total += stat.st_size
+        
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+        
+        self._disk_bytes = total
@@ -0,0 +1,24 @@
+"""
+Helpers shared by the formatting server's modules.
+
+The server and its tools run as scripts from this directory. Importing this
+module makes the repository root importable, so any module here can use the
+shared code under src/ no matter which one is imported first.
+"""
+
+import re
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[4]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.append(str(REPO_ROOT))
+
+
+# Markdown fence the model sometimes wraps generated HTML in
+MARKDOWN_FENCE = re.compile(r"^\s*```(?:html)?\s*|\s*```\s*$", re.I)
+
+
+def strip_fences(html: str) -> str:
+    """Remove a markdown fence around generated HTML."""
+    return MARKDOWN_FENCE.sub("", html.strip())
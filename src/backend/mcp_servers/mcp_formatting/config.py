@@ -7,5 +7,67 @@ GOOGLE_API_KEY = ""
 DEFAULT_MODEL = "models/gemini-2.5-flash"
 TEMPERATURE = 0.7
 
+# Gemini Connection Settings
+GEMINI_MAX_CONNECTIONS = 20
+GEMINI_MAX_KEEPALIVE_CONNECTIONS = 10
+GEMINI_KEEPALIVE_EXPIRY = 60.0  # Seconds an idle connection stays open
+GEMINI_TIMEOUT_MS = 120_000
+GEMINI_WARMUP = True  # Open a connection when the server starts
+GEMINI_BASE_URL = ""  # Override the API endpoint, e.g. a local fake Gemini for testing
+
+# LLM Budget Settings (used by the "auto" mode to fall back to the template renderer)
+LLM_CALLS_PER_MINUTE = 0  # 0 means unlimited
+LLM_TIME_BUDGET_SECONDS = 60.0
+
+# Section-Parallel Generation Settings
+SECTION_BLOCKS = 3  # Text blocks per generated section
+SECTION_CONCURRENCY = 4  # Sections generated at once
+SECTION_RETRIES = 2  # Extra attempts for a failed section
+
+# Incremental Regeneration Settings (format_report with a report_id in sections mode)
+INCREMENTAL_MAX_REPORTS = 64  # Reports whose sections are remembered
+INCREMENTAL_TTL_SECONDS = 24 * 60 * 60  # How long a report's sections can be reused
+INCREMENTAL_MAX_BYTES = 64 * 1024 * 1024  # Total size of remembered section fragments
+
+# Image Settings
+IMAGE_MAX_DIMENSION = 1600  # Longest side in pixels before downscaling
+IMAGE_MAX_BYTES = 512 * 1024  # Recompress images larger than this
+IMAGE_JPEG_QUALITY = 85
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024  # Total size of recently prepared images kept for reuse
+INLINE_IMAGE_MAX_BYTES = 4 * 1024 * 1024  # Larger images are sent through the Files API
+UPLOADED_FILES_MAX_ENTRIES = 256  # Files API uploads remembered for reuse; older ones are uploaded again
+
+# Job Queue Settings (submit_report and the format_report wrapper)
+JOB_WORKERS = 4  # Reports generated at once
+JOB_QUEUE_SIZE = 32  # Reports waiting for a worker before submissions are refused
+JOB_RESULT_TTL_SECONDS = 3600  # How long finished results can be fetched
+JOB_MAX_FINISHED = 256  # Finished jobs kept at most
+
+# Report Cache Settings
+CACHE_ENABLED = True
+CACHE_MAX_ENTRIES = 128
+CACHE_DIR = ""  # Directory for the on-disk tier; empty disables it
+CACHE_MAX_DISK_BYTES = 256 * 1024 * 1024
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
 # PDF Settings
-DEFAULT_PDF_OUTPUT = "report.pdf"
\ No newline at end of file
+DEFAULT_PDF_OUTPUT = "report.pdf"
+PDF_POOL_SIZE = 4  # Pages that can render concurrently
+PDF_BROWSER_COUNT = 1  # Chromium processes the pages are spread over
+PDF_MAX_RENDERS_PER_PAGE = 50  # Recreate a page's context after this many renders
+PDF_MAX_RENDERS_PER_BROWSER = 500  # Relaunch a browser after this many renders
+
+# Bulk Runner Settings (bulk_runner.py)
+BULK_LLM_CONCURRENCY = 8  # Reports generated at once
+BULK_POSTPROCESS_CONCURRENCY = 2  # HTML post-processing workers
+BULK_PDF_CONCURRENCY = 4  # PDFs rendered at once
+BULK_QUEUE_SIZE = 16  # Reports buffered between two stages
+
+# Transport Settings
+MCP_TRANSPORT = "stdio"  # "stdio", or "streamable-http" to serve over local HTTP
+MCP_HOST = "127.0.0.1"  # Address and port of the streamable-http endpoint (path /mcp)
+MCP_PORT = 8765
+
+# Tracing Settings
+TRACE_JSONL_PATH = ""  # Append stage timing spans to this JSON lines file; empty disables it
+TRACE_PROMETHEUS_PATH = ""  # Write stage latency histograms here in Prometheus text format
\ No newline at end of file
@@ -1,21 +1,171 @@
 """Gemini API client."""
 
+import asyncio
+import io
+import json
 import sys
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import httpx
 from google import genai
 from google.genai import types
-from typing import Any
 
-from config import GOOGLE_API_KEY, DEFAULT_MODEL, TEMPERATURE
+import common  # noqa: F401  Makes the repository root importable
+from config import (
+    GOOGLE_API_KEY,
+    DEFAULT_MODEL,
+    TEMPERATURE,
+    GEMINI_MAX_CONNECTIONS,
+    GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+    GEMINI_KEEPALIVE_EXPIRY,
+    GEMINI_TIMEOUT_MS,
+    GEMINI_BASE_URL,
+    INLINE_IMAGE_MAX_BYTES,
+    UPLOADED_FILES_MAX_ENTRIES,
+)
+from images import PreparedImage, prepare_images, substitute_image_references
+from src.backend.tracing import record_usage, tracer
+
+
+# Files API uploads expire after 48 hours; re-upload a little earlier
+FILE_UPLOAD_TTL_SECONDS = 47 * 60 * 60
+
+# Uploaded images keyed by image id: (upload time, file URI, MIME type), oldest first
+_uploaded_files: OrderedDict[str, tuple[float, str, str]] = OrderedDict()
+
 
+def _remember_upload(image_id: str, uploaded: tuple[float, str, str]) -> None:
+    """Record an upload, forgetting expired ones and the oldest beyond the entry limit."""
+    _uploaded_files[image_id] = uploaded
+    _uploaded_files.move_to_end(image_id)
+    cutoff = time.time() - FILE_UPLOAD_TTL_SECONDS
+    while _uploaded_files:
+        oldest_id, (uploaded_at, _, _) = next(iter(_uploaded_files.items()))
+        if uploaded_at >= cutoff and len(_uploaded_files) <= UPLOADED_FILES_MAX_ENTRIES:
+            break
+        del _uploaded_files[oldest_id]
 
-def initialize_client():
-    """Initialize and return Gemini client."""
+
+def initialize_client(
+    max_connections: int = GEMINI_MAX_CONNECTIONS,
+    max_keepalive_connections: int = GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry: float = GEMINI_KEEPALIVE_EXPIRY,
+    timeout_ms: int = GEMINI_TIMEOUT_MS):
+    """Initialize and return Gemini client with a pooled keep-alive HTTP stack."""
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
     return genai.Client(
         api_key=GOOGLE_API_KEY,
-        http_options=types.HttpOptions(api_version='v1beta')
+        http_options=types.HttpOptions(
+            api_version='v1beta',
+            base_url=GEMINI_BASE_URL or None,
+            timeout=timeout_ms,
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+        )
     )
 
 
+class GeminiClientManager:
+    """
+    Owns the process-wide Gemini client.
+    
+    The client and its connection pool are created once and reused by every
+    request, so TLS handshakes and pool setup are not paid per call.
+    """
+    
+    def __init__(self):
+        self._client: Optional[genai.Client] = None
+    
+    def get(self) -> genai.Client:
+        """Return the shared client, creating it on first use."""
+        if self._client is None:
+            self._client = initialize_client()
+        return self._client
+    
+    async def warm_up(self, model: str = DEFAULT_MODEL) -> None:
+        """Open a pooled connection ahead of the first real request."""
+        try:
+            await self.get().aio.models.get(model=model)
+            sys.stderr.write("Gemini client warmed up\n")
+        except Exception as e:
+            sys.stderr.write(f"Gemini warm-up failed: {e}\n")
+        sys.stderr.flush()
+    
+    async def aclose(self) -> None:
+        """Close the shared client's connections."""
+        client, self._client = self._client, None
+        if client is None:
+            return
+        
+        try:
+            aclose = getattr(client.aio, "aclose", None)
+            if aclose:
+                await aclose()
+            close = getattr(client, "close", None)
+            if close:
+                close()
+        except Exception as e:
+            sys.stderr.write(f"Error closing Gemini client: {e}\n")
+            sys.stderr.flush()
+
+
+# Process-wide client shared by every tool call
+client_manager = GeminiClientManager()
+
+
+def get_client() -> genai.Client:
+    """Return the process-wide Gemini client."""
+    return client_manager.get()
+
+
+async def build_image_parts(
+    client: genai.Client,
+    images: dict[str, PreparedImage]) -> list[types.Part]:
+    """
+    Build request parts for prepared images.
+    
+    Each image is labelled with its id so the model can reference it. Small
+    images are sent inline as binary parts; large ones are uploaded once
+    through the Files API and referenced by URI afterwards.
+    
+    Args:
+        client: Initialized Gemini client
+        images: Prepared images by id
+    
+    Returns:
+        List of request parts
+    """
+    parts = []
+    
+    for image_id, image in images.items():
+        parts.append(types.Part(text=f"Image {image_id}:"))
+        
+        if len(image.data) <= INLINE_IMAGE_MAX_BYTES:
+            parts.append(types.Part.from_bytes(data=image.data, mime_type=image.mime_type))
+            continue
+        
+        uploaded = _uploaded_files.get(image_id)
+        if uploaded is not None:
+            _uploaded_files.move_to_end(image_id)
+        if uploaded is None or time.time() - uploaded[0] > FILE_UPLOAD_TTL_SECONDS:
+            file = await client.aio.files.upload(
+                file=io.BytesIO(image.data),
+                config=types.UploadFileConfig(mime_type=image.mime_type),
+            )
+            uploaded = (time.time(), file.uri, file.mime_type or image.mime_type)
+            _remember_upload(image_id, uploaded)
+        
+        parts.append(types.Part.from_uri(file_uri=uploaded[1], mime_type=uploaded[2]))
+    
+    return parts
+
+
 async def generate_html(
     client: genai.Client,
     user_data: dict[str, Any],
@@ -27,7 +177,8 @@ async def generate_html(
     
     Args:
         client: Initialized Gemini client
-        user_data: Dictionary with text_blocks and images
+        user_data: Dictionary with text_blocks and images, plus any extra
+            context keys the system prompt expects
         system_prompt: System instruction for AI
         model: Gemini model to use
         temperature: Generation temperature
@@ -38,35 +189,48 @@ async def generate_html(
     Raises:
         Exception: If API call fails
     """
-    sys.stderr.write("Sending request to Gemini...\n")
-    sys.stderr.flush()
-    
-    response = await client.aio.models.generate_content(
-        model=model,
-        contents=[
+    with tracer.span("formatting.generate_html", model=model, text_blocks=len(user_data.get("text_blocks") or [])) as span:
+        # Images travel as binary parts; the prompt only carries their ids and captions.
+        # Decoding and downscaling is CPU-bound, so keep it off the event loop.
+        manifest, images = await asyncio.to_thread(prepare_images, user_data.get("images") or [])
+        payload = {key: value for key, value in user_data.items() if key != "images"}
+        payload["text_blocks"] = user_data.get("text_blocks") or []
+        payload["images"] = manifest
+        parts = [types.Part(text=json.dumps(payload, ensure_ascii=False))]
+        parts.extend(await build_image_parts(client, images))
+        
+        sys.stderr.write("Sending request to Gemini...\n")
+        sys.stderr.flush()
+        
+        contents = [
             types.Content(
                 role="user",
-                parts=[types.Part(text=str(user_data))]
+                parts=parts
             )
-        ],
-        config=types.GenerateContentConfig(
-            system_instruction=types.Content(
-                parts=[types.Part(text=system_prompt)]
+        ]
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=contents,
+            config=types.GenerateContentConfig(
+                system_instruction=types.Content(
+                    parts=[types.Part(text=system_prompt)]
+                ),
+                temperature=temperature,
             ),
-            temperature=temperature,
-        ),
-    )
-    
-    sys.stderr.write("Received response from Gemini\n")
-    sys.stderr.flush()
-    
-    # Extract HTML from response
-    html = response.text
-    if not html:
-        html = "".join(
-            part.text
-            for part in response.candidates[0].content.parts
-            if hasattr(part, "text")
         )
+        
+        sys.stderr.write("Received response from Gemini\n")
+        sys.stderr.flush()
+        span.set_attribute("images", len(images))
+        record_usage(span, response)
+        
+        # Extract HTML from response
+        html = response.text
+        if not html:
+            html = "".join(
+                part.text
+                for part in response.candidates[0].content.parts
+                if hasattr(part, "text")
+            )
     
-    return html
+    return substitute_image_references(html, images)
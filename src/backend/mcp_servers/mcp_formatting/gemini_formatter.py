@@ -0,0 +1,83 @@
+"""Formatter backed by Gemini generation."""
+
+import asyncio
+from typing import List, Optional
+
+from google import genai
+
+import common  # noqa: F401  Makes the repository root importable
+from config import DEFAULT_MODEL, TEMPERATURE
+from gemini_client import GeminiClientManager, generate_html, get_client
+from prompts import FORMATTING_PROMPT
+from src.backend.formatting.formater import Formatter
+from src.backend.formatting.template_formatter import load_images
+
+
+class GeminiFormatter(Formatter):
+    """Formatter that generates the report HTML with Gemini, like format_report."""
+
+    def __init__(
+        self,
+        client: Optional[genai.Client] = None,
+        system_prompt: str = FORMATTING_PROMPT,
+        model: str = DEFAULT_MODEL,
+        temperature: float = TEMPERATURE):
+        """
+        Initialize the formatter.
+
+        Args:
+            client: Gemini client; defaults to the shared pooled client,
+                or to a client of its own for each synchronous format call
+            system_prompt: System instruction for the model
+            model: Gemini model to use
+            temperature: Generation temperature
+        """
+        self.client = client
+        self.system_prompt = system_prompt
+        self.model = model
+        self.temperature = temperature
+
+    def format(self, image_paths: List[str], text: List[str]) -> str:
+        """
+        Formats images and text into a report
+        Params:
+            paths or URLs of images
+            text to put in report
+        Returns:
+            report HTML
+        """
+        return asyncio.run(self._format_once(image_paths, text))
+
+    async def _format_once(self, image_paths: List[str], text: List[str]) -> str:
+        """Format on a client of this call's own, closed before its event loop ends."""
+        if self.client is not None:
+            return await self._format(self.client, image_paths, text)
+        # The shared client's connections belong to the loop that opened them,
+        # and asyncio.run closes its loop after every call
+        manager = GeminiClientManager()
+        try:
+            return await self._format(manager.get(), image_paths, text)
+        finally:
+            await manager.aclose()
+
+    async def format_async(self, image_paths: List[str], text: List[str]) -> str:
+        """
+        Formats images and text into a report without blocking the event loop
+        Params:
+            paths or URLs of images
+            text to put in report
+        Returns:
+            report HTML
+        """
+        return await self._format(self.client or get_client(), image_paths, text)
+
+    async def _format(self, client: genai.Client, image_paths: List[str], text: List[str]) -> str:
+        # Reading local images is file I/O; keep it off the event loop
+        images = await asyncio.to_thread(load_images, image_paths)
+        return await generate_html(
+            client,
+            {"text_blocks": text, "images": images},
+            self.system_prompt,
+            self.model,
+            self.temperature,
+        )
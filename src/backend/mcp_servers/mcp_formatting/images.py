@@ -0,0 +1,294 @@
+"""Image preparation for Gemini requests."""
+
+import base64
+import binascii
+import hashlib
+import io
+import re
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+try:
+    from PIL import Image
+except ImportError:  # Downscaling is skipped without Pillow
+    Image = None
+
+from config import IMAGE_MAX_DIMENSION, IMAGE_MAX_BYTES, IMAGE_JPEG_QUALITY, IMAGE_CACHE_MAX_BYTES
+
+
+# Prefix the model uses to reference an attached image in generated HTML
+IMAGE_REF_SCHEME = "cid:"
+
+_DATA_URI = re.compile(r"^data:(?P<mime>[\w.+-]+/[\w.+-]+)?(?:;[^,]*?)?;base64,(?P<data>.*)$", re.S)
+_IMAGE_REF = re.compile(re.escape(IMAGE_REF_SCHEME) + r"(img_[0-9a-f]{16})")
+_INLINE_IMAGE = re.compile(r"data:(?P<mime>image/[\w.+-]+);base64,(?P<data>[A-Za-z0-9+/=]+)")
+
+# Recently prepared images keyed by the hash of their original bytes and settings,
+# bounded by count and by total size (without Pillow they are full-size originals)
+_prepared_cache: OrderedDict[str, "PreparedImage"] = OrderedDict()
+_prepared_cache_lock = threading.Lock()
+_prepared_cache_bytes = 0
+_PREPARED_CACHE_SIZE = 256
+
+
+@dataclass
+class PreparedImage:
+    """An image ready to be attached to a Gemini request."""
+    
+    id: str
+    mime_type: str
+    data: bytes
+    
+    @property
+    def data_uri(self) -> str:
+        """The image as an inline data URI for the final HTML."""
+        encoded = base64.b64encode(self.data).decode("ascii")
+        return f"data:{self.mime_type};base64,{encoded}"
+
+
+def _sniff_mime_type(data: bytes) -> str:
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/png"
+
+
+def decode_image(data: str) -> Optional[tuple[bytes, str]]:
+    """
+    Decode a data URI or bare base64 string.
+    
+    Args:
+        data: Image data as sent by the caller
+    
+    Returns:
+        Tuple of (raw bytes, MIME type), or None if data is not base64 image data
+    """
+    match = _DATA_URI.match(data.strip())
+    encoded = match.group("data") if match else data.strip()
+    try:
+        raw = base64.b64decode(encoded, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    if not raw:
+        return None
+    mime_type = (match.group("mime") if match else None) or _sniff_mime_type(raw)
+    return raw, mime_type
+
+
+def downscale(
+    data: bytes,
+    mime_type: str,
+    max_dimension: int = IMAGE_MAX_DIMENSION,
+    max_bytes: int = IMAGE_MAX_BYTES,
+    quality: int = IMAGE_JPEG_QUALITY) -> tuple[bytes, str]:
+    """
+    Shrink an image to fit the configured dimension and size limits.
+    
+    Args:
+        data: Raw image bytes
+        mime_type: MIME type of the image
+        max_dimension: Longest allowed side in pixels
+        max_bytes: Size above which the image is recompressed
+        quality: JPEG quality used when recompressing
+    
+    Returns:
+        Tuple of (image bytes, MIME type); the input is returned unchanged
+        if Pillow is unavailable or recompressing does not help
+    """
+    if Image is None or mime_type == "image/svg+xml":
+        return data, mime_type
+    
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            resize = max(img.size) > max_dimension
+            if not resize and len(data) <= max_bytes:
+                return data, mime_type
+            
+            img.load()
+            if resize:
+                img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+            
+            out = io.BytesIO()
+            has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+            if has_alpha:
+                img.save(out, format="PNG", optimize=True)
+                new_mime = "image/png"
+            else:
+                img.convert("RGB").save(out, format="JPEG", quality=quality, optimize=True)
+                new_mime = "image/jpeg"
+    except Exception as e:
+        sys.stderr.write(f"Could not downscale image: {e}\n")
+        sys.stderr.flush()
+        return data, mime_type
+    
+    result = out.getvalue()
+    if not resize and len(result) >= len(data):
+        return data, mime_type
+    return result, new_mime
+
+
+def prepare_image(
+    data: str,
+    max_dimension: int = IMAGE_MAX_DIMENSION,
+    max_bytes: int = IMAGE_MAX_BYTES,
+    quality: int = IMAGE_JPEG_QUALITY) -> Optional[PreparedImage]:
+    """
+    Decode, deduplicate and downscale one base64 image.
+    
+    Args:
+        data: Data URI or bare base64 string
+        max_dimension: Longest allowed side in pixels
+        max_bytes: Size above which the image is recompressed
+        quality: JPEG quality used when recompressing
+    
+    Returns:
+        The prepared image, or None if data could not be decoded
+    """
+    decoded = decode_image(data)
+    if decoded is None:
+        return None
+    raw, mime_type = decoded
+    
+    digest = hashlib.sha256(raw).hexdigest()
+    cache_key = f"{digest}:{max_dimension}:{max_bytes}:{quality}"
+    with _prepared_cache_lock:
+        cached = _prepared_cache.get(cache_key)
+        if cached is not None:
+            _prepared_cache.move_to_end(cache_key)
+            return cached
+    
+    raw, mime_type = downscale(raw, mime_type, max_dimension, max_bytes, quality)
+    prepared = PreparedImage(id=f"img_{digest[:16]}", mime_type=mime_type, data=raw)
+    
+    _cache_prepared(cache_key, prepared)
+    return prepared
+
+
+def _cache_prepared(cache_key: str, prepared: PreparedImage) -> None:
+    """Keep a prepared image for reuse, evicting the oldest beyond the count and size limits."""
+    global _prepared_cache_bytes
+    if len(prepared.data) > IMAGE_CACHE_MAX_BYTES:
+        return
+    
+    with _prepared_cache_lock:
+        previous = _prepared_cache.pop(cache_key, None)
+        if previous is not None:
+            _prepared_cache_bytes -= len(previous.data)
+        _prepared_cache[cache_key] = prepared
+        _prepared_cache_bytes += len(prepared.data)
+        while len(_prepared_cache) > _PREPARED_CACHE_SIZE or _prepared_cache_bytes > IMAGE_CACHE_MAX_BYTES:
+            _, evicted = _prepared_cache.popitem(last=False)
+            _prepared_cache_bytes -= len(evicted.data)
+
+
+def prepare_images(
+    images: list[Any],
+    max_dimension: int = IMAGE_MAX_DIMENSION,
+    max_bytes: int = IMAGE_MAX_BYTES,
+    quality: int = IMAGE_JPEG_QUALITY) -> tuple[list[dict[str, Any]], dict[str, PreparedImage]]:
+    """
+    Split caller images into a prompt manifest and deduplicated binary images.
+    
+    Args:
+        images: Images as dicts with data and caption, or bare data strings
+        max_dimension: Longest allowed side in pixels
+        max_bytes: Size above which the image is recompressed
+        quality: JPEG quality used when recompressing
+    
+    Returns:
+        Tuple of (manifest entries for the prompt, prepared images by id)
+    """
+    manifest: list[dict[str, Any]] = []
+    prepared: dict[str, PreparedImage] = {}
+    
+    for image in images or []:
+        if isinstance(image, dict):
+            data = image.get("data") or ""
+            caption = image.get("caption") or ""
+        else:
+            data, caption = str(image or ""), ""
+        
+        if not data:
+            continue
+        
+        if not isinstance(data, str):
+            sys.stderr.write(f"Skipping image with non-string data ({type(data).__name__})\n")
+            sys.stderr.flush()
+            continue
+        
+        if data.startswith(("http://", "https://")):
+            manifest.append({"url": data, "caption": caption})
+            continue
+        
+        image_part = prepare_image(data, max_dimension, max_bytes, quality)
+        if image_part is None:
+            sys.stderr.write("Skipping image with undecodable data\n")
+            sys.stderr.flush()
+            continue
+        
+        prepared[image_part.id] = image_part
+        manifest.append({"id": image_part.id, "caption": caption})
+    
+    return manifest, prepared
+
+
+def substitute_image_references(html: str, images: dict[str, PreparedImage]) -> str:
+    """
+    Replace ``cid:img_...`` references in generated HTML with data URIs.
+    
+    Args:
+        html: HTML produced by the model
+        images: Prepared images by id
+    
+    Returns:
+        HTML with every known image reference inlined
+    """
+    if not images:
+        return html
+    
+    def replace(match: re.Match) -> str:
+        image = images.get(match.group(1))
+        return image.data_uri if image else match.group(0)
+    
+    return _IMAGE_REF.sub(replace, html)
+
+
+def compress_inline_images(
+    html: str,
+    max_dimension: int = IMAGE_MAX_DIMENSION,
+    max_bytes: int = IMAGE_MAX_BYTES,
+    quality: int = IMAGE_JPEG_QUALITY) -> str:
+    """
+    Downscale and recompress the data URI images embedded in HTML.
+    
+    Args:
+        html: HTML with inline images
+        max_dimension: Longest allowed side in pixels
+        max_bytes: Size above which an image is recompressed
+        quality: JPEG quality used when recompressing
+    
+    Returns:
+        HTML with oversized images replaced; unchanged without Pillow
+    """
+    if Image is None:
+        return html
+    
+    def replace(match: re.Match) -> str:
+        try:
+            raw = base64.b64decode(match.group("data"), validate=True)
+        except (binascii.Error, ValueError):
+            return match.group(0)
+        data, mime_type = downscale(raw, match.group("mime"), max_dimension, max_bytes, quality)
+        if data is raw:
+            return match.group(0)
+        return f"data:{mime_type};base64,{base64.b64encode(data).decode('ascii')}"
+    
+    return _INLINE_IMAGE.sub(replace, html)
@@ -0,0 +1,203 @@
+"""Incremental regeneration of sectioned reports."""
+
+import hashlib
+import json
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from google import genai
+
+import common  # noqa: F401  Makes the repository root importable
+from config import (
+    DEFAULT_MODEL,
+    TEMPERATURE,
+    SECTION_BLOCKS,
+    SECTION_CONCURRENCY,
+    INCREMENTAL_MAX_REPORTS,
+    INCREMENTAL_TTL_SECONDS,
+    INCREMENTAL_MAX_BYTES,
+)
+from prompts import SECTION_PROMPT
+from sections import ReportSection, render_sections, report_title, split_sections, stitch_sections
+from src.backend.tracing import current_span
+
+
+def section_fingerprint(section: ReportSection, model: str, temperature: float) -> str:
+    """
+    Fingerprint every input that affects the generated fragment of a section.
+    
+    Args:
+        section: Section of the report
+        model: Gemini model name
+        temperature: Generation temperature
+    
+    Returns:
+        Hex SHA-256 digest of the canonicalized section input
+    """
+    payload = json.dumps(
+        {
+            "input": section.user_data,
+            "system_prompt": SECTION_PROMPT,
+            "model": model,
+            "temperature": temperature,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class RenderedReport:
+    """Section fragments of the last render of a report."""
+    
+    fingerprints: list[str]
+    fragments: list[str]
+    stored_at: float = field(default_factory=time.time)
+    
+    @property
+    def size(self) -> int:
+        """Approximate memory held by the fragments, inlined images included."""
+        return sum(len(fragment) for fragment in self.fragments)
+
+
+class SectionStore:
+    """
+    Last render of each report by report_id.
+    
+    Reports older than the TTL are forgotten, and the least recently used
+    ones are evicted once more than ``max_reports`` are kept or their
+    fragments together exceed ``max_bytes``.
+    """
+    
+    def __init__(
+        self,
+        max_reports: int = INCREMENTAL_MAX_REPORTS,
+        ttl_seconds: float = INCREMENTAL_TTL_SECONDS,
+        max_bytes: int = INCREMENTAL_MAX_BYTES):
+        """
+        Initialize the store.
+        
+        Args:
+            max_reports: Maximum number of reports remembered
+            ttl_seconds: Lifetime of a remembered report
+            max_bytes: Maximum total size of the remembered fragments
+        """
+        self.max_reports = max_reports
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._reports: OrderedDict[str, RenderedReport] = OrderedDict()
+        self._bytes = 0
+    
+    def __len__(self) -> int:
+        return len(self._reports)
+    
+    @property
+    def total_bytes(self) -> int:
+        """Total size of the remembered fragments."""
+        return self._bytes
+    
+    def get(self, report_id: str) -> Optional[RenderedReport]:
+        """Return the last render of a report, or None."""
+        report = self._reports.get(report_id)
+        if report is None:
+            return None
+        if time.time() - report.stored_at > self.ttl_seconds:
+            self._remove(report_id)
+            return None
+        self._reports.move_to_end(report_id)
+        return report
+    
+    def put(self, report_id: str, report: RenderedReport) -> None:
+        """Remember the render of a report, replacing the previous one."""
+        self._remove(report_id)
+        if report.size > self.max_bytes:
+            sys.stderr.write(f"Report {report_id} is too large to keep for incremental regeneration\n")
+            sys.stderr.flush()
+            return
+        
+        self._reports[report_id] = report
+        self._bytes += report.size
+        while len(self._reports) > self.max_reports or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._reports)))
+    
+    def _remove(self, report_id: str) -> None:
+        report = self._reports.pop(report_id, None)
+        if report is not None:
+            self._bytes -= report.size
+
+
+# Process-wide store used by format_report
+section_store = SectionStore()
+
+
+async def regenerate_sectioned_html(
+    client: genai.Client,
+    report_id: str,
+    text_blocks: list[str],
+    images: list[Any],
+    store: SectionStore = section_store,
+    model: str = DEFAULT_MODEL,
+    temperature: float = TEMPERATURE,
+    blocks_per_section: int = SECTION_BLOCKS,
+    concurrency: int = SECTION_CONCURRENCY,
+    on_section_done: Optional[Callable[[int, int], None]] = None,
+    on_generate: Optional[Callable[[], None]] = None) -> str:
+    """
+    Generate a sectioned report, reusing unchanged sections of its last render.
+    
+    Only sections whose input fingerprint is not among the last render's
+    are generated; the others keep their earlier fragment, and the result is
+    stitched on the shared layout like a full generation.
+    
+    A section's input includes the section count, and images without a
+    "section" index are spread over the sections by position, so a change
+    in the number of sections or of such images changes every fingerprint
+    and regenerates the whole report. Blocks inserted before the last
+    section also shift every later section's input.
+    
+    Args:
+        client: Initialized Gemini client
+        report_id: Caller-chosen id identifying the report across calls
+        text_blocks: Text content of the report
+        images: Images with data and captions
+        store: Store holding the last render of each report
+        model: Gemini model to use
+        temperature: Generation temperature
+        blocks_per_section: Text blocks per section
+        concurrency: Sections generated at once
+        on_section_done: Called with (finished, total) as changed sections complete
+        on_generate: Called once before any section is generated; not called
+            when every section is reused
+    
+    Returns:
+        The stitched HTML document
+    """
+    sections = split_sections(text_blocks, images, blocks_per_section)
+    fingerprints = [section_fingerprint(section, model, temperature) for section in sections]
+    
+    previous = store.get(report_id)
+    known = dict(zip(previous.fingerprints, previous.fragments)) if previous else {}
+    stale = [section for section, fingerprint in zip(sections, fingerprints) if fingerprint not in known]
+    
+    sys.stderr.write(f"Report {report_id}: regenerating {len(stale)} of {len(sections)} sections\n")
+    sys.stderr.flush()
+    span = current_span()
+    if span:
+        span.set_attribute("sections_reused", len(sections) - len(stale))
+        span.set_attribute("sections_generated", len(stale))
+    
+    generated = []
+    if stale:
+        if on_generate:
+            on_generate()
+        generated = await render_sections(client, stale, model, temperature, concurrency, on_section_done)
+    fresh = {fingerprints[section.index]: fragment for section, fragment in zip(stale, generated)}
+    fragments = [fresh[fingerprint] if fingerprint in fresh else known[fingerprint] for fingerprint in fingerprints]
+    
+    store.put(report_id, RenderedReport(fingerprints=fingerprints, fragments=fragments))
+    return stitch_sections(fragments, report_title(text_blocks))
@@ -0,0 +1,287 @@
+"""Bounded job queue for report generation."""
+
+import asyncio
+import contextvars
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+from config import (
+    JOB_WORKERS,
+    JOB_QUEUE_SIZE,
+    JOB_RESULT_TTL_SECONDS,
+    JOB_MAX_FINISHED,
+)
+
+
+# Job states; the last three are final
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINAL_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Job queue is full, retry in about {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class Job:
+    """A queued report generation and its progress."""
+
+    id: str
+    params: dict[str, Any]
+    status: str = QUEUED
+    progress: float = 0.0
+    message: str = "Queued"
+    result: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    task: Optional[asyncio.Task] = None
+    context: Optional[contextvars.Context] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    updated: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def report_progress(self, progress: float, message: str = "") -> None:
+        """Record progress between 0 and 1 and wake anyone watching the job."""
+        self.progress = max(self.progress, min(1.0, progress))
+        if message:
+            self.message = message
+        self.updated.set()
+
+    def to_dict(self, position: Optional[int] = None) -> dict[str, Any]:
+        """Status of the job as a JSON-serializable dict."""
+        status = {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "message": self.message,
+            "created_at": self.created_at,
+        }
+        if position is not None:
+            status["queue_position"] = position
+        if self.started_at:
+            status["started_at"] = self.started_at
+        if self.finished_at:
+            status["finished_at"] = self.finished_at
+            status["duration"] = round(self.finished_at - (self.started_at or self.created_at), 3)
+        if self.error:
+            status["error"] = self.error
+        return status
+
+
+class JobQueue:
+    """
+    Worker pool running report jobs from a bounded queue.
+
+    At most ``workers`` jobs run at once and at most ``max_queued`` wait;
+    further submissions are refused with :class:`QueueFullError` (or wait
+    for room when asked to), so a burst of requests queues in order instead
+    of starting unbounded concurrent generations. Finished jobs are kept for
+    ``result_ttl`` seconds so their results can be fetched.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[Job], Awaitable[str]],
+        workers: int = JOB_WORKERS,
+        max_queued: int = JOB_QUEUE_SIZE,
+        result_ttl: float = JOB_RESULT_TTL_SECONDS,
+        max_finished: int = JOB_MAX_FINISHED):
+        """
+        Initialize the queue.
+
+        Args:
+            runner: Coroutine producing a job's result; it may call
+                ``job.report_progress``
+            workers: Jobs run concurrently
+            max_queued: Jobs allowed to wait for a worker
+            result_ttl: Seconds finished jobs stay retrievable
+            max_finished: Finished jobs kept at most
+        """
+        self.runner = runner
+        self.workers = max(1, workers)
+        self.max_queued = max(1, max_queued)
+        self.result_ttl = result_ttl
+        self.max_finished = max_finished
+        self._jobs: dict[str, Job] = {}
+        self._queued: OrderedDict[str, Job] = OrderedDict()
+        self._finished: OrderedDict[str, Job] = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+        self._durations: list[float] = []
+
+    @property
+    def queued(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return len(self._queued)
+
+    @property
+    def running(self) -> int:
+        """Number of jobs being generated."""
+        return sum(1 for job in self._jobs.values() if job.status == RUNNING)
+
+    def _start(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+        if not self._workers:
+            # Workers start from an empty context so they do not inherit the
+            # trace of whichever request happened to start them
+            self._workers = [
+                contextvars.Context().run(asyncio.create_task, self._work(), name=f"report-worker-{i}")
+                for i in range(self.workers)
+            ]
+
+    def _retry_after(self) -> float:
+        """Rough seconds until a queue slot frees up, from recent job durations."""
+        average = sum(self._durations) / len(self._durations) if self._durations else 10.0
+        return max(1.0, average * (self.queued + 1) / self.workers)
+
+    async def submit(self, params: dict[str, Any], wait: bool = False) -> Job:
+        """
+        Queue a job.
+
+        Args:
+            params: Arguments for the runner, stored on the job
+            wait: Wait for room instead of failing when the queue is full
+
+        Returns:
+            The queued job
+
+        Raises:
+            QueueFullError: If the queue is full and ``wait`` is False
+        """
+        self._start()
+        self._prune()
+
+        # The job runs in the submitter's context, so its spans join the submitter's trace
+        job = Job(id=uuid.uuid4().hex, params=params, context=contextvars.copy_context())
+        if wait:
+            await self._queue.put(job)
+        else:
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                raise QueueFullError(self._retry_after()) from None
+
+        self._jobs[job.id] = job
+        self._queued[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job by id, or None if unknown or expired."""
+        self._prune()
+        return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> Optional[int]:
+        """One-based position of a queued job, or None once it has started."""
+        if job.id not in self._queued:
+            return None
+        for index, job_id in enumerate(self._queued, start=1):
+            if job_id == job.id:
+                return index
+        return None
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job.
+
+        Returns:
+            True if the job was cancelled, False if unknown or already final
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINAL_STATES:
+            return False
+
+        if job.status == QUEUED:
+            # The worker skips it when it reaches the front of the queue
+            self._queued.pop(job.id, None)
+            self._finish(job, CANCELLED, message="Cancelled before it started")
+        elif job.task:
+            job.task.cancel()
+        return True
+
+    async def close(self) -> None:
+        """Stop the workers and cancel every unfinished job."""
+        unfinished = [job for job in self._jobs.values() if job.status not in FINAL_STATES]
+        for job in unfinished:
+            self.cancel(job.id)
+        # Let workers finish cancelling their running jobs first: a worker
+        # cancelled while awaiting its job would take that for the job's
+        # cancellation and keep waiting for more work
+        await asyncio.gather(*(job.done.wait() for job in unfinished))
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status != QUEUED:
+                    continue
+                self._queued.pop(job.id, None)
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.report_progress(0.05, "Generating report")
+        job.task = (job.context or contextvars.Context()).run(asyncio.create_task, self.runner(job))
+        try:
+            result = await job.task
+        except asyncio.CancelledError:
+            if not job.task.cancelled():
+                # The worker itself is shutting down
+                job.task.cancel()
+                self._finish(job, CANCELLED, message="Server shutting down")
+                raise
+            self._finish(job, CANCELLED, message="Cancelled")
+            return
+        except Exception as e:
+            sys.stderr.write(f"Report job {job.id} failed: {e}\n")
+            sys.stderr.flush()
+            self._finish(job, FAILED, error=str(e), message="Failed")
+            return
+
+        job.result = result
+        self._finish(job, SUCCEEDED, message="Done")
+        self._durations = (self._durations + [job.finished_at - job.started_at])[-20:]
+
+    def _finish(self, job: Job, status: str, message: str = "", error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        if status == SUCCEEDED:
+            job.progress = 1.0
+        job.message = message or job.message
+        job.task = None
+        job.context = None
+        self._finished[job.id] = job
+        job.updated.set()
+        job.done.set()
+        self._prune()
+
+    def _prune(self) -> None:
+        """Forget finished jobs past their TTL or beyond the retention limit."""
+        cutoff = time.time() - self.result_ttl
+        while self._finished:
+            job_id, job = next(iter(self._finished.items()))
+            if job.finished_at >= cutoff and len(self._finished) <= self.max_finished:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
@@ -1,6 +1,293 @@
 """PDF conversion utilities."""
 
-from playwright.async_api import async_playwright
+import asyncio
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from playwright.async_api import (
+    Browser,
+    BrowserContext,
+    Error as PlaywrightError,
+    Page,
+    Playwright,
+    async_playwright,
+)
+
+import common  # noqa: F401  Makes the repository root importable
+from config import (
+    DEFAULT_PDF_OUTPUT,
+    PDF_POOL_SIZE,
+    PDF_BROWSER_COUNT,
+    PDF_MAX_RENDERS_PER_PAGE,
+    PDF_MAX_RENDERS_PER_BROWSER,
+)
+from src.backend.tracing import tracer
+
+
+@dataclass
+class _BrowserSlot:
+    """A Chromium process shared by several page slots."""
+    
+    browser: Optional[Browser] = None
+    renders: int = 0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+@dataclass
+class _PageSlot:
+    """A reusable context and page living on one of the pool's browsers."""
+    
+    browser_slot: _BrowserSlot
+    browser: Optional[Browser] = None
+    context: Optional[BrowserContext] = None
+    page: Optional[Page] = None
+    renders: int = 0
+
+
+class BrowserPool:
+    """
+    Pool of warm Chromium browsers and pages for HTML to PDF rendering.
+    
+    Each render borrows an idle page, so a conversion only costs
+    ``set_content`` plus ``pdf``. Pages get a fresh context after
+    ``max_renders_per_page`` renders, browsers are relaunched after
+    ``max_renders_per_browser`` renders or when they crash.
+    """
+    
+    def __init__(
+        self,
+        size: int = PDF_POOL_SIZE,
+        browsers: int = PDF_BROWSER_COUNT,
+        max_renders_per_page: int = PDF_MAX_RENDERS_PER_PAGE,
+        max_renders_per_browser: int = PDF_MAX_RENDERS_PER_BROWSER):
+        """
+        Initialize the pool. Browsers are launched on first use.
+        
+        Args:
+            size: Number of pages that can render concurrently
+            browsers: Number of Chromium processes the pages are spread over
+            max_renders_per_page: Renders before a page's context is recreated
+            max_renders_per_browser: Renders before a browser is relaunched
+        """
+        self.size = max(1, size)
+        self.max_renders_per_page = max_renders_per_page
+        self.max_renders_per_browser = max_renders_per_browser
+        self._browser_slots = [_BrowserSlot() for _ in range(max(1, min(browsers, self.size)))]
+        self._slots = [
+            _PageSlot(browser_slot=self._browser_slots[i % len(self._browser_slots)])
+            for i in range(self.size)
+        ]
+        self._idle: Optional[asyncio.Queue] = None
+        self._playwright: Optional[Playwright] = None
+        self._retired: set[Browser] = set()
+        self._start_lock = asyncio.Lock()
+        self._closed = False
+    
+    async def __aenter__(self) -> "BrowserPool":
+        await self.start()
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
+    async def start(self) -> None:
+        """Start Playwright and warm up every page in the pool."""
+        async with self._start_lock:
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+            if self._playwright:
+                return
+            
+            self._playwright = await async_playwright().start()
+            self._idle = asyncio.Queue()
+            try:
+                for slot in self._slots:
+                    await self._prepare(slot)
+                    self._idle.put_nowait(slot)
+            except BaseException:
+                await self._shutdown()
+                raise
+            
+            sys.stderr.write(
+                f"Browser pool ready: {len(self._browser_slots)} browser(s), {self.size} page(s)\n"
+            )
+            sys.stderr.flush()
+    
+    async def render(self, html_content: str, output_path: Optional[str] = None) -> bytes:
+        """
+        Render HTML to PDF on a pooled page.
+        
+        Args:
+            html_content: HTML content to convert
+            output_path: Optional path where the PDF should also be saved
+        
+        Returns:
+            The PDF bytes
+        """
+        if self._idle is None:
+            await self.start()
+        
+        with tracer.span("pdf.render", html_bytes=len(html_content)) as span:
+            # One retry covers a browser that crashed between renders
+            for attempt in range(2):
+                if self._closed or self._idle is None:
+                    raise RuntimeError("Browser pool is closed")
+                idle = self._idle
+                waited = time.perf_counter()
+                slot = await idle.get()
+                if slot is None:
+                    # Shutdown sentinel; pass it on to the next waiter
+                    idle.put_nowait(None)
+                    raise RuntimeError("Browser pool shut down while waiting for a page")
+                span.set_attribute("queued_seconds", round(time.perf_counter() - waited, 6))
+                try:
+                    await self._prepare(slot)
+                    # A shutdown mid-render clears the slot; the page itself then fails
+                    page = slot.page
+                    await page.set_content(html_content)
+                    pdf = await page.pdf(path=output_path)
+                    slot.renders += 1
+                    slot.browser_slot.renders += 1
+                    span.set_attribute("pdf_bytes", len(pdf))
+                    span.set_attribute("attempts", attempt + 1)
+                    return pdf
+                except PlaywrightError as e:
+                    # Never reuse a page after an error; it gets a new context next time
+                    slot.page = None
+                    crashed = not (slot.browser and slot.browser.is_connected())
+                    if attempt or not crashed:
+                        raise
+                    sys.stderr.write(f"Browser crashed during render, retrying: {e}\n")
+                    sys.stderr.flush()
+                finally:
+                    if self._closed or self._idle is None:
+                        # The pool shut down mid-render; don't hand the page back to it
+                        await self._discard_page(slot)
+                    else:
+                        self._idle.put_nowait(slot)
+        
+        raise RuntimeError("unreachable")
+    
+    async def close(self) -> None:
+        """Close every page, context and browser and stop Playwright."""
+        async with self._start_lock:
+            self._closed = True
+            await self._shutdown()
+    
+    async def _shutdown(self) -> None:
+        browsers = {slot.browser for slot in self._browser_slots if slot.browser}
+        browsers |= self._retired
+        for browser in browsers:
+            try:
+                await browser.close()
+            except PlaywrightError:
+                pass
+        
+        for slot in self._slots:
+            slot.browser = slot.context = slot.page = None
+            slot.renders = 0
+        for browser_slot in self._browser_slots:
+            browser_slot.browser = None
+            browser_slot.renders = 0
+        self._retired.clear()
+        if self._idle is not None:
+            # Wake renders waiting for a page; the sentinel is handed on from one to the next
+            self._idle.put_nowait(None)
+        self._idle = None
+        
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+    
+    async def _prepare(self, slot: _PageSlot) -> None:
+        """Make sure a page slot has a live page on a healthy, current browser."""
+        browser_slot = slot.browser_slot
+        if self._browser_needs_launch(browser_slot):
+            async with browser_slot.lock:
+                if self._browser_needs_launch(browser_slot):
+                    await self._launch(browser_slot)
+        
+        if (
+            slot.page is None
+            or slot.page.is_closed()
+            or slot.browser is not browser_slot.browser
+            or slot.renders >= self.max_renders_per_page
+        ):
+            await self._reset_page(slot)
+    
+    def _browser_needs_launch(self, browser_slot: _BrowserSlot) -> bool:
+        return (
+            browser_slot.browser is None
+            or not browser_slot.browser.is_connected()
+            or browser_slot.renders >= self.max_renders_per_browser
+        )
+    
+    async def _launch(self, browser_slot: _BrowserSlot) -> None:
+        """Launch a replacement browser; the old one closes once no page uses it."""
+        old = browser_slot.browser
+        browser_slot.browser = await self._playwright.chromium.launch()
+        browser_slot.renders = 0
+        if old:
+            self._retired.add(old)
+            await self._close_retired(old)
+    
+    async def _reset_page(self, slot: _PageSlot) -> None:
+        """Give a page slot a fresh context and page on its browser's current process."""
+        old_browser = slot.browser
+        if slot.context:
+            try:
+                await slot.context.close()
+            except PlaywrightError:
+                pass
+        
+        slot.browser = slot.browser_slot.browser
+        slot.context = await slot.browser.new_context()
+        slot.page = await slot.context.new_page()
+        slot.renders = 0
+        
+        if old_browser in self._retired:
+            await self._close_retired(old_browser)
+    
+    async def _discard_page(self, slot: _PageSlot) -> None:
+        """Close a slot's page instead of returning it to the idle queue."""
+        page, slot.page = slot.page, None
+        if page is None:
+            return
+        try:
+            await page.close()
+        except PlaywrightError:
+            pass
+    
+    async def _close_retired(self, browser: Browser) -> None:
+        if any(slot.browser is browser for slot in self._slots):
+            return
+        self._retired.discard(browser)
+        try:
+            await browser.close()
+        except PlaywrightError:
+            pass
+
+
+# Process-wide pool shared by html_to_pdf callers
+_default_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Return the process-wide browser pool, creating it on first use."""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = BrowserPool()
+    return _default_pool
+
+
+async def shutdown_browser_pool() -> None:
+    """Close the process-wide browser pool if it was started."""
+    global _default_pool
+    if _default_pool is not None:
+        await _default_pool.close()
+        _default_pool = None
 
 
 async def html_to_pdf(html_content: str, output_path: str = "report.pdf") -> None:
@@ -11,13 +298,66 @@ async def html_to_pdf(html_content: str, output_path: str = "report.pdf") -> Non
         html_content: HTML content to convert
         output_path: Path where PDF should be saved
     """
-    async with async_playwright() as p:
-        browser = await p.chromium.launch()
-        page = await browser.new_page()
-        
-        try:
-            await page.set_content(html_content)
-            await page.pdf(path=output_path)
-        finally:
-            await browser.close()
-            
+    await get_browser_pool().render(html_content, output_path)
+
+
+@dataclass
+class PdfResult:
+    """Outcome of rendering one document in a batch."""
+    
+    output_path: str
+    success: bool
+    error: Optional[str] = None
+    duration: float = 0.0
+
+
+async def html_to_pdf_batch(
+    items: Iterable[tuple[str, str]],
+    concurrency: Optional[int] = None,
+    pool: Optional[BrowserPool] = None) -> list[PdfResult]:
+    """
+    Convert many HTML documents to PDF files concurrently.
+    
+    Items are pulled lazily, so a generator keeps only the documents being
+    rendered in memory. A failing item is recorded and the batch continues.
+    
+    Args:
+        items: Iterable of (html_content, output_path) pairs
+        concurrency: Maximum number of concurrent renders; defaults to the pool size
+        pool: Browser pool to render on; defaults to the process-wide pool
+    
+    Returns:
+        One result per item, in input order
+    """
+    pool = pool or get_browser_pool()
+    concurrency = max(1, concurrency or pool.size)
+    
+    pending = enumerate(items)
+    results: dict[int, PdfResult] = {}
+    
+    async def worker() -> None:
+        for index, item in pending:
+            # Stays empty if the item is not an (html_content, output_path) pair
+            output_path = ""
+            started = time.perf_counter()
+            try:
+                html_content, output_path = item
+                output_path = output_path or DEFAULT_PDF_OUTPUT
+                await pool.render(html_content, output_path)
+                results[index] = PdfResult(
+                    output_path=output_path,
+                    success=True,
+                    duration=time.perf_counter() - started,
+                )
+            except Exception as e:
+                sys.stderr.write(f"PDF render failed for {output_path or f'item {index}'}: {e}\n")
+                sys.stderr.flush()
+                results[index] = PdfResult(
+                    output_path=output_path,
+                    success=False,
+                    error=str(e),
+                    duration=time.perf_counter() - started,
+                )
+    
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return [results[index] for index in sorted(results)]
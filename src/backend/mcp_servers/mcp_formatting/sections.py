@@ -0,0 +1,226 @@
+"""Section-parallel report generation."""
+
+import asyncio
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from google import genai
+
+from common import strip_fences
+from config import (
+    DEFAULT_MODEL,
+    TEMPERATURE,
+    SECTION_BLOCKS,
+    SECTION_CONCURRENCY,
+    SECTION_RETRIES,
+)
+from gemini_client import generate_html
+from prompts import SECTION_PROMPT
+from src.backend.formatting.layout import image_block, wrap_document
+
+
+_BODY = re.compile(r"<body[^>]*>(.*)</body>", re.I | re.S)
+_STRIP_TAGS = re.compile(r"<(style|script|head)\b[^>]*>.*?</\1>|<!DOCTYPE[^>]*>|</?html[^>]*>", re.I | re.S)
+
+
+@dataclass
+class ReportSection:
+    """A slice of the report input rendered by its own generation call."""
+    
+    index: int
+    total: int
+    text_blocks: list[str]
+    images: list[Any] = field(default_factory=list)
+    
+    @property
+    def user_data(self) -> dict[str, Any]:
+        """Generation input for this section."""
+        return {
+            "section": {"index": self.index, "total": self.total, "is_first": self.index == 0},
+            "text_blocks": self.text_blocks,
+            "images": self.images,
+        }
+
+
+def split_sections(
+    text_blocks: list[str],
+    images: list[Any],
+    blocks_per_section: int = SECTION_BLOCKS) -> list[ReportSection]:
+    """
+    Split report input into sections of consecutive text blocks.
+    
+    Images whose "section" key is the index of a text block go to the
+    section holding that block; the rest are spread over the sections in
+    order.
+    
+    Args:
+        text_blocks: Text content of the report
+        images: Images with data and captions
+        blocks_per_section: Text blocks per section
+    
+    Returns:
+        List of sections in document order
+    """
+    blocks_per_section = max(1, blocks_per_section)
+    chunks = [
+        text_blocks[i:i + blocks_per_section]
+        for i in range(0, len(text_blocks), blocks_per_section)
+    ] or [[]]
+    total = len(chunks)
+    sections = [ReportSection(index=i, total=total, text_blocks=chunk) for i, chunk in enumerate(chunks)]
+    
+    unplaced = []
+    for image in images or []:
+        index = image_block(image, len(text_blocks))
+        if index is not None:
+            sections[index // blocks_per_section].images.append(image)
+        else:
+            unplaced.append(image)
+    
+    for i, image in enumerate(unplaced):
+        sections[i * total // len(unplaced)].images.append(image)
+    
+    return sections
+
+
+def clean_fragment(html: str) -> str:
+    """
+    Reduce model output to a bare HTML fragment.
+    
+    Strips markdown fences and, if the model returned a full document,
+    keeps only the body content without head, style or script elements.
+    
+    Args:
+        html: Raw model output
+    
+    Returns:
+        The cleaned fragment
+    """
+    html = strip_fences(html)
+    body = _BODY.search(html)
+    if body:
+        html = body.group(1)
+    return _STRIP_TAGS.sub("", html).strip()
+
+
+async def generate_section(
+    client: genai.Client,
+    section: ReportSection,
+    model: str = DEFAULT_MODEL,
+    temperature: float = TEMPERATURE,
+    retries: int = SECTION_RETRIES) -> str:
+    """
+    Generate one section fragment, retrying only this section on failure.
+    
+    Args:
+        client: Initialized Gemini client
+        section: Section to render
+        model: Gemini model to use
+        temperature: Generation temperature
+        retries: Extra attempts after the first failure
+    
+    Returns:
+        The cleaned HTML fragment
+    
+    Raises:
+        Exception: If every attempt fails
+    """
+    for attempt in range(retries + 1):
+        try:
+            fragment = clean_fragment(
+                await generate_html(client, section.user_data, SECTION_PROMPT, model, temperature)
+            )
+            if "<" not in fragment:
+                raise ValueError("model returned no HTML")
+            return fragment
+        except Exception as e:
+            if attempt == retries:
+                raise
+            sys.stderr.write(f"Section {section.index} failed ({e}), retrying\n")
+            sys.stderr.flush()
+            await asyncio.sleep(0.5 * 2 ** attempt)
+    
+    raise RuntimeError("unreachable")
+
+
+def stitch_sections(fragments: list[str], title: str) -> str:
+    """Join section fragments into one document on the shared layout."""
+    return wrap_document("\n".join(fragments), title=title)
+
+
+def report_title(text_blocks: list[str]) -> str:
+    """Derive a document title from the first line of the report."""
+    first_line = text_blocks[0].strip().splitlines()[0] if text_blocks and text_blocks[0].strip() else ""
+    return first_line[:120] or "Stock Performance Report"
+
+
+async def generate_sectioned_html(
+    client: genai.Client,
+    text_blocks: list[str],
+    images: list[Any],
+    model: str = DEFAULT_MODEL,
+    temperature: float = TEMPERATURE,
+    blocks_per_section: int = SECTION_BLOCKS,
+    concurrency: int = SECTION_CONCURRENCY,
+    on_section_done: Optional[Callable[[int, int], None]] = None) -> str:
+    """
+    Generate a report as concurrently rendered sections on a shared layout.
+    
+    Args:
+        client: Initialized Gemini client
+        text_blocks: Text content of the report
+        images: Images with data and captions
+        model: Gemini model to use
+        temperature: Generation temperature
+        blocks_per_section: Text blocks per section
+        concurrency: Sections generated at once
+        on_section_done: Called with (finished, total) as sections complete
+    
+    Returns:
+        The stitched HTML document
+    """
+    sections = split_sections(text_blocks, images, blocks_per_section)
+    
+    sys.stderr.write(f"Generating {len(sections)} sections...\n")
+    sys.stderr.flush()
+    
+    fragments = await render_sections(client, sections, model, temperature, concurrency, on_section_done)
+    return stitch_sections(fragments, report_title(text_blocks))
+
+
+async def render_sections(
+    client: genai.Client,
+    sections: list[ReportSection],
+    model: str = DEFAULT_MODEL,
+    temperature: float = TEMPERATURE,
+    concurrency: int = SECTION_CONCURRENCY,
+    on_section_done: Optional[Callable[[int, int], None]] = None) -> list[str]:
+    """
+    Generate the fragments of several sections concurrently.
+    
+    Args:
+        client: Initialized Gemini client
+        sections: Sections to render
+        model: Gemini model to use
+        temperature: Generation temperature
+        concurrency: Sections generated at once
+        on_section_done: Called with (finished, total) as sections complete
+    
+    Returns:
+        The fragments, in the order of sections
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    finished = 0
+    
+    async def render(section: ReportSection) -> str:
+        nonlocal finished
+        async with semaphore:
+            fragment = await generate_section(client, section, model, temperature)
+        finished += 1
+        if on_section_done:
+            on_section_done(finished, len(sections))
+        return fragment
+    
+    return list(await asyncio.gather(*(render(section) for section in sections)))
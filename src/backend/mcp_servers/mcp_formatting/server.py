@@ -1,40 +1,190 @@
 """MCP server for report formatting."""
 
+import asyncio
+import base64
+import hashlib
 import json
 import sys
-from typing import Any
-from mcp.server.fastmcp import FastMCP
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional, Union
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.types import BlobResourceContents, EmbeddedResource, TextContent
 
-from config import GOOGLE_API_KEY
-from gemini_client import initialize_client, generate_html
-from prompts import FORMATTING_PROMPT
+import common  # noqa: F401  Makes the repository root importable
+from budget import LLMBudget, is_over_budget_error
+from cache import ReportCache, cache_key
+from config import (
+    GOOGLE_API_KEY,
+    DEFAULT_MODEL,
+    TEMPERATURE,
+    CACHE_ENABLED,
+    CACHE_MAX_ENTRIES,
+    CACHE_DIR,
+    CACHE_MAX_DISK_BYTES,
+    CACHE_TTL_SECONDS,
+    GEMINI_WARMUP,
+    IMAGE_JPEG_QUALITY,
+    LLM_CALLS_PER_MINUTE,
+    LLM_TIME_BUDGET_SECONDS,
+    MCP_TRANSPORT,
+    MCP_HOST,
+    MCP_PORT,
+    TRACE_JSONL_PATH,
+    TRACE_PROMETHEUS_PATH,
+)
+from gemini_client import client_manager, get_client, generate_html
+from images import compress_inline_images
+from jobs import SUCCEEDED, Job, JobQueue, QueueFullError
+from prompts import FORMATTING_PROMPT, SECTION_PROMPT
+from incremental import regenerate_sectioned_html
+from sections import generate_sectioned_html
+from src.backend.formatting.layout import REPORT_CSS
+from src.backend.formatting.template_formatter import TemplateFormatter
+from src.backend.tracing import Span, configure_tracing, current_span, tracer
+
+try:
+    from pdf_converter import get_browser_pool, shutdown_browser_pool
+except ImportError:  # render_report_pdf is unavailable without Playwright
+    get_browser_pool = shutdown_browser_pool = None
+
+
+# Report generation modes accepted by format_report
+GENERATION_MODES = ("single", "sections", "template", "auto")
+
+
+# Set once the shared Gemini client has been warmed up in this process
+_warmed_up = False
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """
+    Warm up the shared Gemini client when the first session starts.
+    
+    FastMCP enters the lifespan once per session: every streamable HTTP
+    session and every in-process connection has its own. The job queue,
+    browser pool and Gemini client are shared by all of them, so they are
+    closed by shutdown() when the process stops, not when a session ends.
+    """
+    global _warmed_up
+    if not _warmed_up and GOOGLE_API_KEY and GEMINI_WARMUP:
+        _warmed_up = True
+        await client_manager.warm_up()
+    yield
+
+
+async def shutdown() -> None:
+    """Stop the report jobs, close the browsers and the Gemini client and flush the traces."""
+    await job_queue.close()
+    if shutdown_browser_pool:
+        await shutdown_browser_pool()
+    await client_manager.aclose()
+    tracer.close()
 
 
 # Initialize MCP server
-mcp = FastMCP("formatting")
+mcp = FastMCP("formatting", lifespan=lifespan, host=MCP_HOST, port=MCP_PORT)
 
+# Stage timings for format_report, Gemini generation and PDF rendering
+configure_tracing(jsonl_path=TRACE_JSONL_PATH or None, prometheus_path=TRACE_PROMETHEUS_PATH or None)
 
-@mcp.tool()
-async def format_report(text_blocks: list[str], images: list[Any]) -> str:
+# LLM-free renderer for the "template" mode and the "auto" fallback
+template_formatter = TemplateFormatter()
+
+# Per-minute Gemini generation budget enforced by the "auto" mode
+llm_budget = LLMBudget(LLM_CALLS_PER_MINUTE)
+
+# Cache of generated reports, keyed on a hash of every generation input
+report_cache = ReportCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    directory=CACHE_DIR or None,
+    max_disk_bytes=CACHE_MAX_DISK_BYTES,
+    ttl_seconds=CACHE_TTL_SECONDS,
+) if CACHE_ENABLED else None
+
+
+def _validate_request(text_blocks: list[str], mode: str) -> Optional[str]:
+    """Return a JSON error message for an invalid request, or None."""
+    if not text_blocks:
+        return json.dumps({"error": "No text blocks provided"})
+    
+    if mode not in GENERATION_MODES:
+        return json.dumps({"error": f"Unknown mode: {mode}"})
+    
+    return None
+
+
+def _report_cache_key(text_blocks: list[str], images: list[Any], mode: str) -> str:
+    """Cache key covering every input that affects the generated report."""
+    prompt = SECTION_PROMPT + REPORT_CSS if mode == "sections" else FORMATTING_PROMPT
+    return cache_key(text_blocks, images or [], prompt, DEFAULT_MODEL, TEMPERATURE)
+
+
+def _ready_report(
+    text_blocks: list[str],
+    images: list[Any],
+    use_cache: bool,
+    mode: str) -> Optional[str]:
+    """Return a report that needs no generation (template or cached), if any."""
+    if mode == "template":
+        return template_formatter.render(text_blocks, images or [])
+    
+    # Identical inputs produce a reusable report, so check the cache first
+    if report_cache and use_cache:
+        cached = report_cache.get(_report_cache_key(text_blocks, images, mode))
+        if cached is not None:
+            sys.stderr.write("Serving report from cache\n")
+            sys.stderr.flush()
+            return cached
+    
+    return None
+
+
+async def generate_report(
+    text_blocks: list[str],
+    images: list[Any],
+    use_cache: bool,
+    mode: str,
+    report_id: str = "",
+    on_progress: Optional[Callable[[float, str], None]] = None) -> str:
     """
-    Format text and images into a professional HTML report.
+    Produce a report, from the template, the cache or a Gemini generation.
     
     Args:
         text_blocks: List of text content to format
         images: List of images with data and captions
+        use_cache: Reuse a previous result for identical inputs
+        mode: Generation mode, one of GENERATION_MODES
+        report_id: In sections mode, reuse the unchanged sections of the
+            last render of this report; a render that reuses every section
+            makes no Gemini call and is not counted against the LLM budget
+        on_progress: Called with (progress between 0 and 1, message)
     
     Returns:
-        Generated HTML string or JSON error message
+        Generated HTML string
+    
+    Raises:
+        RuntimeError: If no API key is configured or generation fails
     """
-    # Validate inputs
-    if not text_blocks:
-        return json.dumps({"error": "No text blocks provided"})
+    # Outside a traced request the attributes go to a detached span that is never exported
+    span = current_span() or Span(name="formatting.generate_report", trace_id="", span_id="")
+    
+    ready = _ready_report(text_blocks, images, use_cache, mode)
+    if ready is not None:
+        span.set_attribute("source", "template" if mode == "template" else "cache")
+        return ready
+    
+    if mode == "auto" and (not GOOGLE_API_KEY or llm_budget.exhausted()):
+        sys.stderr.write("LLM over budget, rendering from template\n")
+        sys.stderr.flush()
+        span.set_attribute("source", "template")
+        return template_formatter.render(text_blocks, images or [])
     
     if not GOOGLE_API_KEY:
-        return json.dumps({"error": "GOOGLE_API_KEY not configured"})
+        raise RuntimeError("GOOGLE_API_KEY not configured")
     
-    # Initialize client
-    client = initialize_client()
+    # Shared client with pooled keep-alive connections
+    client = get_client()
     
     # Prepare data
     user_data = {
@@ -42,17 +192,365 @@ async def format_report(text_blocks: list[str], images: list[Any]) -> str:
         "images": images or []
     }
     
+    def section_done(finished: int, total: int) -> None:
+        if on_progress:
+            on_progress(0.1 + 0.85 * finished / total, f"Generated {finished} of {total} sections")
+    
+    def start_generation() -> None:
+        llm_budget.record()
+        span.set_attribute("source", "llm")
+        if on_progress:
+            on_progress(0.1, "Generating with Gemini")
+    
     try:
         # Generate HTML
-        html = await generate_html(client, user_data, FORMATTING_PROMPT)
-        return html
+        if mode == "sections" and report_id:
+            # A render that reuses every section makes no Gemini call
+            span.set_attribute("source", "reused")
+            html = await regenerate_sectioned_html(
+                client, report_id, text_blocks, images or [],
+                on_section_done=section_done, on_generate=start_generation,
+            )
+        elif mode == "sections":
+            start_generation()
+            html = await generate_sectioned_html(
+                client, text_blocks, images or [], on_section_done=section_done
+            )
+        elif mode == "auto":
+            start_generation()
+            html = await asyncio.wait_for(
+                generate_html(client, user_data, FORMATTING_PROMPT),
+                LLM_TIME_BUDGET_SECONDS,
+            )
+        else:
+            start_generation()
+            html = await generate_html(client, user_data, FORMATTING_PROMPT)
     
     except Exception as e:
-        sys.stderr.write(f"API Error: {e}\n")
-        sys.stderr.flush()
-        return json.dumps({"error": str(e)})
+        if mode == "auto" and is_over_budget_error(e):
+            sys.stderr.write(f"LLM over budget ({e!r}), rendering from template\n")
+            sys.stderr.flush()
+            span.set_attribute("source", "template")
+            return template_formatter.render(text_blocks, images or [])
+        raise RuntimeError(str(e)) from e
+    
+    if report_cache and html:
+        report_cache.put(_report_cache_key(text_blocks, images, mode), html)
+    return html
+
+
+async def run_report_job(job: Job) -> str:
+    """Generate the report of a queued job."""
+    params = job.params
+    with tracer.span(
+        "formatting.report_job",
+        mode=params["mode"],
+        report_id=params["report_id"],
+        text_blocks=len(params["text_blocks"]),
+        images=len(params["images"]),
+    ):
+        return await generate_report(on_progress=job.report_progress, **params)
+
+
+# Bounded worker pool shared by submit_report and format_report
+job_queue = JobQueue(run_report_job)
+
+
+async def _forward_progress(job: Job, ctx: Optional[Context]) -> None:
+    """Wait for a job to finish, relaying its progress to the caller."""
+    while not job.done.is_set():
+        job.updated.clear()
+        await job.updated.wait()
+        if ctx is not None:
+            await ctx.report_progress(job.progress, 1.0)
+
+
+@mcp.tool()
+async def format_report(
+    text_blocks: list[str],
+    images: list[Any],
+    use_cache: bool = True,
+    mode: str = "single",
+    report_id: str = "",
+    ctx: Context = None) -> str:
+    """
+    Format text and images into a professional HTML report.
+    
+    Waits for the report to be generated; use submit_report to queue it and
+    fetch the result later instead.
+    
+    Args:
+        text_blocks: List of text content to format
+        images: List of images with data and captions; an optional "section"
+            is the index of the text block the image follows
+        use_cache: Reuse a previous result for identical inputs; set False to force regeneration
+        mode: "single" generates the whole document in one call; "sections" generates
+            sections concurrently on a shared layout and stitches them together;
+            "template" renders locally without the LLM; "auto" generates like
+            "single" but falls back to the template when the LLM is over budget
+        report_id: Stable id of the report (e.g. "AAPL-daily"); in "sections" mode
+            a later call with the same id only regenerates the sections whose
+            text blocks or images changed and reuses the others. Sections are
+            fixed runs of text blocks that know the section count, and images
+            without a "section" index are spread by position, so changing the
+            number of sections or of unindexed images, or inserting blocks
+            before the end, regenerates every later section; give images a
+            "section" index and edit blocks in place to keep reuse effective
+    
+    Returns:
+        Generated HTML string or JSON error message
+    """
+    with tracer.span(
+        "formatting.format_report",
+        mode=mode,
+        text_blocks=len(text_blocks or []),
+        images=len(images or []),
+    ) as span:
+        error = _validate_request(text_blocks, mode)
+        if error:
+            return error
+        
+        html, error = await _produce_report(text_blocks, images, use_cache, mode, report_id, ctx, span)
+        return html if html is not None else json.dumps({"error": error})
+
+
+async def _produce_report(
+    text_blocks: list[str],
+    images: list[Any],
+    use_cache: bool,
+    mode: str,
+    report_id: str,
+    ctx: Optional[Context],
+    span: Span) -> tuple[Optional[str], Optional[str]]:
+    """
+    Produce a validated report directly or through the job queue.
+    
+    Returns:
+        Tuple of (HTML, None) on success or (None, error message)
+    """
+    # Templates and cache hits are instant, so they skip the queue
+    ready = _ready_report(text_blocks, images, use_cache, mode)
+    if ready is not None:
+        span.set_attribute("source", "template" if mode == "template" else "cache")
+        return ready, None
+    
+    params = {
+        "text_blocks": text_blocks,
+        "images": images or [],
+        "use_cache": use_cache,
+        "mode": mode,
+        "report_id": report_id,
+    }
+    job = await job_queue.submit(params, wait=True)
+    span.set_attribute("job_id", job.id)
+    try:
+        await _forward_progress(job, ctx)
+    except asyncio.CancelledError:
+        job_queue.cancel(job.id)
+        raise
+    
+    if job.status == SUCCEEDED:
+        return job.result, None
+    return None, job.error or job.message
+
+
+@mcp.tool()
+async def render_report_pdf(
+    text_blocks: list[str],
+    images: list[Any],
+    use_cache: bool = True,
+    mode: str = "single",
+    report_id: str = "",
+    output_path: str = "",
+    max_image_dimension: int = 0,
+    image_quality: int = 0,
+    ctx: Context = None) -> Union[TextContent, EmbeddedResource]:
+    """
+    Format text and images into a report and render it straight to PDF.
+    
+    The HTML never leaves the server and the PDF is rendered in memory, so
+    no separate html_to_pdf call or temporary file is needed.
+    
+    Args:
+        text_blocks: List of text content to format
+        images: List of images with data and captions; an optional "section"
+            is the index of the text block the image follows
+        use_cache: Reuse a previous result for identical inputs
+        mode: Generation mode, as for format_report
+        report_id: Stable id of the report, as for format_report
+        output_path: Write the PDF to this path instead of returning it
+        max_image_dimension: Downscale embedded images to this longest side in
+            pixels before rendering, to cap the PDF size; 0 leaves them as they are
+        image_quality: JPEG quality for recompressed images; 0 uses the default
+    
+    Returns:
+        The PDF as an embedded application/pdf resource, JSON with the path
+        and size when output_path is given, or a JSON error message
+    """
+    with tracer.span(
+        "formatting.render_report_pdf",
+        mode=mode,
+        text_blocks=len(text_blocks or []),
+        images=len(images or []),
+    ) as span:
+        error = _validate_request(text_blocks, mode)
+        if error is None and get_browser_pool is None:
+            error = json.dumps({"error": "PDF rendering needs Playwright (pip install playwright)"})
+        if error:
+            return TextContent(type="text", text=error)
+        
+        html, error = await _produce_report(text_blocks, images, use_cache, mode, report_id, ctx, span)
+        if html is None:
+            return TextContent(type="text", text=json.dumps({"error": error}))
+        
+        if max_image_dimension > 0:
+            html = await asyncio.to_thread(
+                compress_inline_images,
+                html,
+                max_image_dimension,
+                quality=image_quality or IMAGE_JPEG_QUALITY,
+            )
+        
+        try:
+            pdf = await get_browser_pool().render(html, output_path or None)
+        except Exception as e:
+            sys.stderr.write(f"PDF render failed: {e}\n")
+            sys.stderr.flush()
+            return TextContent(type="text", text=json.dumps({"error": f"PDF render failed: {e}"}))
+        span.set_attribute("pdf_bytes", len(pdf))
+        
+        if output_path:
+            return TextContent(type="text", text=json.dumps({"output_path": output_path, "bytes": len(pdf)}))
+        
+        return EmbeddedResource(
+            type="resource",
+            resource=BlobResourceContents(
+                uri=f"report://pdf/{hashlib.sha256(pdf).hexdigest()[:16]}.pdf",
+                mimeType="application/pdf",
+                blob=base64.b64encode(pdf).decode("ascii"),
+            ),
+        )
+
+
+@mcp.tool()
+async def submit_report(
+    text_blocks: list[str],
+    images: list[Any],
+    use_cache: bool = True,
+    mode: str = "single",
+    report_id: str = "") -> str:
+    """
+    Queue a report for generation and return immediately.
+    
+    Poll report_status, then fetch the HTML with report_result.
+    
+    Args:
+        text_blocks: List of text content to format
+        images: List of images with data and captions; an optional "section"
+            is the index of the text block the image follows
+        use_cache: Reuse a previous result for identical inputs
+        mode: Generation mode, as for format_report
+        report_id: Stable id of the report, as for format_report
+    
+    Returns:
+        JSON with job_id, status and queue_position, or an error with
+        retry_after (seconds) when the queue is full
+    """
+    error = _validate_request(text_blocks, mode)
+    if error:
+        return error
+    
+    params = {
+        "text_blocks": text_blocks,
+        "images": images or [],
+        "use_cache": use_cache,
+        "mode": mode,
+        "report_id": report_id,
+    }
+    try:
+        job = await job_queue.submit(params)
+    except QueueFullError as e:
+        return json.dumps({"error": str(e), "retry_after": round(e.retry_after, 1)})
+    
+    return json.dumps(job.to_dict(job_queue.position(job)))
+
+
+@mcp.tool()
+async def report_status(job_id: str) -> str:
+    """
+    Get the status and progress of a queued report.
+    
+    Args:
+        job_id: Id returned by submit_report
+    
+    Returns:
+        JSON with status (queued, running, succeeded, failed or cancelled),
+        progress between 0 and 1 and, while queued, queue_position
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return json.dumps({"error": f"Unknown or expired job: {job_id}"})
+    return json.dumps(job.to_dict(job_queue.position(job)))
+
+
+@mcp.tool()
+async def report_result(job_id: str, wait_seconds: float = 0) -> str:
+    """
+    Fetch the HTML of a finished report.
+    
+    Args:
+        job_id: Id returned by submit_report
+        wait_seconds: Wait up to this long for the job to finish
+    
+    Returns:
+        The generated HTML, or the job status as JSON if it has not
+        succeeded (yet)
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return json.dumps({"error": f"Unknown or expired job: {job_id}"})
+    
+    if wait_seconds > 0 and not job.done.is_set():
+        try:
+            await asyncio.wait_for(job.done.wait(), wait_seconds)
+        except asyncio.TimeoutError:
+            pass
+    
+    if job.status == SUCCEEDED:
+        return job.result
+    return json.dumps(job.to_dict(job_queue.position(job)))
+
+
+@mcp.tool()
+async def cancel_report(job_id: str) -> str:
+    """
+    Cancel a queued or running report.
+    
+    Args:
+        job_id: Id returned by submit_report
+    
+    Returns:
+        JSON with whether the job was cancelled and its status
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return json.dumps({"error": f"Unknown or expired job: {job_id}"})
+    cancelled = job_queue.cancel(job_id)
+    return json.dumps({"cancelled": cancelled, **job.to_dict(job_queue.position(job))})
+
+
+async def serve(transport: str) -> None:
+    """Serve on a transport until stopped, then release the process-wide resources."""
+    try:
+        if transport == "streamable-http":
+            await mcp.run_streamable_http_async()
+        elif transport == "sse":
+            await mcp.run_sse_async()
+        else:
+            await mcp.run_stdio_async()
+    finally:
+        await shutdown()
 
 
 if __name__ == "__main__":
-    mcp.run()
-    
\ No newline at end of file
+    asyncio.run(serve(MCP_TRANSPORT))
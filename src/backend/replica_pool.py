@@ -0,0 +1,237 @@
+"""
+Replicated MCP Server Sessions
+
+This module spreads the tool calls of one MCP server over several processes of
+that server, for CPU-bound servers that a single process cannot keep up with.
+Each call goes to the replica with the fewest outstanding requests. Idle
+replicas are pinged periodically, and replicas whose process exited or that
+stopped answering are restarted with exponential backoff.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Replica:
+    """One connected process of a replicated server."""
+
+    index: int
+    session: Any
+    close: Callable[[], Awaitable[None]]
+    outstanding: int = 0
+
+
+# Connects replica ``index``; the callback is called with the replica's session
+# if its connection later terminates on its own.
+ReplicaConnector = Callable[[int, Callable[[Any], None]], Awaitable[Replica]]
+
+
+class ReplicaPool:
+    """
+    Sessions to the replicas of one server, used in place of a single session.
+
+    The pool offers the ``call_tool`` and ``list_tools`` methods of
+    ``ClientSession``, so the client can treat it like any other session.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        size: int,
+        connect: ReplicaConnector,
+        health_check_interval: float = 30.0,
+        health_check_timeout: float = 10.0,
+        acquire_timeout: float = 30.0,
+        restart_backoff: float = 1.0,
+        max_restart_backoff: float = 60.0,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            name: Name of the server.
+            size: Number of replicas to run.
+            connect: Connects one replica.
+            health_check_interval: Seconds between pings of idle replicas; 0
+                disables health checks.
+            health_check_timeout: Seconds a replica has to answer a ping.
+            acquire_timeout: Seconds a call waits for a replica while none is live.
+            restart_backoff: Seconds before the first restart attempt.
+            max_restart_backoff: Upper bound of the doubling restart delay.
+        """
+        self.name = name
+        self.size = max(1, size)
+        self.connect = connect
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.acquire_timeout = acquire_timeout
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self._replicas: dict[int, Replica] = {}
+        self._restarts: dict[int, asyncio.Task] = {}
+        self._health_task: Optional[asyncio.Task] = None
+        self._available = asyncio.Event()
+        self._closed = False
+        self._turn = 0
+
+    @property
+    def live(self) -> int:
+        """Number of connected replicas."""
+        return len(self._replicas)
+
+    def outstanding(self) -> dict[int, int]:
+        """Outstanding calls per connected replica."""
+        return {index: replica.outstanding for index, replica in sorted(self._replicas.items())}
+
+    async def start(self) -> None:
+        """
+        Connect every replica concurrently.
+
+        Replicas that fail to start are retried in the background.
+
+        Raises:
+            Exception: The first connect error, if no replica could be started.
+        """
+        results = await asyncio.gather(
+            *(self._connect(index) for index in range(self.size)),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if len(errors) == self.size:
+            await self.close()
+            raise errors[0]
+
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                logger.error(f"Replica {index} of {self.name} failed to start: {result!r}")
+                self._schedule_restart(index)
+
+        if self.health_check_interval > 0:
+            self._health_task = asyncio.create_task(
+                self._health_loop(),
+                name=f"mcp-server-{self.name}-health",
+            )
+
+    async def call_tool(self, name: str, arguments: Optional[dict[str, Any]] = None) -> Any:
+        """Call a tool on the replica with the fewest outstanding calls."""
+        replica = await self._acquire()
+        replica.outstanding += 1
+        try:
+            return await replica.session.call_tool(name, arguments)
+        finally:
+            replica.outstanding -= 1
+
+    async def list_tools(self) -> Any:
+        """List the server's tools; every replica serves the same ones."""
+        replica = await self._acquire()
+        return await replica.session.list_tools()
+
+    async def close(self) -> None:
+        """Stop health checks and restarts and close every replica."""
+        self._closed = True
+        tasks = [task for task in (self._health_task, *self._restarts.values()) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        replicas = list(self._replicas.values())
+        self._replicas.clear()
+        # Wake calls waiting for a replica so they see the pool is closed
+        self._available.set()
+        await asyncio.gather(*(replica.close() for replica in replicas), return_exceptions=True)
+
+    async def _connect(self, index: int) -> Replica:
+        replica = await self.connect(index, lambda session: self._lost(index, session))
+        if self._closed:
+            await replica.close()
+            raise RuntimeError(f"Replica pool of {self.name} is closed")
+        self._replicas[index] = replica
+        self._available.set()
+        return replica
+
+    async def _acquire(self) -> Replica:
+        """Pick the least loaded replica, rotating among equally loaded ones."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.acquire_timeout
+        # The replica that woke us may be lost again before we run, so check
+        # again after every wake-up
+        while not self._replicas:
+            if self._closed:
+                raise RuntimeError(f"Replica pool of {self.name} is closed")
+            try:
+                await asyncio.wait_for(self._available.wait(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"No live replica of server {self.name}") from None
+
+        replicas = list(self._replicas.values())
+        least = min(replica.outstanding for replica in replicas)
+        candidates = [replica for replica in replicas if replica.outstanding == least]
+        self._turn += 1
+        return candidates[self._turn % len(candidates)]
+
+    def _remove(self, replica: Replica) -> None:
+        del self._replicas[replica.index]
+        if not self._replicas:
+            self._available.clear()
+
+    def _lost(self, index: int, session: Any) -> None:
+        """Handle a replica whose connection terminated on its own."""
+        replica = self._replicas.get(index)
+        if self._closed or replica is None or replica.session is not session:
+            return
+        logger.warning(f"Replica {index} of {self.name} exited; restarting it")
+        self._remove(replica)
+        self._schedule_restart(index)
+
+    def _schedule_restart(self, index: int) -> None:
+        if self._closed or index in self._restarts:
+            return
+        self._restarts[index] = asyncio.create_task(
+            self._restart(index),
+            name=f"mcp-server-{self.name}-restart-{index}",
+        )
+
+    async def _restart(self, index: int) -> None:
+        delay = self.restart_backoff
+        try:
+            while not self._closed:
+                await asyncio.sleep(delay)
+                try:
+                    await self._connect(index)
+                except Exception as e:
+                    logger.error(f"Failed to restart replica {index} of {self.name}: {e!r}")
+                    delay = min(delay * 2, self.max_restart_backoff)
+                    continue
+                logger.info(f"Restarted replica {index} of {self.name}")
+                return
+        finally:
+            self._restarts.pop(index, None)
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            # Busy replicas are skipped: a CPU-bound tool can legitimately
+            # keep a server from answering the ping in time.
+            idle = [replica for replica in self._replicas.values() if replica.outstanding == 0]
+            await asyncio.gather(*(self._check(replica) for replica in idle))
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            await asyncio.wait_for(replica.session.send_ping(), self.health_check_timeout)
+            return
+        except Exception as e:
+            if self._closed or self._replicas.get(replica.index) is not replica:
+                return
+            logger.warning(f"Replica {replica.index} of {self.name} failed its health check: {e!r}; restarting it")
+
+        self._remove(replica)
+        try:
+            await replica.close()
+        except Exception as e:
+            logger.error(f"Error closing replica {replica.index} of {self.name}: {e!r}")
+        self._schedule_restart(replica.index)
@@ -0,0 +1,228 @@
+"""
+Large Tool Result Store
+
+This module keeps oversized tool results out of the conversation. A result
+above its size limit is streamed to a spill file instead of being joined into
+one string. The model gets a preview plus a handle, and it can page through the
+rest with the built-in ``read_tool_result`` tool. Pages are read through a
+memory map, so only the requested range is loaded into memory.
+"""
+
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+READ_TOOL_NAME = "read_tool_result"
+
+READ_TOOL_DECLARATION = {
+    "name": READ_TOOL_NAME,
+    "description": (
+        "Read more of a tool result that was too large to return in full. "
+        "Pass the result_handle from the truncated result and the next_offset "
+        "to continue where the previous page ended."
+    ),
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "result_handle": {"type": "string", "description": "Handle of the stored result"},
+            "offset": {"type": "integer", "description": "Byte offset to start reading from"},
+            "max_bytes": {"type": "integer", "description": "Maximum number of bytes to return"},
+        },
+        "required": ["result_handle"],
+    },
+}
+
+
+@dataclass
+class StoredResult:
+    """A spilled tool result on disk."""
+
+    handle: str
+    tool_name: str
+    path: Path
+    size: int
+    lines: int
+    created_at: float
+
+
+def _utf8_boundary(data: bytes, end: int) -> int:
+    """Move ``end`` back so it does not split a multi-byte UTF-8 character."""
+    while 0 < end < len(data) and (data[end] & 0xC0) == 0x80:
+        end -= 1
+    return end
+
+
+class ResultStore:
+    """
+    Spill files for oversized tool results, with paged reads.
+
+    Results expire after ``ttl_seconds``; the oldest are deleted once more
+    than ``max_results`` or ``max_disk_bytes`` are stored.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        preview_bytes: int = 4096,
+        page_bytes: int = 16384,
+        ttl_seconds: float = 3600.0,
+        max_results: int = 256,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Directory for spill files. If None, a temporary
+                directory is created and removed on :meth:`close`.
+            preview_bytes: Size of the preview returned in place of the result.
+            page_bytes: Default and maximum size of a ``read_tool_result`` page.
+            ttl_seconds: Seconds a spilled result stays readable.
+            max_results: Maximum number of spilled results kept.
+            max_disk_bytes: Maximum total size of the spill files.
+        """
+        self._owns_directory = directory is None
+        self.directory = Path(directory) if directory else Path(tempfile.mkdtemp(prefix="tool-results-"))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.preview_bytes = preview_bytes
+        self.page_bytes = page_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_results = max_results
+        self.max_disk_bytes = max_disk_bytes
+        self._results: OrderedDict[str, StoredResult] = OrderedDict()
+        # Spills and reads run in worker threads
+        self._lock = threading.Lock()
+
+    def spill(self, tool_name: str, chunks: Iterable[str]) -> StoredResult:
+        """
+        Write a result to a spill file chunk by chunk.
+
+        Args:
+            tool_name: Tool that produced the result.
+            chunks: Text pieces of the result, joined with newlines.
+
+        Returns:
+            The stored result.
+        """
+        handle = f"res_{uuid.uuid4().hex[:16]}"
+        path = self.directory / f"{handle}.txt"
+        size = 0
+        lines = 0
+        with open(path, "wb") as f:
+            for index, chunk in enumerate(chunks):
+                data = (("\n" if index else "") + chunk).encode("utf-8")
+                f.write(data)
+                size += len(data)
+                lines += data.count(b"\n")
+        stored = StoredResult(handle, tool_name, path, size, lines + 1 if size else 0, time.time())
+        with self._lock:
+            self._results[handle] = stored
+            self._evict()
+        return stored
+
+    def read(self, handle: str, offset: int = 0, max_bytes: Optional[int] = None) -> dict[str, Any]:
+        """
+        Read one page of a stored result.
+
+        Args:
+            handle: Handle returned when the result was stored.
+            offset: Byte offset to start from.
+            max_bytes: Page size, capped at ``page_bytes``.
+
+        Returns:
+            Function response payload with the page text and the next offset.
+        """
+        with self._lock:
+            self._evict()
+            stored = self._results.get(handle)
+        if stored is None or not stored.path.exists():
+            return {"error": f"Unknown or expired result handle: {handle}"}
+
+        length = min(max_bytes or self.page_bytes, self.page_bytes)
+        offset = max(0, min(int(offset), stored.size))
+        text, end = self._read_range(stored, offset, offset + length)
+        response: dict[str, Any] = {
+            "result": text,
+            "offset": offset,
+            "total_bytes": stored.size,
+        }
+        if end < stored.size:
+            response["next_offset"] = end
+        return response
+
+    def preview(self, stored: StoredResult, limit_bytes: int) -> dict[str, Any]:
+        """
+        Function response payload standing in for a spilled result.
+
+        Args:
+            stored: The spilled result.
+            limit_bytes: The size limit the result exceeded.
+
+        Returns:
+            Payload with the leading part of the result and how to read the rest.
+        """
+        text, end = self._read_range(stored, 0, min(self.preview_bytes, limit_bytes))
+        return {
+            "result": text,
+            "truncated": True,
+            "total_bytes": stored.size,
+            "total_lines": stored.lines,
+            "result_handle": stored.handle,
+            "next_offset": end,
+            "note": (
+                f"Result truncated to its first {end} of {stored.size} bytes. "
+                f"Call {READ_TOOL_NAME} with result_handle and next_offset to read more."
+            ),
+        }
+
+    def close(self) -> None:
+        """Delete every spill file."""
+        with self._lock:
+            for stored in self._results.values():
+                self._delete(stored)
+            self._results.clear()
+        if self._owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _read_range(self, stored: StoredResult, start: int, end: int) -> tuple[str, int]:
+        """Decode ``[start, end)`` of a spill file, ending on a line break when possible."""
+        if stored.size == 0 or start >= stored.size:
+            return "", stored.size
+        with open(stored.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            end = min(end, stored.size)
+            if end < stored.size:
+                # Prefer ending a page on a line break in its second half
+                newline = view.rfind(b"\n", start + (end - start) // 2, end)
+                end = newline + 1 if newline != -1 else _utf8_boundary(view, end)
+            data = view[start:end]
+        return data.decode("utf-8", errors="replace"), end
+
+    def _delete(self, stored: StoredResult) -> None:
+        try:
+            os.remove(stored.path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        now = time.time()
+        for handle in [h for h, r in self._results.items() if now - r.created_at > self.ttl_seconds]:
+            self._delete(self._results.pop(handle))
+
+        total = sum(r.size for r in self._results.values())
+        # The newest result is kept even when it alone exceeds the disk budget
+        while len(self._results) > 1 and (len(self._results) > self.max_results or total > self.max_disk_bytes):
+            _, stored = self._results.popitem(last=False)
+            total -= stored.size
+            self._delete(stored)
+            logger.debug(f"Evicted stored result of {stored.tool_name} ({stored.size} bytes)")
@@ -0,0 +1,132 @@
+"""
+MCP Tool Result Cache
+
+This module caches the results of idempotent MCP tool calls, such as price and
+fundamentals lookups, keyed on the tool name plus its canonicalized arguments.
+Caching is opt-in per tool through a TTL in config. Entries expire after their
+TTL and the least recently used ones are evicted once the cache is full.
+Concurrent identical calls share a single in-flight request.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_arguments(arguments: dict[str, Any]) -> str:
+    """Serialize tool arguments so equivalent argument dicts compare equal."""
+    return json.dumps(arguments or {}, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def tool_cache_key(tool_name: str, arguments: dict[str, Any]) -> str:
+    """Cache key for a call of ``tool_name`` with ``arguments``."""
+    payload = f"{tool_name}\x00{canonical_arguments(arguments)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _CachedResult:
+    result: Any
+    expires_at: float
+
+
+class ToolResultCache:
+    """
+    TTL and LRU bounded cache of tool results with single-flight calls.
+
+    Error results (``isError``) and raised exceptions are never cached, but
+    concurrent callers waiting on the same in-flight call all receive them.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached results.
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, _CachedResult] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_call(
+        self,
+        tool_name: str,
+        arguments: dict[str, Any],
+        ttl: float,
+        call: Callable[[], Awaitable[Any]],
+    ) -> tuple[Any, bool]:
+        """
+        Return a cached result, joining or starting the call on a miss.
+
+        Args:
+            tool_name: Name of the tool.
+            arguments: Arguments of the call.
+            ttl: Seconds a successful result stays cached.
+            call: Performs the actual tool call.
+
+        Returns:
+            The result and whether it was served without a new call.
+        """
+        key = tool_cache_key(tool_name, arguments)
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry and entry.expires_at > now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.result, True
+        if entry:
+            del self._entries[key]
+
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, ttl, done))
+        else:
+            self.hits += 1
+            logger.debug(f"Joining in-flight call of {tool_name}")
+
+        # A cancelled caller must not cancel the call other callers are waiting on
+        return await asyncio.shield(task), shared
+
+    def invalidate(self, tool_name: str, arguments: dict[str, Any]) -> None:
+        """Drop the cached result of one call."""
+        self._entries.pop(tool_cache_key(tool_name, arguments), None)
+
+    def clear(self) -> None:
+        """Drop every cached result; in-flight calls finish uncached."""
+        self._entries.clear()
+        self._in_flight.clear()
+
+    def _finish(self, key: str, ttl: float, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        else:
+            return
+        if task.cancelled() or task.exception() is not None:
+            return
+
+        result = task.result()
+        if getattr(result, "isError", False):
+            return
+
+        self._entries[key] = _CachedResult(result, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
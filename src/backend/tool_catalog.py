@@ -0,0 +1,90 @@
+"""
+Persisted Tool Catalog
+
+This module stores the tools discovered from each MCP server on disk, keyed by
+a fingerprint of how the server is launched (command, args, env, transport and
+URL). On the next start the client can offer a server's tools straight from
+the catalog while the server is still being spawned, instead of waiting for
+every server to connect and answer ``list_tools``. A changed launch
+configuration changes the fingerprint, so stale entries are never used.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION = 1
+
+
+def server_fingerprint(server_config: Any) -> str:
+    """Fingerprint of everything that determines which tools a server offers."""
+    payload = json.dumps(
+        {
+            "command": server_config.command,
+            "args": list(server_config.args),
+            "env": dict(server_config.env or {}),
+            "transport": server_config.transport,
+            "url": server_config.url,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ToolCatalog:
+    """Tool declarations per server, persisted as one JSON file."""
+
+    def __init__(self, path: str):
+        """
+        Initialize the catalog and load it if the file exists.
+
+        Args:
+            path: JSON file the catalog is stored in.
+        """
+        self.path = Path(path).expanduser()
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._load()
+
+    def get(self, server_config: Any) -> Optional[list[dict[str, Any]]]:
+        """Cached tools of a server, or None if it has no valid entry."""
+        entry = self._entries.get(server_config.name)
+        if entry and entry.get("fingerprint") == server_fingerprint(server_config):
+            return entry.get("tools")
+        return None
+
+    def put(self, server_config: Any, tools: list[dict[str, Any]]) -> None:
+        """Store the tools of a server, writing the file only if they changed."""
+        entry = {"fingerprint": server_fingerprint(server_config), "tools": tools}
+        if self._entries.get(server_config.name) == entry:
+            return
+        self._entries[server_config.name] = entry
+        self._save()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable tool catalog {self.path}: {e}")
+            return
+        if data.get("version") == CATALOG_VERSION:
+            self._entries = data.get("servers", {})
+
+    def _save(self) -> None:
+        """Write the catalog atomically, so concurrent clients never read a partial file."""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, prefix=".tool-catalog-", suffix=".json")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": CATALOG_VERSION, "servers": self._entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to write tool catalog {self.path}: {e}")
@@ -0,0 +1,284 @@
+"""
+Gemini Tool Registry
+
+This module keeps the Gemini function declarations for the MCP tools known to
+the client. Declarations are built once per tool, keyed by a fingerprint of the
+tool's schema, so only tools whose schema actually changed are rebuilt after a
+rediscovery or a server reconnect.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from .lazy_imports import lazy_import
+
+genai = lazy_import("google.generativeai")
+
+logger = logging.getLogger(__name__)
+
+# Nesting deeper than this (or a recursive $ref) is flattened to a string.
+MAX_SCHEMA_DEPTH = 16
+
+# Formats accepted by the Gemini API per type; other formats are dropped.
+SUPPORTED_FORMATS = {
+    "string": {"date-time"},
+    "number": {"float", "double"},
+    "integer": {"int32", "int64"},
+}
+
+
+def fingerprint_tool(tool_info: dict[str, Any]) -> str:
+    """Return a stable hash of a tool's name, description and input schema."""
+    payload = json.dumps(tool_info, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def map_json_type_to_gemini(json_type: str) -> int:
+    """Map JSON schema types to Gemini proto types."""
+    type_mapping = {
+        "string": genai.protos.Type.STRING,
+        "number": genai.protos.Type.NUMBER,
+        "integer": genai.protos.Type.INTEGER,
+        "boolean": genai.protos.Type.BOOLEAN,
+        "array": genai.protos.Type.ARRAY,
+        "object": genai.protos.Type.OBJECT,
+    }
+    return type_mapping.get(json_type, genai.protos.Type.STRING)
+
+
+class SchemaConverter:
+    """Recursively convert a JSON schema into a ``genai.protos.Schema``."""
+
+    def __init__(self, root: dict[str, Any]):
+        """
+        Initialize the converter.
+
+        Args:
+            root: The top-level JSON schema, used to resolve local ``$ref`` pointers.
+        """
+        self.root = root
+
+    def convert(self, schema: dict[str, Any], depth: int = 0) -> genai.protos.Schema:
+        """
+        Convert a JSON schema node.
+
+        Args:
+            schema: The JSON schema node to convert.
+            depth: Current nesting depth.
+
+        Returns:
+            The equivalent Gemini schema.
+        """
+        schema, nullable = self._normalize(schema)
+        description = schema.get("description", "")
+
+        if depth > MAX_SCHEMA_DEPTH:
+            return genai.protos.Schema(type=genai.protos.Type.STRING, description=description)
+
+        json_type = schema.get("type")
+        if isinstance(json_type, list):
+            non_null = [t for t in json_type if t != "null"]
+            nullable = nullable or len(non_null) < len(json_type)
+            json_type = non_null[0] if non_null else "string"
+        if not json_type:
+            if "properties" in schema:
+                json_type = "object"
+            elif "items" in schema:
+                json_type = "array"
+            else:
+                json_type = "string"
+
+        kwargs: dict[str, Any] = {"description": description}
+        if nullable:
+            kwargs["nullable"] = True
+
+        if "enum" in schema:
+            kwargs["type"] = genai.protos.Type.STRING
+            kwargs["format"] = "enum"
+            kwargs["enum"] = [str(value) for value in schema["enum"] if value is not None]
+            return genai.protos.Schema(**kwargs)
+
+        fmt = schema.get("format")
+        if fmt and fmt in SUPPORTED_FORMATS.get(json_type, ()):
+            kwargs["format"] = fmt
+
+        if json_type == "array":
+            items = schema.get("items")
+            if isinstance(items, list):
+                items = items[0] if items else {}
+            kwargs["items"] = self.convert(items or {"type": "string"}, depth + 1)
+        elif json_type == "object":
+            properties = schema.get("properties") or {}
+            if properties:
+                kwargs["properties"] = {
+                    name: self.convert(prop, depth + 1) for name, prop in properties.items()
+                }
+            required = [name for name in schema.get("required", []) if name in properties]
+            if required:
+                kwargs["required"] = required
+
+        kwargs["type"] = map_json_type_to_gemini(json_type)
+        return genai.protos.Schema(**kwargs)
+
+    def _normalize(self, schema: dict[str, Any]) -> tuple[dict[str, Any], bool]:
+        """Resolve ``$ref`` and collapse ``anyOf``/``oneOf``/``allOf`` to one node."""
+        nullable = False
+
+        for _ in range(MAX_SCHEMA_DEPTH):
+            if "$ref" in schema:
+                resolved = self._resolve_ref(schema["$ref"])
+                extra = {k: v for k, v in schema.items() if k != "$ref"}
+                schema = {**resolved, **extra}
+                continue
+
+            variants = schema.get("anyOf") or schema.get("oneOf")
+            if variants:
+                non_null = [v for v in variants if v.get("type") != "null"]
+                nullable = nullable or len(non_null) < len(variants)
+                chosen = non_null[0] if non_null else {"type": "string"}
+                extra = {k: v for k, v in schema.items() if k not in ("anyOf", "oneOf")}
+                schema = {**chosen, **extra}
+                continue
+
+            all_of = schema.get("allOf")
+            if all_of:
+                merged: dict[str, Any] = {}
+                for part in all_of:
+                    merged.update(part)
+                extra = {k: v for k, v in schema.items() if k != "allOf"}
+                schema = {**merged, **extra}
+                continue
+
+            break
+
+        return schema, nullable
+
+    def _resolve_ref(self, ref: str) -> dict[str, Any]:
+        """Resolve a local JSON pointer such as ``#/$defs/Image``."""
+        if not ref.startswith("#/"):
+            logger.debug(f"Unsupported schema reference: {ref}")
+            return {"type": "string"}
+
+        node: Any = self.root
+        for key in ref[2:].split("/"):
+            if not isinstance(node, dict) or key not in node:
+                logger.debug(f"Unresolvable schema reference: {ref}")
+                return {"type": "string"}
+            node = node[key]
+        return node if isinstance(node, dict) else {"type": "string"}
+
+
+def build_function_declaration(tool_info: dict[str, Any]) -> genai.protos.FunctionDeclaration:
+    """
+    Build the Gemini function declaration for a single MCP tool.
+
+    Args:
+        tool_info: Tool entry with ``name``, ``description`` and ``input_schema``.
+
+    Returns:
+        The Gemini function declaration.
+    """
+    input_schema = tool_info.get("input_schema") or {}
+    declaration = genai.protos.FunctionDeclaration(
+        name=tool_info["name"],
+        description=tool_info.get("description", ""),
+    )
+
+    if input_schema.get("properties"):
+        parameters = SchemaConverter(input_schema).convert({**input_schema, "type": "object"})
+        declaration.parameters = parameters
+
+    return declaration
+
+
+@dataclass
+class _RegistryEntry:
+    """A built declaration and the fingerprint of the schema it came from."""
+
+    fingerprint: str
+    declaration: genai.protos.FunctionDeclaration
+
+
+class ToolRegistry:
+    """
+    Incrementally maintained cache of Gemini tool declarations.
+
+    Call :meth:`sync` whenever the client's tool map changes; only tools whose
+    fingerprint differs from the cached one are rebuilt. :meth:`gemini_tools`
+    returns the same ``genai.protos.Tool`` list until the next change.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._entries: dict[str, _RegistryEntry] = {}
+        self._gemini_tools: Optional[list[genai.protos.Tool]] = None
+        self._fingerprint = ""
+
+    @property
+    def fingerprint(self) -> str:
+        """Combined fingerprint of every registered tool."""
+        return self._fingerprint
+
+    def sync(self, tools: dict[str, dict[str, Any]]) -> int:
+        """
+        Bring the registry in line with the client's current tool map.
+
+        Args:
+            tools: Mapping of tool names to tool entries.
+
+        Returns:
+            Number of declarations that were added, rebuilt or removed.
+        """
+        changes = 0
+
+        for tool_name in list(self._entries):
+            if tool_name not in tools:
+                del self._entries[tool_name]
+                changes += 1
+
+        for tool_name, tool_info in tools.items():
+            fingerprint = fingerprint_tool(tool_info)
+            entry = self._entries.get(tool_name)
+            if entry and entry.fingerprint == fingerprint:
+                continue
+            try:
+                declaration = build_function_declaration(tool_info)
+            except Exception as e:
+                logger.error(f"Failed to build Gemini declaration for {tool_name}: {e}")
+                # Drop the stale declaration rather than keep offering the old schema
+                if self._entries.pop(tool_name, None) is not None:
+                    changes += 1
+                continue
+            self._entries[tool_name] = _RegistryEntry(fingerprint, declaration)
+            changes += 1
+
+        if changes or self._gemini_tools is None:
+            self._rebuild()
+            logger.debug(f"Tool registry updated: {changes} declarations changed")
+
+        return changes
+
+    def gemini_tools(self) -> Optional[list[genai.protos.Tool]]:
+        """Return the cached Gemini tools config, or None if no tools are registered."""
+        if self._gemini_tools is None:
+            self._rebuild()
+        return self._gemini_tools or None
+
+    def _rebuild(self) -> None:
+        """Reassemble the top-level Tool message from the cached declarations."""
+        if not self._entries:
+            self._gemini_tools = []
+            self._fingerprint = ""
+            return
+
+        names = sorted(self._entries)
+        self._gemini_tools = [genai.protos.Tool(
+            function_declarations=[self._entries[name].declaration for name in names]
+        )]
+        combined = "".join(self._entries[name].fingerprint for name in names)
+        self._fingerprint = hashlib.sha256(combined.encode("utf-8")).hexdigest()
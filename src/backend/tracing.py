@@ -0,0 +1,373 @@
+"""
+Latency Tracing
+
+This module records timed spans for each stage of a report request (config
+load, server connect, tool discovery, Gemini round trips, tool calls, HTML
+generation and PDF rendering) and hands the finished spans to pluggable
+exporters: an in-memory buffer, a JSON lines file and a Prometheus text-format
+histogram. Nested spans share a trace id, so one slow request can be broken
+down stage by stage.
+"""
+
+import atexit
+import bisect
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Optional, Protocol, TextIO
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds, from fast cache hits to slow generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    """A timed stage of work, with attributes such as token counts."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_time: float = 0.0
+    duration: float = 0.0
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Attach an attribute, ignoring None values."""
+        if value is not None:
+            self.attributes[key] = value
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-serializable representation of the span."""
+        return asdict(self)
+
+
+class SpanExporter(Protocol):
+    """
+    Receives every finished span.
+
+    Exporters holding buffered output may also define ``close()``, called by
+    :meth:`Tracer.close`.
+    """
+
+    def export(self, span: Span) -> None:
+        ...
+
+
+class InMemoryExporter:
+    """Keeps the most recent spans in memory, e.g. for tests and benchmarks."""
+
+    def __init__(self, max_spans: int = 10000):
+        """
+        Initialize the exporter.
+
+        Args:
+            max_spans: Number of recent spans to keep.
+        """
+        self.spans: deque[Span] = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def durations(self, name: str) -> list[float]:
+        """Durations of the kept spans with the given name."""
+        with self._lock:
+            return [span.duration for span in self.spans if span.name == name]
+
+    def clear(self) -> None:
+        """Forget every kept span."""
+        with self._lock:
+            self.spans.clear()
+
+
+class JsonLinesExporter:
+    """
+    Appends each span as one JSON object per line.
+
+    The file stays open and spans go to its write buffer, which is flushed at
+    most every ``flush_interval`` seconds and on :meth:`close`, so exporting a
+    span from the event loop rarely touches the disk.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        """
+        Initialize the exporter.
+
+        Args:
+            path: File to append spans to; parent directories are created.
+            flush_interval: Maximum seconds a span waits in the write buffer.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._file: Optional[TextIO] = None
+        self._last_flush = 0.0
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+                self._last_flush = time.monotonic()
+            self._file.write(line + "\n")
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._file.flush()
+                self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Flush buffered spans and close the file; a later span reopens it."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram for one stage."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile: the upper bound of the bucket holding it."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class PrometheusExporter:
+    """
+    Aggregates span durations into per-stage histograms in Prometheus text format.
+
+    Scrape :meth:`render`, or give a ``path`` to have the exposition written
+    there (for the node exporter's textfile collector) at most every
+    ``write_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        write_interval: float = 10.0,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        metric_name: str = "finrl_stage_latency_seconds",
+    ):
+        """
+        Initialize the exporter.
+
+        Args:
+            path: Optional file to write the exposition to.
+            write_interval: Minimum seconds between file writes.
+            buckets: Histogram bucket upper bounds in seconds.
+            metric_name: Name of the exported histogram metric.
+        """
+        self.path = Path(path) if path else None
+        self.write_interval = write_interval
+        self.buckets = buckets
+        self.metric_name = metric_name
+        self.histograms: dict[tuple[str, bool], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+        self._unwritten = False
+
+    def export(self, span: Span) -> None:
+        key = (span.name, span.error is None)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram(self.buckets)
+            histogram.observe(span.duration)
+            self._unwritten = True
+
+        if self.path and time.monotonic() - self._last_write >= self.write_interval:
+            self.write()
+
+    def close(self) -> None:
+        """Write spans observed since the last write, which the interval held back."""
+        if self._unwritten:
+            self.write()
+
+    def render(self) -> str:
+        """The histograms in Prometheus text exposition format."""
+        lines = [
+            f"# HELP {self.metric_name} Latency of each request stage.",
+            f"# TYPE {self.metric_name} histogram",
+        ]
+        with self._lock:
+            for (stage, ok), histogram in sorted(self.histograms.items()):
+                labels = f'stage="{stage}",status="{"ok" if ok else "error"}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{self.metric_name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{self.metric_name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"{self.metric_name}_sum{{{labels}}} {histogram.total}")
+                lines.append(f"{self.metric_name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> None:
+        """Write the exposition to ``path`` atomically."""
+        if not self.path:
+            return
+        self._last_write = time.monotonic()
+        self._unwritten = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp_path.write_text(self.render(), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to write Prometheus metrics: {e}")
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the registered exporters."""
+
+    def __init__(self, exporters: Optional[list[SpanExporter]] = None):
+        """
+        Initialize the tracer.
+
+        Args:
+            exporters: Exporters receiving every finished span.
+        """
+        self.exporters: list[SpanExporter] = list(exporters or [])
+
+    def add_exporter(self, exporter: SpanExporter) -> None:
+        """Register an additional exporter."""
+        self.exporters.append(exporter)
+
+    def close(self) -> None:
+        """Flush the exporters' buffered output; spans can still be recorded afterwards."""
+        for exporter in self.exporters:
+            close = getattr(exporter, "close", None)
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                logger.warning(f"Failed to close span exporter {type(exporter).__name__}: {e}")
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Time the enclosed block as a span nested under the current one.
+
+        Args:
+            name: Stage name, e.g. ``"gemini.send"``.
+            **attributes: Initial span attributes.
+
+        Yields:
+            The span, so attributes such as token counts can be added.
+        """
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent else None,
+            start_time=time.time(),
+            attributes={k: v for k, v in attributes.items() if v is not None},
+        )
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Finished in another context, e.g. an async generator closed elsewhere
+                pass
+            self._export(span)
+
+    def _export(self, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.debug(f"Span exporter {type(exporter).__name__} failed: {e}")
+
+
+def current_span() -> Optional[Span]:
+    """The innermost active span, if any."""
+    return _current_span.get()
+
+
+def record_usage(span: Span, response: Any) -> None:
+    """Copy a Gemini response's token counts onto a tracing span."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    span.set_attribute("prompt_tokens", getattr(usage, "prompt_token_count", None))
+    span.set_attribute("output_tokens", getattr(usage, "candidates_token_count", None))
+    span.set_attribute("cached_tokens", getattr(usage, "cached_content_token_count", None) or None)
+
+
+# Process-wide tracer; without exporters spans are timed and discarded
+tracer = Tracer()
+
+# Write out what the exporters still buffer when the process exits
+atexit.register(tracer.close)
+
+
+def configure_tracing(
+    jsonl_path: Optional[str] = None,
+    prometheus_path: Optional[str] = None,
+    in_memory: bool = False,
+) -> Tracer:
+    """
+    Register the standard exporters on the process-wide tracer.
+
+    Args:
+        jsonl_path: Append spans to this JSON lines file.
+        prometheus_path: Write Prometheus histograms to this file.
+        in_memory: Keep recent spans in an :class:`InMemoryExporter`.
+
+    Returns:
+        The process-wide tracer.
+    """
+    def registered(kind: type, path: Optional[str] = None) -> bool:
+        return any(
+            isinstance(exporter, kind) and (path is None or exporter.path == Path(path))
+            for exporter in tracer.exporters
+        )
+
+    if in_memory and not registered(InMemoryExporter):
+        tracer.add_exporter(InMemoryExporter())
+    if jsonl_path and not registered(JsonLinesExporter, jsonl_path):
+        tracer.add_exporter(JsonLinesExporter(jsonl_path))
+    if prometheus_path and not registered(PrometheusExporter, prometheus_path):
+        tracer.add_exporter(PrometheusExporter(prometheus_path))
+    return tracer
@@ -0,0 +1,237 @@
+"""
+MCP Server Transports
+
+This module opens the message streams a ``ClientSession`` talks over, for each
+supported server transport:
+
+- ``stdio``: spawn the server as a subprocess and talk over its stdin/stdout.
+- ``memory``: load a Python (FastMCP) server into this process and connect
+  through in-memory streams. Tool arguments and results are passed as objects
+  instead of being serialized across a pipe.
+- ``http``: connect to a server already serving streamable HTTP at a URL.
+"""
+
+import importlib
+import importlib.util
+import logging
+import os
+import sys
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = ("stdio", "memory", "http")
+
+# Servers loaded in-process, by module path, so replicas and reconnects reuse them
+_loaded_servers: dict[str, Any] = {}
+
+# Process-level shutdown hooks of the loaded servers. A server's lifespan runs
+# per connection, so its shared resources are released here on client close.
+_server_shutdowns: dict[str, Callable[[], Awaitable[None]]] = {}
+
+
+def _server_module_target(args: list[str]) -> tuple[str, str]:
+    """
+    Find the server module in a server's command arguments.
+
+    Returns:
+        ("module", dotted name) for ``-m package.module`` or ("path", file)
+        for the first ``.py`` argument.
+    """
+    if "-m" in args:
+        index = args.index("-m")
+        if index + 1 < len(args):
+            return "module", args[index + 1]
+    for arg in args:
+        if arg.endswith(".py"):
+            return "path", arg
+    raise ValueError("memory transport needs a Python server: '-m module' or a .py path in args")
+
+
+@contextmanager
+def _sibling_imports(directory: Path, keep: str) -> Iterator[None]:
+    """
+    Let a server loading from ``directory`` import its sibling modules by bare name.
+
+    The directory is on ``sys.path`` only while the server loads, and the
+    sibling modules it imported are taken out of ``sys.modules`` afterwards;
+    the server keeps its own references to them. Generic names such as
+    ``config`` or ``cache`` therefore never shadow the client's modules.
+
+    Args:
+        directory: Directory of the server module.
+        keep: Name of the server module itself, which stays registered.
+    """
+    entry = str(directory)
+    if entry in sys.path:
+        # Already importable from there; nothing to undo
+        yield
+        return
+
+    before = set(sys.modules)
+    sys.path.insert(0, entry)
+    try:
+        yield
+    finally:
+        sys.path.remove(entry)
+        for module_name in set(sys.modules) - before:
+            if module_name == keep or "." in module_name:
+                continue
+            origin = getattr(sys.modules[module_name], "__file__", None)
+            if origin and Path(origin).resolve().parent == directory:
+                del sys.modules[module_name]
+
+
+@contextmanager
+def _server_environ(env: dict[str, str]) -> Iterator[None]:
+    """
+    Apply a server's environment variables only while the server loads.
+
+    Servers read their settings when their modules are imported, so the
+    variables are set for the import and the previous values restored
+    afterwards; one server's environment does not leak into the client or
+    into servers loaded after it.
+
+    Args:
+        env: Environment variables configured for the server.
+    """
+    previous = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def load_server(name: str, args: list[str], env: dict[str, str]) -> Any:
+    """
+    Import a server module into this process and return its FastMCP server.
+
+    Servers written to run as scripts can import their sibling modules by
+    bare name while they load (see :func:`_sibling_imports`). ``env`` is
+    applied to this process's environment only while the server loads (see
+    :func:`_server_environ`), so it covers settings read at import time but
+    not variables the server looks up later.
+
+    Args:
+        name: Name of the server, used to name a module loaded from a path.
+        args: The server's command arguments.
+        env: Environment variables configured for the server.
+
+    Returns:
+        The low-level MCP server instance of the module.
+    """
+    kind, target = _server_module_target(args)
+    server = _loaded_servers.get(target)
+    if server is not None:
+        return server
+
+    if kind == "module":
+        spec = importlib.util.find_spec(target)
+        if spec is None or spec.origin is None:
+            raise ImportError(f"Cannot find MCP server module {target}")
+        with _server_environ(env or {}), _sibling_imports(Path(spec.origin).resolve().parent, keep=target):
+            module = importlib.import_module(target)
+    else:
+        path = Path(target).resolve()
+        spec = importlib.util.spec_from_file_location(f"mcp_server_{name.replace('-', '_')}", path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Cannot load MCP server from {path}")
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        with _server_environ(env or {}), _sibling_imports(path.parent, keep=spec.name):
+            spec.loader.exec_module(module)
+
+    for value in vars(module).values():
+        # FastMCP wraps the low-level server that speaks the protocol
+        lowlevel = getattr(value, "_mcp_server", None)
+        if lowlevel is not None and hasattr(lowlevel, "create_initialization_options"):
+            server = lowlevel
+            break
+    else:
+        raise ValueError(f"No FastMCP server found in {target}")
+
+    _loaded_servers[target] = server
+    shutdown = getattr(module, "shutdown", None)
+    if callable(shutdown):
+        _server_shutdowns[target] = shutdown
+    logger.info(f"Loaded MCP server {name} in-process from {target}")
+    return server
+
+
+async def shutdown_loaded_servers() -> None:
+    """Run the shutdown hooks of the servers loaded in-process."""
+    hooks = list(_server_shutdowns.items())
+    _server_shutdowns.clear()
+    _loaded_servers.clear()
+    for target, shutdown in hooks:
+        try:
+            await shutdown()
+        except Exception as e:
+            logger.error(f"Error shutting down in-process server {target}: {e}")
+
+
+@asynccontextmanager
+async def _memory_streams(server: Any) -> AsyncIterator[tuple[Any, Any]]:
+    """Run ``server`` on in-memory streams and yield the client's end of them."""
+    import anyio
+    from mcp.shared.memory import create_client_server_memory_streams
+
+    async with create_client_server_memory_streams() as (client_streams, server_streams):
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(
+                lambda: server.run(
+                    server_streams[0],
+                    server_streams[1],
+                    server.create_initialization_options(),
+                )
+            )
+            try:
+                yield client_streams
+            finally:
+                task_group.cancel_scope.cancel()
+
+
+@asynccontextmanager
+async def open_transport(server_config: Any) -> AsyncIterator[tuple[Any, Any]]:
+    """
+    Open the transport of a server.
+
+    Args:
+        server_config: The server's ``MCPServerConfig``.
+
+    Yields:
+        The (read_stream, write_stream) pair to build a ClientSession on.
+    """
+    # Imported per transport so only the one in use is loaded at startup
+    transport = server_config.transport or "stdio"
+    if transport == "memory":
+        server = load_server(server_config.name, server_config.args, server_config.env)
+        async with _memory_streams(server) as streams:
+            yield streams
+    elif transport == "http":
+        if not server_config.url:
+            raise ValueError(f"Server {server_config.name} uses the http transport but has no url")
+        from mcp.client.streamable_http import streamablehttp_client
+
+        async with streamablehttp_client(server_config.url) as (read_stream, write_stream, _):
+            yield read_stream, write_stream
+    elif transport == "stdio":
+        from mcp import StdioServerParameters
+        from mcp.client.stdio import stdio_client
+
+        server_params = StdioServerParameters(
+            command=server_config.command,
+            args=server_config.args,
+            env=server_config.env if server_config.env else None,
+        )
+        async with stdio_client(server_params) as streams:
+            yield streams
+    else:
+        raise ValueError(f"Unknown transport {transport!r} for server {server_config.name}")
@@ -0,0 +1,10 @@
+"""Shared pytest setup."""
+
+import sys
+from pathlib import Path
+
+# The formatting server's modules import each other by bare name, as they do
+# when the server runs as a script from its own directory
+FORMATTING_DIR = Path(__file__).resolve().parents[1] / "src" / "backend" / "mcp_servers" / "mcp_formatting"
+if str(FORMATTING_DIR) not in sys.path:
+    sys.path.insert(0, str(FORMATTING_DIR))
@@ -0,0 +1,208 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from bulk_runner import DONE, FAILED, GENERATED, POSTPROCESSED, STATUS_LOG, BulkRunner, read_manifest
+from src.backend.formatting.formater import Formatter
+
+
+class FakeFormatter(Formatter):
+    """Returns fenced HTML naming the report's first text block."""
+
+    def __init__(self):
+        self.calls: list[str] = []
+
+    def format(self, image_paths, text):
+        self.calls.append(text[0])
+        return f"```html\n<html><body>{text[0]}</body></html>\n```"
+
+
+class FakeRenderer:
+    """Writes the HTML as the 'PDF', failing for the ids listed in fail."""
+
+    def __init__(self, fail=()):
+        self.rendered: list[str] = []
+        self.fail = set(fail)
+
+    async def __call__(self, html, output_path):
+        name = Path(output_path).stem
+        if name in self.fail:
+            raise RuntimeError("browser crashed")
+        self.rendered.append(name)
+        Path(output_path).write_text(html, encoding="utf-8")
+
+
+def write_manifest(path: Path, ids) -> Path:
+    path.write_text(
+        "\n".join(json.dumps({"id": job_id, "text_blocks": [f"report {job_id}"]}) for job_id in ids) + "\n",
+        encoding="utf-8",
+    )
+    return path
+
+
+def run(runner: BulkRunner, manifest: Path) -> dict:
+    return asyncio.run(runner.run(str(manifest)))
+
+
+def statuses(work_dir: Path) -> list[tuple[str, str]]:
+    lines = (work_dir / STATUS_LOG).read_text(encoding="utf-8").splitlines()
+    return [(record["id"], record["status"]) for record in map(json.loads, lines)]
+
+
+@pytest.fixture
+def work_dir(tmp_path):
+    return tmp_path / "run"
+
+
+def make_runner(work_dir, formatter=None, renderer=None, **kwargs):
+    return BulkRunner(
+        formatter or FakeFormatter(),
+        str(work_dir),
+        render_pdf=renderer or FakeRenderer(),
+        **kwargs,
+    )
+
+
+def test_fresh_run_generates_postprocesses_and_renders(tmp_path, work_dir):
+    manifest = write_manifest(tmp_path / "manifest.jsonl", ["A", "B", "C"])
+    formatter, renderer = FakeFormatter(), FakeRenderer()
+    counts = run(make_runner(work_dir, formatter, renderer, llm_concurrency=2, queue_size=1), manifest)
+
+    assert counts == {DONE: 3, FAILED: 0, "skipped": 0}
+    assert sorted(formatter.calls) == ["report A", "report B", "report C"]
+    assert sorted(renderer.rendered) == ["A", "B", "C"]
+    # Fences are stripped before rendering
+    assert (work_dir / "pdf" / "A.pdf").read_text(encoding="utf-8") == "<html><body>report A</body></html>"
+    assert [status for job_id, status in statuses(work_dir) if job_id == "A"] == [GENERATED, POSTPROCESSED, DONE]
+
+
+def test_done_jobs_are_skipped(tmp_path, work_dir):
+    manifest = write_manifest(tmp_path / "manifest.jsonl", ["A", "B"])
+    run(make_runner(work_dir), manifest)
+
+    formatter, renderer = FakeFormatter(), FakeRenderer()
+    counts = run(make_runner(work_dir, formatter, renderer), manifest)
+    assert counts == {DONE: 0, FAILED: 0, "skipped": 2}
+    assert formatter.calls == []
+    assert renderer.rendered == []
+
+
+def test_done_job_with_missing_pdf_is_rendered_again(tmp_path, work_dir):
+    manifest = write_manifest(tmp_path / "manifest.jsonl", ["A"])
+    run(make_runner(work_dir), manifest)
+    (work_dir / "pdf" / "A.pdf").unlink()
+
+    formatter, renderer = FakeFormatter(), FakeRenderer()
+    counts = run(make_runner(work_dir, formatter, renderer), manifest)
+    assert counts[DONE] == 1
+    assert formatter.calls == []
+    assert renderer.rendered == ["A"]
+
+
+def test_failed_render_resumes_from_the_postprocessed_html(tmp_path, work_dir):
+    manifest = write_manifest(tmp_path / "manifest.jsonl", ["A", "B"])
+    counts = run(make_runner(work_dir, renderer=FakeRenderer(fail={"A"})), manifest)
+    assert counts == {DONE: 1, FAILED: 1, "skipped": 0}
+    assert ("A", FAILED) in statuses(work_dir)
+
+    formatter, renderer = FakeFormatter(), FakeRenderer()
+    counts = run(make_runner(work_dir, formatter, renderer), manifest)
+    assert counts == {DONE: 1, FAILED: 0, "skipped": 1}
+    assert formatter.calls == []
+    assert renderer.rendered == ["A"]
+
+
+def test_generated_job_resumes_at_postprocessing(tmp_path, work_dir):
+    manifest = write_manifest(tmp_path / "manifest.jsonl", ["A"])
+    # An earlier run stopped right after generating the report
+    (work_dir / "html").mkdir(parents=True)
+    (work_dir / "html" / "A.generated.html").write_text("```html\n<html>checkpoint</html>\n```", encoding="utf-8")
+    (work_dir / STATUS_LOG).write_text(json.dumps({"id": "A", "status": GENERATED}) + "\n", encoding="utf-8")
+
+    formatter, renderer = FakeFormatter(), FakeRenderer()
+    counts = run(make_runner(work_dir, formatter, renderer), manifest)
+    assert counts[DONE] == 1
+    assert formatter.calls == []
+    assert (work_dir / "pdf" / "A.pdf").read_text(encoding="utf-8") == "<html>checkpoint</html>"
+
+
+def test_postprocessed_job_resumes_at_rendering(tmp_path, work_dir):
+    manifest = write_manifest(tmp_path / "manifest.jsonl", ["A"])
+    (work_dir / "html").mkdir(parents=True)
+    (work_dir / "html" / "A.html").write_text("<html>clean</html>", encoding="utf-8")
+    (work_dir / STATUS_LOG).write_text(json.dumps({"id": "A", "status": POSTPROCESSED}) + "\n", encoding="utf-8")
+
+    formatter, renderer = FakeFormatter(), FakeRenderer()
+    counts = run(make_runner(work_dir, formatter, renderer), manifest)
+    assert counts[DONE] == 1
+    assert formatter.calls == []
+    assert (work_dir / "pdf" / "A.pdf").read_text(encoding="utf-8") == "<html>clean</html>"
+
+
+def test_job_with_lost_checkpoint_is_generated_again(tmp_path, work_dir):
+    manifest = write_manifest(tmp_path / "manifest.jsonl", ["A"])
+    work_dir.mkdir()
+    (work_dir / STATUS_LOG).write_text(json.dumps({"id": "A", "status": GENERATED}) + "\n", encoding="utf-8")
+
+    formatter = FakeFormatter()
+    counts = run(make_runner(work_dir, formatter), manifest)
+    assert counts[DONE] == 1
+    assert formatter.calls == ["report A"]
+
+
+def test_truncated_status_line_is_ignored(tmp_path, work_dir):
+    manifest = write_manifest(tmp_path / "manifest.jsonl", ["A"])
+    run(make_runner(work_dir), manifest)
+    with open(work_dir / STATUS_LOG, "a", encoding="utf-8") as f:
+        f.write('{"id": "A", "sta')
+
+    assert make_runner(work_dir).load_status() == {"A": DONE}
+
+
+def test_formatter_failure_is_recorded_and_the_run_continues(tmp_path, work_dir):
+    class FlakyFormatter(FakeFormatter):
+        def format(self, image_paths, text):
+            if text[0] == "report B":
+                raise ValueError("model unavailable")
+            return super().format(image_paths, text)
+
+    manifest = write_manifest(tmp_path / "manifest.jsonl", ["A", "B", "C"])
+    counts = run(make_runner(work_dir, FlakyFormatter()), manifest)
+    assert counts == {DONE: 2, FAILED: 1, "skipped": 0}
+    assert ("B", FAILED) in statuses(work_dir)
+
+
+def test_manifest_ids_become_safe_file_names(tmp_path, work_dir):
+    manifest = write_manifest(tmp_path / "manifest.jsonl", ["BRK/B", "../escape"])
+    counts = run(make_runner(work_dir), manifest)
+
+    assert counts[DONE] == 2
+    assert (work_dir / "pdf" / "BRK_B.pdf").exists()
+    assert (work_dir / "pdf" / "escape.pdf").exists()
+    assert not (tmp_path / "escape.pdf").exists()
+
+
+def test_manifest_rejects_repeated_ids(tmp_path):
+    manifest = write_manifest(tmp_path / "manifest.jsonl", ["A", "A"])
+    jobs = read_manifest(manifest, tmp_path)
+    assert next(jobs).id == "A"
+    with pytest.raises(ValueError, match="repeats id"):
+        next(jobs)
+
+
+def test_manifest_rejects_ids_sharing_file_names(tmp_path):
+    manifest = write_manifest(tmp_path / "manifest.jsonl", ["BRK/B", "BRK_B"])
+    with pytest.raises(ValueError, match="same files"):
+        list(read_manifest(manifest, tmp_path))
+
+
+def test_manifest_error_stops_reading_but_finishes_queued_jobs(tmp_path, work_dir):
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text(json.dumps({"id": "A", "text_blocks": ["report A"]}) + "\nnot json\n", encoding="utf-8")
+
+    runner = make_runner(work_dir)
+    counts = run(runner, manifest)
+    assert counts[DONE] == 1
+    assert "line 2" in runner.manifest_error
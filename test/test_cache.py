@@ -0,0 +1,68 @@
+import os
+import time
+
+from cache import ReportCache, cache_key
+
+
+def key(**overrides):
+    inputs = {"text_blocks": ["# AAPL"], "images": [], "system_prompt": "prompt", "model": "m", "temperature": 0.2}
+    inputs.update(overrides)
+    return cache_key(**inputs)
+
+
+def test_key_covers_every_generation_input():
+    assert key() == key()
+    for change in (
+        {"text_blocks": ["# MSFT"]},
+        {"images": [{"data": "x"}]},
+        {"system_prompt": "other"},
+        {"model": "other"},
+        {"temperature": 0.3},
+    ):
+        assert key(**change) != key()
+
+
+def test_key_ignores_dict_ordering():
+    assert key(images=[{"data": "x", "caption": "c"}]) == key(images=[{"caption": "c", "data": "x"}])
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ReportCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("A", "C")
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    ReportCache(directory=str(tmp_path)).put("a", "A")
+    old = time.time() - 61
+    os.utime(tmp_path / "a.html", (old, old))
+
+    cache = ReportCache(directory=str(tmp_path), ttl_seconds=60)
+    assert cache.get("a") is None
+    assert not (tmp_path / "a.html").exists()
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    ReportCache(directory=str(tmp_path)).put("a", "<html>A</html>")
+    assert ReportCache(directory=str(tmp_path)).get("a") == "<html>A</html>"
+
+
+def test_disk_tier_is_trimmed_coldest_first(tmp_path):
+    cache = ReportCache(directory=str(tmp_path), max_disk_bytes=250)
+    for index, name in enumerate("abc"):
+        cache.put(name, name * 100)
+        accessed = time.time() - 100 + index
+        os.utime(tmp_path / f"{name}.html", (accessed, accessed))
+    assert sorted(path.name for path in tmp_path.glob("*.html")) == ["b.html", "c.html"]
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    cache = ReportCache(directory=str(tmp_path))
+    cache.put("a", "A")
+    cache.clear()
+    assert cache.get("a") is None
+    assert list(tmp_path.glob("*.html")) == []
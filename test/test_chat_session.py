@@ -0,0 +1,109 @@
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from google.generativeai import protos
+
+from src.backend.chat_session import SUMMARY_ACK, SUMMARY_PREFIX, ConversationSession, content_size
+
+
+def text(role, value):
+    return protos.Content(role=role, parts=[protos.Part(text=value)])
+
+
+def tool_call(name):
+    return protos.Content(role="model", parts=[protos.Part(function_call=protos.FunctionCall(name=name))])
+
+
+def tool_reply(name):
+    return protos.Content(role="user", parts=[protos.Part(function_response=protos.FunctionResponse(name=name))])
+
+
+def conversation():
+    """A question answered through a tool call, then two plain exchanges."""
+    return [
+        text("user", "q1 " * 200),
+        tool_call("get_price"),
+        tool_reply("get_price"),
+        text("model", "a1"),
+        text("user", "q2"),
+        text("model", "a2"),
+        text("user", "q3"),
+        text("model", "a3"),
+    ]
+
+
+def test_estimate_grows_with_each_turn():
+    history = conversation()
+    session = ConversationSession(history[:2], token_budget=content_size(history[0]))
+    assert session.estimated_tokens == content_size(history[0]) + content_size(history[1])
+    assert session.needs_trimming()
+
+    session.extend(history[2:])
+    assert session.history == history
+    assert session.estimated_tokens == sum(content_size(content) for content in history)
+
+
+def test_reported_prompt_size_only_scales_the_estimate_up():
+    history = conversation()
+    session = ConversationSession(history)
+    estimated = session.estimated_tokens
+
+    session.observe_prompt_tokens(estimated * 2, len(history))
+    assert session.estimated_tokens == estimated * 2
+    session.observe_prompt_tokens(estimated // 2, len(history))
+    assert session.estimated_tokens == estimated
+    session.observe_prompt_tokens(None, len(history))
+    assert session.estimated_tokens == estimated
+
+
+def test_trim_cuts_only_before_user_text_turns():
+    history = conversation()
+    # Reaching the target right before the tool response still cuts at the next user question
+    session = ConversationSession(
+        history,
+        token_budget=sum(content_size(content) for content in history[2:]),
+        keep_recent_turns=2,
+        trim_target=1.0,
+    )
+    assert session.trim_index() == 4
+
+    session.token_budget = 0
+    assert session.trim_index() == 6
+
+
+def test_trim_keeps_the_most_recent_turns():
+    session = ConversationSession(conversation(), token_budget=0, keep_recent_turns=3)
+    assert session.trim_index() == 4
+
+    session.keep_recent_turns = 5
+    assert session.trim_index() == 0
+
+
+def test_replace_prefix_with_a_summary():
+    history = conversation()
+    session = ConversationSession(history)
+    session.replace_prefix(4, "Looked up the price.")
+
+    assert [content.role for content in session.history[:2]] == ["user", "model"]
+    assert session.history[0].parts[0].text == SUMMARY_PREFIX + "Looked up the price."
+    assert session.history[1].parts[0].text == SUMMARY_ACK
+    assert session.history[2:] == history[4:]
+    assert session.estimated_tokens == sum(content_size(content) for content in session.history)
+
+
+def test_replace_prefix_without_a_summary_drops_the_turns():
+    history = conversation()
+    session = ConversationSession(history)
+    session.replace_prefix(6)
+    assert session.history == history[6:]
+    assert session.estimated_tokens == sum(content_size(content) for content in history[6:])
+
+
+def test_sessions_have_distinct_ids():
+    assert ConversationSession().id != ConversationSession().id
+
+
+def test_unknown_trim_strategy_is_rejected():
+    with pytest.raises(ValueError, match="trim strategy"):
+        ConversationSession(trim_strategy="truncate")
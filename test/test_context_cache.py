@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+import google.generativeai as genai
+from google.generativeai import protos
+
+from src.backend.context_cache import ContextCacheManager
+
+
+class FakeCachedContent:
+    """Stands in for a server-side cached context."""
+
+    created: list["FakeCachedContent"] = []
+
+    def __init__(self, model, tools, contents, ttl):
+        self.contents = contents or []
+        self.deleted = False
+        self.created.append(self)
+
+    def update(self, ttl):
+        pass
+
+    def delete(self):
+        self.deleted = True
+
+
+@pytest.fixture(autouse=True)
+def fake_caching(monkeypatch):
+    FakeCachedContent.created = []
+    monkeypatch.setattr(genai.caching.CachedContent, "create", FakeCachedContent)
+    monkeypatch.setattr(
+        genai.GenerativeModel,
+        "from_cached_content",
+        lambda cached_content, generation_config=None: f"model for {len(cached_content.contents)} turns",
+    )
+
+
+def text(role, value):
+    return protos.Content(role=role, parts=[protos.Part(text=value)])
+
+
+def tool_reply(name):
+    return protos.Content(role="user", parts=[protos.Part(function_response=protos.FunctionResponse(name=name))])
+
+
+def exchange(count):
+    history = []
+    for turn in range(count):
+        history += [text("user", f"question {turn}"), text("model", f"answer {turn}")]
+    return history
+
+
+async def settle(manager):
+    while manager._pending:
+        await asyncio.gather(*manager._pending.values())
+
+
+def test_prefix_keys_are_shared_by_conversations_with_the_same_start():
+    history = exchange(2)
+    keys = ContextCacheManager.prefix_keys("tools-v1", history)
+    assert len(keys) == len(history) + 1
+    assert ContextCacheManager.prefix_keys("tools-v1", history[:2]) == keys[:3]
+    assert ContextCacheManager.prefix_keys("tools-v1", history[:2] + [text("user", "other")])[3] != keys[3]
+    assert ContextCacheManager.prefix_keys("tools-v2", history)[0] != keys[0]
+
+
+def test_caches_end_before_a_user_question_or_after_a_model_turn():
+    history = [text("user", "q"), text("model", "call"), tool_reply("get_price"), text("model", "a"), text("user", "q2")]
+    boundaries = [index for index in range(len(history) + 1) if ContextCacheManager._is_boundary(history, index)]
+    assert boundaries == [0, 4]
+    assert ContextCacheManager._is_boundary(history[:4], 4)
+    assert ContextCacheManager._is_boundary([], 0)
+
+
+def test_lookup_caches_the_conversation_and_reuses_the_longest_prefix():
+    async def scenario():
+        manager = ContextCacheManager("gemini-test", min_tokens=1, min_new_turns=4)
+        history = exchange(2)
+        assert manager.lookup(None, "tools", history) is None
+        await settle(manager)
+        assert [len(cache.contents) for cache in FakeCachedContent.created] == [4]
+
+        # Two new turns are too few for a longer cache
+        longer = history + exchange(3)[4:]
+        found = manager.lookup(None, "tools", longer)
+        assert (found.history_length, found.model) == (4, "model for 4 turns")
+        await settle(manager)
+        assert len(FakeCachedContent.created) == 1
+
+        # Four new turns are enough
+        longest = exchange(4)
+        found = manager.lookup(None, "tools", longest)
+        assert found.history_length == 4
+        await settle(manager)
+        assert manager.lookup(None, "tools", longest).history_length == 8
+
+        # Other tools never match
+        assert manager.lookup(None, "other tools", longest) is None
+        await manager.close()
+
+    asyncio.run(scenario())
+
+
+def test_small_prefixes_are_not_cached():
+    async def scenario():
+        manager = ContextCacheManager("gemini-test", min_tokens=100_000)
+        assert manager.lookup(None, "tools", exchange(2)) is None
+        await settle(manager)
+        assert FakeCachedContent.created == []
+
+    asyncio.run(scenario())
+
+
+def test_invalidated_cache_is_deleted_and_not_recreated_during_backoff():
+    async def scenario():
+        manager = ContextCacheManager("gemini-test", min_tokens=1)
+        history = exchange(2)
+        manager.lookup(None, "tools", history)
+        await settle(manager)
+        found = manager.lookup(None, "tools", history)
+
+        manager.invalidate(found.key)
+        await settle(manager)
+        assert FakeCachedContent.created[0].deleted
+        assert manager.lookup(None, "tools", history) is None
+        await settle(manager)
+        assert len(FakeCachedContent.created) == 1
+
+    asyncio.run(scenario())
+
+
+def test_least_recently_used_caches_are_evicted():
+    async def scenario():
+        manager = ContextCacheManager("gemini-test", min_tokens=1, max_entries=1)
+        first, second = exchange(2), [text("user", "other"), text("model", "reply")]
+        manager.lookup(None, "tools", first)
+        await settle(manager)
+        manager.lookup(None, "tools", second)
+        await settle(manager)
+
+        assert [cache.deleted for cache in FakeCachedContent.created] == [True, False]
+        assert manager.lookup(None, "tools", second).history_length == 2
+        await manager.close()
+        assert FakeCachedContent.created[1].deleted
+
+    asyncio.run(scenario())
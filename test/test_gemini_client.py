@@ -0,0 +1,30 @@
+import time
+from collections import OrderedDict
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+import gemini_client
+from gemini_client import FILE_UPLOAD_TTL_SECONDS, _remember_upload
+
+
+@pytest.fixture
+def uploads(monkeypatch):
+    files = OrderedDict()
+    monkeypatch.setattr(gemini_client, "_uploaded_files", files)
+    monkeypatch.setattr(gemini_client, "UPLOADED_FILES_MAX_ENTRIES", 2)
+    return files
+
+
+def test_uploads_beyond_the_limit_forget_the_oldest(uploads):
+    now = time.time()
+    for image_id in ("a", "b", "c"):
+        _remember_upload(image_id, (now, f"files/{image_id}", "image/png"))
+    assert list(uploads) == ["b", "c"]
+
+
+def test_expired_uploads_are_forgotten(uploads):
+    _remember_upload("old", (time.time() - FILE_UPLOAD_TTL_SECONDS - 1, "files/old", "image/png"))
+    _remember_upload("new", (time.time(), "files/new", "image/png"))
+    assert list(uploads) == ["new"]
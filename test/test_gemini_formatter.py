@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+import gemini_formatter
+from gemini_formatter import GeminiFormatter
+
+
+class FakeManager:
+    """Client manager handing out one client per instance and recording its loop."""
+
+    instances: list["FakeManager"] = []
+
+    def __init__(self):
+        self.client = object()
+        self.loop = None
+        self.closed = False
+        FakeManager.instances.append(self)
+
+    def get(self):
+        self.loop = asyncio.get_running_loop()
+        return self.client
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture
+def generated(monkeypatch):
+    calls = []
+
+    async def generate_html(client, user_data, system_prompt, model, temperature):
+        calls.append(client)
+        return f"<html>{user_data['text_blocks'][0]}</html>"
+
+    FakeManager.instances = []
+    monkeypatch.setattr(gemini_formatter, "GeminiClientManager", FakeManager)
+    monkeypatch.setattr(gemini_formatter, "generate_html", generate_html)
+    return calls
+
+
+def test_each_sync_call_uses_and_closes_a_client_of_its_own(generated):
+    formatter = GeminiFormatter()
+    assert formatter.format([], ["first"]) == "<html>first</html>"
+    assert formatter.format([], ["second"]) == "<html>second</html>"
+
+    first, second = FakeManager.instances
+    assert generated == [first.client, second.client]
+    assert first.closed and second.closed
+    assert first.loop is not second.loop
+
+
+def test_sync_call_uses_a_given_client(generated):
+    client = object()
+    GeminiFormatter(client=client).format([], ["report"])
+    assert generated == [client]
+    assert FakeManager.instances == []
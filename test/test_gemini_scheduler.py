@@ -0,0 +1,163 @@
+import asyncio
+
+import pytest
+
+from src.backend import gemini_scheduler
+from src.backend.gemini_scheduler import GeminiScheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(gemini_scheduler.time, "monotonic", fake.monotonic)
+    return fake
+
+
+def test_token_bucket_refills_continuously(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=2)
+    assert bucket.delay_for(10) == 0
+
+    bucket.take(10)
+    assert bucket.delay_for(4) == pytest.approx(2.0)
+
+    clock.now += 1
+    assert bucket.delay_for(4) == pytest.approx(1.0)
+    clock.now += 1
+    assert bucket.delay_for(4) == 0
+
+
+def test_token_bucket_never_exceeds_capacity(clock):
+    bucket = TokenBucket(capacity=5, refill_per_second=1)
+    clock.now += 60
+    bucket.take(5)
+    assert bucket.delay_for(1) == pytest.approx(1.0)
+
+
+def test_token_bucket_debt_delays_later_requests(clock):
+    bucket = TokenBucket.per_minute(60)
+    bucket.take(60)
+    # The request turned out to cost 30 tokens more than reserved
+    bucket.adjust(30)
+    assert bucket.delay_for(1) == pytest.approx(31.0)
+
+    # A credit repays part of the debt
+    bucket.adjust(-20)
+    assert bucket.delay_for(1) == pytest.approx(11.0)
+
+
+def test_token_bucket_caps_requests_at_capacity(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=1)
+    # A request larger than the bucket waits for a full bucket, not forever
+    assert bucket.delay_for(50) == 0
+    bucket.take(50)
+    assert bucket.delay_for(50) == pytest.approx(10.0)
+
+
+async def _admission_order(scheduler: GeminiScheduler, requests: list[tuple[str, int, str]]) -> list[str]:
+    """Queue requests behind a held slot and return the order they are admitted in."""
+    order: list[str] = []
+    release = asyncio.Event()
+
+    async def hold():
+        async with scheduler.slot():
+            await release.wait()
+
+    async def request(name: str, priority: int, key: str):
+        async with scheduler.slot(priority=priority, key=key):
+            order.append(name)
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    tasks = []
+    for name, priority, key in requests:
+        tasks.append(asyncio.create_task(request(name, priority, key)))
+        await asyncio.sleep(0)
+    assert scheduler.queued == len(requests)
+
+    release.set()
+    await asyncio.gather(holder, *tasks)
+    await scheduler.close()
+    return order
+
+
+def test_higher_priority_is_admitted_first():
+    scheduler = GeminiScheduler(max_concurrency=1)
+    order = asyncio.run(_admission_order(scheduler, [
+        ("low", 0, "a"),
+        ("high", 5, "b"),
+        ("middle", 1, "c"),
+    ]))
+    assert order == ["high", "middle", "low"]
+
+
+def test_equal_priority_is_shared_fairly_across_keys():
+    scheduler = GeminiScheduler(max_concurrency=1)
+    order = asyncio.run(_admission_order(scheduler, [
+        ("a1", 0, "a"),
+        ("a2", 0, "a"),
+        ("a3", 0, "a"),
+        ("b1", 0, "b"),
+    ]))
+    # b is not starved behind every queued request of a
+    assert order.index("b1") < order.index("a2")
+    assert [name for name in order if name.startswith("a")] == ["a1", "a2", "a3"]
+
+
+def test_max_concurrency_limits_in_flight_requests():
+    async def scenario():
+        scheduler = GeminiScheduler(max_concurrency=2)
+        peak = 0
+        release = asyncio.Event()
+
+        async def request():
+            nonlocal peak
+            async with scheduler.slot():
+                peak = max(peak, scheduler.in_flight)
+                await release.wait()
+
+        tasks = [asyncio.create_task(request()) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        assert scheduler.in_flight == 2
+        assert scheduler.queued == 3
+
+        release.set()
+        await asyncio.gather(*tasks)
+        await scheduler.close()
+        return peak
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_close_fails_queued_requests():
+    async def scenario():
+        scheduler = GeminiScheduler(max_concurrency=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+
+        async def queued():
+            async with scheduler.slot():
+                pass
+
+        waiter = asyncio.create_task(queued())
+        await asyncio.sleep(0)
+        await scheduler.close()
+        with pytest.raises(RuntimeError, match="closed"):
+            await waiter
+        release.set()
+        await holder
+
+    asyncio.run(scenario())
@@ -0,0 +1,86 @@
+import base64
+import io
+
+import pytest
+
+import images
+from images import (
+    IMAGE_REF_SCHEME,
+    decode_image,
+    prepare_image,
+    prepare_images,
+    substitute_image_references,
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 32
+
+
+def b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+@pytest.fixture(autouse=True)
+def empty_prepared_cache(monkeypatch):
+    monkeypatch.setattr(images, "_prepared_cache", type(images._prepared_cache)())
+    monkeypatch.setattr(images, "_prepared_cache_bytes", 0)
+
+
+def test_decode_data_uris_and_sniff_bare_base64():
+    assert decode_image(f"data:image/gif;base64,{b64(PNG)}") == (PNG, "image/gif")
+    assert decode_image(b64(JPEG)) == (JPEG, "image/jpeg")
+    assert decode_image("not base64!") is None
+    assert decode_image("") is None
+
+
+def test_identical_images_share_one_id():
+    first = prepare_image(b64(PNG))
+    assert first.id.startswith("img_")
+    assert prepare_image(f"data:image/png;base64,{b64(PNG)}") is first
+    assert prepare_image(b64(JPEG)).id != first.id
+
+
+def test_manifest_carries_ids_urls_and_captions():
+    manifest, prepared = prepare_images([
+        {"data": b64(PNG), "caption": "Price"},
+        "https://example.com/chart.png",
+        {"data": b64(PNG), "caption": "Again"},
+        {"data": "%%%"},
+        {"data": 123},
+        {"caption": "no data"},
+    ])
+    image_id = next(iter(prepared))
+    assert list(prepared) == [image_id]
+    assert manifest == [
+        {"id": image_id, "caption": "Price"},
+        {"url": "https://example.com/chart.png", "caption": ""},
+        {"id": image_id, "caption": "Again"},
+    ]
+
+
+def test_references_are_replaced_with_data_uris():
+    _, prepared = prepare_images([b64(PNG)])
+    (image_id, image), = prepared.items()
+    html = f'<img src="{IMAGE_REF_SCHEME}{image_id}"><img src="{IMAGE_REF_SCHEME}img_0000000000000000">'
+    result = substitute_image_references(html, prepared)
+    assert f'src="{image.data_uri}"' in result
+    assert "cid:img_0000000000000000" in result
+
+
+def test_prepared_cache_is_bounded_by_bytes(monkeypatch):
+    monkeypatch.setattr(images, "IMAGE_CACHE_MAX_BYTES", 100)
+    for index in range(3):
+        prepare_image(b64(PNG + bytes([index]) * 30))
+    assert images._prepared_cache_bytes <= 100
+    assert len(images._prepared_cache) == 1
+
+
+def test_large_images_are_downscaled():
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", (400, 200), "navy").save(buffer, format="PNG")
+
+    prepared = prepare_image(b64(buffer.getvalue()), max_dimension=100)
+    with Image.open(io.BytesIO(prepared.data)) as img:
+        assert max(img.size) == 100
+    assert prepared.mime_type == "image/jpeg"
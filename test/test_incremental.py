@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+import incremental
+from incremental import RenderedReport, SectionStore, regenerate_sectioned_html
+
+
+class FakeRenderer:
+    """Stands in for render_sections, recording which sections were generated."""
+
+    def __init__(self):
+        self.generated: list[list[str]] = []
+
+    async def __call__(self, client, sections, model, temperature, concurrency, on_section_done=None):
+        self.generated.append([" ".join(section.text_blocks) for section in sections])
+        return [f"<section>{' '.join(section.text_blocks)}</section>" for section in sections]
+
+
+@pytest.fixture
+def renderer(monkeypatch):
+    fake = FakeRenderer()
+    monkeypatch.setattr(incremental, "render_sections", fake)
+    return fake
+
+
+def regenerate(store, text_blocks, on_generate=None):
+    return asyncio.run(regenerate_sectioned_html(
+        None, "AAPL-daily", text_blocks, [], store=store, blocks_per_section=2, on_generate=on_generate,
+    ))
+
+
+def test_unchanged_report_reuses_every_section(renderer):
+    store = SectionStore()
+    blocks = ["# AAPL", "intro", "prices", "volume"]
+    first = regenerate(store, blocks)
+    generations = []
+    second = regenerate(store, blocks, on_generate=lambda: generations.append(1))
+
+    assert second == first
+    assert renderer.generated == [["# AAPL intro", "prices volume"]]
+    assert generations == []
+
+
+def test_only_changed_sections_are_regenerated(renderer):
+    store = SectionStore()
+    regenerate(store, ["# AAPL", "intro", "prices", "volume"])
+    html = regenerate(store, ["# AAPL", "intro", "prices", "volume up"])
+
+    assert renderer.generated[-1] == ["prices volume up"]
+    assert "<section># AAPL intro</section>" in html
+    assert "<section>prices volume up</section>" in html
+
+
+def test_reports_are_kept_apart_by_id(renderer):
+    store = SectionStore()
+    regenerate(store, ["# AAPL", "intro"])
+    asyncio.run(regenerate_sectioned_html(None, "MSFT-daily", ["# AAPL", "intro"], [], store=store))
+    assert len(renderer.generated) == 2
+
+
+def test_store_evicts_least_recently_used_reports():
+    store = SectionStore(max_reports=2)
+    for report_id in ("a", "b"):
+        store.put(report_id, RenderedReport(fingerprints=["f"], fragments=["x"]))
+    store.get("a")
+    store.put("c", RenderedReport(fingerprints=["f"], fragments=["x"]))
+
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.get("c") is not None
+
+
+def test_store_is_bounded_by_bytes():
+    store = SectionStore(max_bytes=100)
+    store.put("a", RenderedReport(fingerprints=["f"], fragments=["x" * 60]))
+    store.put("b", RenderedReport(fingerprints=["f"], fragments=["x" * 60]))
+    assert store.get("a") is None
+    assert store.total_bytes == 60
+
+    # Replacing a report does not count its old fragments
+    store.put("b", RenderedReport(fingerprints=["f"], fragments=["x" * 90]))
+    assert store.total_bytes == 90
+
+    # A report larger than the whole budget is not kept
+    store.put("c", RenderedReport(fingerprints=["f"], fragments=["x" * 200]))
+    assert store.get("c") is None
+    assert store.get("b") is not None
+
+
+def test_store_forgets_reports_after_ttl():
+    store = SectionStore(ttl_seconds=60)
+    report = RenderedReport(fingerprints=["f"], fragments=["x"])
+    store.put("a", report)
+    report.stored_at -= 61
+    assert store.get("a") is None
+    assert store.total_bytes == 0
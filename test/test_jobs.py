@@ -0,0 +1,208 @@
+import asyncio
+import contextvars
+
+import pytest
+
+from jobs import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue, QueueFullError
+
+
+class BlockingRunner:
+    """Runner whose jobs finish only when released."""
+
+    def __init__(self):
+        self.started: list[str] = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, job):
+        self.started.append(job.id)
+        job.report_progress(0.5, "Halfway")
+        await self.release.wait()
+        if job.params.get("fail"):
+            raise ValueError("generation failed")
+        return f"<html>{job.params['name']}</html>"
+
+
+async def settle():
+    """Let workers pick up queued jobs."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_jobs_run_and_return_results():
+    async def scenario():
+        runner = BlockingRunner()
+        queue = JobQueue(runner, workers=2)
+        job = await queue.submit({"name": "a"})
+        await settle()
+        assert job.status == RUNNING
+        assert job.progress == 0.5
+
+        runner.release.set()
+        await job.done.wait()
+        assert job.status == SUCCEEDED
+        assert job.result == "<html>a</html>"
+        assert job.progress == 1.0
+        assert queue.get(job.id) is job
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_job_records_the_error():
+    async def scenario():
+        runner = BlockingRunner()
+        runner.release.set()
+        queue = JobQueue(runner)
+        job = await queue.submit({"name": "a", "fail": True})
+        await job.done.wait()
+        assert job.status == FAILED
+        assert job.error == "generation failed"
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_refuses_submissions():
+    async def scenario():
+        runner = BlockingRunner()
+        queue = JobQueue(runner, workers=1, max_queued=2)
+        running = await queue.submit({"name": "running"})
+        await settle()
+        first = await queue.submit({"name": "first"})
+        second = await queue.submit({"name": "second"})
+        assert queue.position(first) == 1
+        assert queue.position(second) == 2
+        assert queue.position(running) is None
+
+        with pytest.raises(QueueFullError) as refused:
+            await queue.submit({"name": "third"})
+        assert refused.value.retry_after >= 1
+
+        # Waiting submissions get in once a worker frees a slot
+        waiting = asyncio.create_task(queue.submit({"name": "third"}, wait=True))
+        await settle()
+        assert not waiting.done()
+        runner.release.set()
+        third = await waiting
+        await third.done.wait()
+        assert [job.status for job in (running, first, second, third)] == [SUCCEEDED] * 4
+        assert runner.started == [running.id, first.id, second.id, third.id]
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_cancel_queued_job_is_skipped_by_workers():
+    async def scenario():
+        runner = BlockingRunner()
+        queue = JobQueue(runner, workers=1)
+        running = await queue.submit({"name": "running"})
+        await settle()
+        queued = await queue.submit({"name": "queued"})
+        assert queued.status == QUEUED
+
+        assert queue.cancel(queued.id)
+        assert queued.status == CANCELLED
+        assert queue.position(queued) is None
+        assert not queue.cancel(queued.id)
+
+        runner.release.set()
+        await running.done.wait()
+        await settle()
+        assert queued.id not in runner.started
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_cancel_running_job():
+    async def scenario():
+        runner = BlockingRunner()
+        queue = JobQueue(runner, workers=1)
+        job = await queue.submit({"name": "a"})
+        await settle()
+        assert job.status == RUNNING
+
+        assert queue.cancel(job.id)
+        await job.done.wait()
+        assert job.status == CANCELLED
+
+        # The worker survives and runs the next job
+        runner.release.set()
+        next_job = await queue.submit({"name": "b"})
+        await next_job.done.wait()
+        assert next_job.status == SUCCEEDED
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_cancels_unfinished_jobs():
+    async def scenario():
+        runner = BlockingRunner()
+        queue = JobQueue(runner, workers=1)
+        running = await queue.submit({"name": "running"})
+        await settle()
+        queued = await queue.submit({"name": "queued"})
+        await queue.close()
+        assert running.status == CANCELLED
+        assert queued.status == CANCELLED
+
+    asyncio.run(scenario())
+
+
+def test_finished_jobs_beyond_the_limit_are_pruned():
+    async def scenario():
+        runner = BlockingRunner()
+        runner.release.set()
+        queue = JobQueue(runner, workers=1, max_finished=2)
+        jobs = []
+        for name in "abc":
+            job = await queue.submit({"name": name})
+            await job.done.wait()
+            jobs.append(job)
+
+        assert queue.get(jobs[0].id) is None
+        assert queue.get(jobs[1].id) is jobs[1]
+        assert queue.get(jobs[2].id) is jobs[2]
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_finished_jobs_expire_after_ttl():
+    async def scenario():
+        runner = BlockingRunner()
+        runner.release.set()
+        queue = JobQueue(runner, result_ttl=60)
+        job = await queue.submit({"name": "a"})
+        await job.done.wait()
+        assert queue.get(job.id) is job
+
+        job.finished_at -= 61
+        assert queue.get(job.id) is None
+        await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_jobs_run_in_their_submitters_context():
+    request = contextvars.ContextVar("request", default=None)
+
+    async def runner(job):
+        return request.get()
+
+    async def submit(queue, name):
+        request.set(name)
+        return await queue.submit({})
+
+    async def scenario():
+        queue = JobQueue(runner, workers=1)
+        first = await asyncio.create_task(submit(queue, "first"))
+        second = await asyncio.create_task(submit(queue, "second"))
+        await first.done.wait()
+        await second.done.wait()
+        assert (first.result, second.result) == ("first", "second")
+        await queue.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,169 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("playwright")
+
+import pdf_converter
+from pdf_converter import BrowserPool, html_to_pdf_batch
+
+
+class FakePage:
+    def __init__(self, browser):
+        self.browser = browser
+        self.content = ""
+        self.closed = False
+
+    async def set_content(self, html):
+        self.content = html
+        await self.browser.playwright.render_gate.wait()
+        if not self.browser.connected:
+            raise pdf_converter.PlaywrightError("Target page, context or browser has been closed")
+
+    async def pdf(self, path=None):
+        return f"PDF:{self.content}".encode()
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+
+    async def new_page(self):
+        return FakePage(self.browser)
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self, playwright):
+        self.playwright = playwright
+        self.connected = True
+        self.contexts = 0
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self):
+        self.contexts += 1
+        return FakeContext(self)
+
+    async def close(self):
+        self.connected = False
+
+
+class FakePlaywright:
+    """Launches fake browsers; renders wait on render_gate."""
+
+    def __init__(self):
+        self.browsers: list[FakeBrowser] = []
+        self.render_gate = asyncio.Event()
+        self.render_gate.set()
+        self.chromium = self
+        self.stopped = False
+
+    async def launch(self):
+        browser = FakeBrowser(self)
+        self.browsers.append(browser)
+        return browser
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def playwright(monkeypatch):
+    fake = FakePlaywright()
+    monkeypatch.setattr(pdf_converter, "async_playwright", lambda: fake)
+    return fake
+
+
+def test_renders_reuse_warm_pages(playwright):
+    async def scenario():
+        async with BrowserPool(size=2, browsers=1) as pool:
+            assert await pool.render("<p>a</p>") == b"PDF:<p>a</p>"
+            await pool.render("<p>b</p>")
+        assert len(playwright.browsers) == 1
+        assert playwright.browsers[0].contexts == 2
+        assert playwright.stopped
+
+    asyncio.run(scenario())
+
+
+def test_page_gets_a_fresh_context_after_its_render_limit(playwright):
+    async def scenario():
+        async with BrowserPool(size=1, max_renders_per_page=2) as pool:
+            for _ in range(3):
+                await pool.render("<p>x</p>")
+        assert playwright.browsers[0].contexts == 2
+
+    asyncio.run(scenario())
+
+
+def test_crashed_browser_is_relaunched(playwright):
+    async def scenario():
+        async with BrowserPool(size=1) as pool:
+            playwright.browsers[0].connected = False
+            await pool.render("<p>x</p>")
+        assert len(playwright.browsers) == 2
+
+    asyncio.run(scenario())
+
+
+def test_close_wakes_renders_waiting_for_a_page(playwright):
+    async def scenario():
+        pool = BrowserPool(size=1)
+        await pool.start()
+        playwright.render_gate.clear()
+        busy = asyncio.create_task(pool.render("<p>busy</p>"))
+        waiting = [asyncio.create_task(pool.render("<p>waiting</p>")) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        await pool.close()
+        for task in waiting:
+            with pytest.raises(RuntimeError, match="shut down"):
+                await asyncio.wait_for(task, 1)
+        # The render in progress fails with its browser
+        playwright.render_gate.set()
+        with pytest.raises(RuntimeError, match="closed"):
+            await busy
+        with pytest.raises(RuntimeError, match="closed"):
+            await pool.render("<p>late</p>")
+
+    asyncio.run(scenario())
+
+
+class FakePool:
+    """Records renders and fails the ones whose HTML says so."""
+
+    size = 2
+
+    def __init__(self):
+        self.rendered: list[str] = []
+
+    async def render(self, html_content, output_path=None):
+        await asyncio.sleep(0)
+        if "fail" in html_content:
+            raise RuntimeError("render failed")
+        self.rendered.append(output_path)
+
+
+def test_batch_keeps_input_order_and_records_failures():
+    pool = FakePool()
+    items = [("<p>a</p>", "a.pdf"), ("<p>fail</p>", "b.pdf"), "not a pair", ("<p>c</p>", "c.pdf")]
+    results = asyncio.run(html_to_pdf_batch(iter(items), pool=pool))
+
+    assert [(r.output_path, r.success) for r in results] == [
+        ("a.pdf", True), ("b.pdf", False), ("", False), ("c.pdf", True),
+    ]
+    assert results[1].error == "render failed"
+    assert sorted(pool.rendered) == ["a.pdf", "c.pdf"]
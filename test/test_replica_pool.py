@@ -0,0 +1,250 @@
+import asyncio
+
+import pytest
+
+from src.backend.replica_pool import Replica, ReplicaPool
+
+
+class FakeSession:
+    """Stands in for the ClientSession of one replica process."""
+
+    def __init__(self, index: int, generation: int):
+        self.index = index
+        self.generation = generation
+        self.calls: list[str] = []
+        self.release = asyncio.Event()
+        self.release.set()
+        self.healthy = True
+        self.closed = False
+
+    async def call_tool(self, name, arguments=None):
+        self.calls.append(name)
+        await self.release.wait()
+        return f"{name} from replica {self.index}"
+
+    async def list_tools(self):
+        return ["quote"]
+
+    async def send_ping(self):
+        if not self.healthy:
+            raise ConnectionError("no answer")
+
+
+class FakeConnector:
+    """Connects fake replicas and remembers each replica's on_lost callback."""
+
+    def __init__(self, fail_first: int = 0):
+        self.sessions: dict[int, FakeSession] = {}
+        self.on_lost = {}
+        self.connects: list[int] = []
+        self.fail_first = fail_first
+
+    async def __call__(self, index, on_lost):
+        self.connects.append(index)
+        if self.fail_first:
+            self.fail_first -= 1
+            raise OSError("spawn failed")
+        generation = self.connects.count(index)
+        session = FakeSession(index, generation)
+        self.sessions[index] = session
+        self.on_lost[index] = on_lost
+
+        async def close():
+            session.closed = True
+
+        return Replica(index=index, session=session, close=close)
+
+
+def make_pool(connector, size=3, **kwargs) -> ReplicaPool:
+    kwargs.setdefault("health_check_interval", 0)
+    kwargs.setdefault("restart_backoff", 0.01)
+    return ReplicaPool("quotes", size, connector, **kwargs)
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not reached")
+        await asyncio.sleep(0.005)
+
+
+def test_concurrent_calls_go_to_the_least_loaded_replica():
+    async def scenario():
+        connector = FakeConnector()
+        pool = make_pool(connector)
+        await pool.start()
+        assert pool.live == 3
+        for session in connector.sessions.values():
+            session.release.clear()
+
+        calls = [asyncio.create_task(pool.call_tool("quote")) for _ in range(3)]
+        await asyncio.sleep(0)
+        # Every replica is busy with exactly one call
+        assert pool.outstanding() == {0: 1, 1: 1, 2: 1}
+
+        # Once replica 1 is done, it is the only least loaded one
+        connector.sessions[1].release.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert pool.outstanding() == {0: 1, 1: 0, 2: 1}
+        assert await pool.call_tool("quote") == "quote from replica 1"
+
+        for session in connector.sessions.values():
+            session.release.set()
+        await asyncio.gather(*calls)
+        assert pool.outstanding() == {0: 0, 1: 0, 2: 0}
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_idle_replicas_share_calls_in_turn():
+    async def scenario():
+        connector = FakeConnector()
+        pool = make_pool(connector)
+        await pool.start()
+        for _ in range(6):
+            await pool.call_tool("quote")
+        assert [len(connector.sessions[i].calls) for i in range(3)] == [2, 2, 2]
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_lost_replica_is_restarted():
+    async def scenario():
+        connector = FakeConnector()
+        pool = make_pool(connector)
+        await pool.start()
+        lost = connector.sessions[1]
+
+        connector.on_lost[1](lost)
+        assert pool.live == 2
+        # Calls keep going to the remaining replicas meanwhile
+        assert await pool.call_tool("quote") != "quote from replica 1"
+
+        await wait_for(lambda: pool.live == 3)
+        assert connector.sessions[1] is not lost
+        assert connector.sessions[1].generation == 2
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_stale_loss_notification_is_ignored():
+    async def scenario():
+        connector = FakeConnector()
+        pool = make_pool(connector)
+        await pool.start()
+        # A notification for a session the pool no longer uses changes nothing
+        connector.on_lost[0](FakeSession(0, 99))
+        assert pool.live == 3
+        assert connector.connects == [0, 1, 2]
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_replica_failing_its_health_check_is_replaced():
+    async def scenario():
+        connector = FakeConnector()
+        pool = make_pool(connector, size=2, health_check_interval=0.01, health_check_timeout=0.1)
+        await pool.start()
+        unhealthy = connector.sessions[0]
+        unhealthy.healthy = False
+
+        await wait_for(lambda: connector.sessions[0] is not unhealthy and pool.live == 2)
+        assert unhealthy.closed
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_replicas_failing_to_start_are_retried():
+    async def scenario():
+        connector = FakeConnector(fail_first=1)
+        pool = make_pool(connector)
+        await pool.start()
+        assert pool.live == 2
+
+        await wait_for(lambda: pool.live == 3)
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_start_fails_when_no_replica_starts():
+    async def scenario():
+        pool = make_pool(FakeConnector(fail_first=3))
+        with pytest.raises(OSError):
+            await pool.start()
+
+    asyncio.run(scenario())
+
+
+def test_calls_wait_for_a_restarting_replica():
+    async def scenario():
+        connector = FakeConnector()
+        pool = make_pool(connector, size=1)
+        await pool.start()
+        connector.on_lost[0](connector.sessions[0])
+        assert pool.live == 0
+
+        assert await pool.call_tool("quote") == "quote from replica 0"
+        assert connector.sessions[0].generation == 2
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_closes_every_replica_and_refuses_calls():
+    async def scenario():
+        connector = FakeConnector()
+        pool = make_pool(connector)
+        await pool.start()
+        await pool.close()
+        assert all(session.closed for session in connector.sessions.values())
+        with pytest.raises(RuntimeError, match="closed"):
+            await pool.call_tool("quote")
+
+    asyncio.run(scenario())
+
+
+def test_waiting_call_keeps_waiting_if_its_replica_is_gone_again():
+    async def scenario():
+        connector = FakeConnector()
+        pool = make_pool(connector, size=1, restart_backoff=0.05)
+        await pool.start()
+        connector.on_lost[0](connector.sessions[0])
+
+        call = asyncio.create_task(pool.call_tool("quote"))
+        for _ in range(5):
+            await asyncio.sleep(0)
+        # A wake-up whose replica was lost again before the call resumed
+        pool._available.set()
+        pool._available.clear()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert not call.done()
+
+        assert await call == "quote from replica 0"
+        await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_wakes_calls_waiting_for_a_replica():
+    async def scenario():
+        connector = FakeConnector()
+        pool = make_pool(connector, size=1, restart_backoff=10)
+        await pool.start()
+        connector.on_lost[0](connector.sessions[0])
+
+        call = asyncio.create_task(pool.call_tool("quote"))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(pool.close(), 1)
+        with pytest.raises(RuntimeError, match="closed"):
+            await asyncio.wait_for(call, 1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,112 @@
+import pytest
+
+from src.backend.result_store import ResultStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(directory=str(tmp_path / "results"), preview_bytes=64, page_bytes=100)
+    yield store
+    store.close()
+
+
+def read_all(store: ResultStore, handle: str) -> str:
+    """Page through a stored result from its start."""
+    pages = []
+    offset = 0
+    while True:
+        page = store.read(handle, offset)
+        pages.append(page["result"])
+        if "next_offset" not in page:
+            return "".join(pages)
+        assert page["next_offset"] > offset
+        offset = page["next_offset"]
+
+
+def test_spill_joins_chunks_with_newlines(store):
+    stored = store.spill("history", ["a", "b", "c"])
+    assert stored.path.read_text(encoding="utf-8") == "a\nb\nc"
+    assert stored.size == 5
+    assert stored.lines == 3
+
+
+def test_preview_truncates_and_points_to_the_rest(store):
+    lines = [f"row {i:03d}" for i in range(50)]
+    stored = store.spill("history", lines)
+    preview = store.preview(stored, limit_bytes=1000)
+
+    assert preview["truncated"]
+    assert preview["result_handle"] == stored.handle
+    assert preview["total_bytes"] == stored.size
+    assert preview["total_lines"] == 50
+    assert len(preview["result"].encode("utf-8")) <= 64
+    # The preview ends on a line break and the rest starts at next_offset
+    assert preview["result"].endswith("\n")
+    assert preview["next_offset"] == len(preview["result"].encode("utf-8"))
+
+
+def test_pages_read_back_the_whole_result(store):
+    lines = [f"row {i:03d}: " + "x" * (i % 17) for i in range(200)]
+    stored = store.spill("history", lines)
+    assert read_all(store, stored.handle) == "\n".join(lines)
+
+
+def test_page_size_is_capped(store):
+    stored = store.spill("history", ["y" * 1000])
+    page = store.read(stored.handle, 0, max_bytes=10_000)
+    assert len(page["result"]) == 100
+    assert page["next_offset"] == 100
+
+
+def test_pages_do_not_split_multibyte_characters(store):
+    # The leading ASCII byte puts the page limits inside two-byte characters
+    text = "a" + "é" * 300
+    stored = store.spill("history", [text])
+    pages = []
+    offset = 0
+    while offset is not None:
+        page = store.read(stored.handle, offset)
+        pages.append(page["result"])
+        offset = page.get("next_offset")
+    assert all("�" not in page for page in pages)
+    assert "".join(pages) == text
+
+
+def test_offset_past_the_end_returns_nothing(store):
+    stored = store.spill("history", ["short"])
+    page = store.read(stored.handle, 10_000)
+    assert page["result"] == ""
+    assert "next_offset" not in page
+
+
+def test_unknown_handle_is_an_error(store):
+    assert "error" in store.read("res_missing")
+
+
+def test_oldest_results_are_evicted(tmp_path):
+    store = ResultStore(directory=str(tmp_path), max_results=2)
+    first = store.spill("a", ["1"])
+    second = store.spill("b", ["2"])
+    third = store.spill("c", ["3"])
+
+    assert "error" in store.read(first.handle)
+    assert not first.path.exists()
+    assert store.read(second.handle)["result"] == "2"
+    assert store.read(third.handle)["result"] == "3"
+    store.close()
+
+
+def test_results_expire_after_ttl(tmp_path):
+    store = ResultStore(directory=str(tmp_path), ttl_seconds=0)
+    stored = store.spill("a", ["1"])
+    stored.created_at -= 1
+    assert "error" in store.read(stored.handle)
+    store.close()
+
+
+def test_close_removes_an_owned_directory():
+    store = ResultStore()
+    stored = store.spill("a", ["1"])
+    store.close()
+    assert not stored.path.exists()
+    assert not store.directory.exists()
@@ -0,0 +1,44 @@
+import pytest
+
+pytest.importorskip("google.genai")
+
+from sections import clean_fragment, report_title, split_sections
+
+
+def test_blocks_are_grouped_into_sections():
+    sections = split_sections(["a", "b", "c", "d", "e"], [], blocks_per_section=2)
+    assert [section.text_blocks for section in sections] == [["a", "b"], ["c", "d"], ["e"]]
+    assert [section.user_data["section"] for section in sections] == [
+        {"index": 0, "total": 3, "is_first": True},
+        {"index": 1, "total": 3, "is_first": False},
+        {"index": 2, "total": 3, "is_first": False},
+    ]
+
+
+def test_images_go_to_the_section_holding_their_text_block():
+    chart = {"data": "chart", "section": 3}
+    sections = split_sections(["a", "b", "c", "d"], [chart], blocks_per_section=2)
+    assert sections[1].images == [chart]
+    assert sections[0].images == []
+
+
+def test_images_without_a_valid_index_are_spread_in_order():
+    images = [{"data": "one"}, {"data": "two", "section": 9}, "three"]
+    sections = split_sections(["a", "b", "c"], images, blocks_per_section=1)
+    assert [section.images for section in sections] == [[images[0]], [images[1]], [images[2]]]
+
+
+def test_empty_input_is_one_section():
+    sections = split_sections([], ["image"])
+    assert len(sections) == 1
+    assert sections[0].images == ["image"]
+
+
+def test_clean_fragment_keeps_only_the_body():
+    raw = "```html\n<!DOCTYPE html><html><head><style>p{}</style></head><body><p>Hi</p><script>x()</script></body></html>\n```"
+    assert clean_fragment(raw) == "<p>Hi</p>"
+
+
+def test_report_title_is_the_first_line():
+    assert report_title(["AAPL daily\nmore"]) == "AAPL daily"
+    assert report_title([]) == "Stock Performance Report"
@@ -0,0 +1,78 @@
+from src.backend.formatting.template_formatter import TemplateFormatter, find_ticker
+
+
+def render(text_blocks, images=()):
+    return TemplateFormatter().render(text_blocks, list(images))
+
+
+def test_first_block_becomes_the_hero_header():
+    html = render(["Apple Inc. (NASDAQ: AAPL)\nClosed higher on strong volume."])
+    assert '<h1 class="ticker">AAPL</h1>' in html
+    assert '<p class="subtitle">Apple Inc. (NASDAQ: AAPL)</p>' in html
+    assert "<title>Apple Inc. (NASDAQ: AAPL)</title>" in html
+    assert "<p>Closed higher on strong volume.</p>" in html
+
+
+def test_numeric_rows_render_as_a_table_with_trend_classes():
+    html = render(["# AAPL", "Prices\nDay | Close | Change\nMon | 189.20 | +1.2%\nTue | 187.90 | -0.7%"])
+    assert '<table class="data-table">' in html
+    assert "<th>Close</th>" in html
+    assert '<td class="num up">+1.2%</td>' in html
+    assert '<td class="num down">-0.7%</td>' in html
+
+
+def test_key_value_lines_render_as_a_metric_table():
+    html = render(["# AAPL", "P/E: 28.4\nDividend yield: 0.5%"])
+    assert "<th>Metric</th><th>Value</th>" in html
+    assert '<td class="num">28.4</td>' in html
+
+
+def test_summary_heading_becomes_a_callout_and_risk_sections_are_tinted():
+    html = render(["# AAPL", "Executive Summary\nShares rose.", "Risks\nSupply chain pressure."])
+    assert '<div class="callout"><h2>Executive Summary</h2>' in html
+    assert '<section class="report-section tint-risk"><h2>Risks</h2>' in html
+
+
+def test_text_is_escaped():
+    html = render(["# AAPL", "Note\n<script>alert(1)</script>"])
+    assert "<script>alert" not in html
+    assert "&lt;script&gt;" in html
+
+
+def test_images_follow_their_block_or_are_spread_in_order():
+    html = render(
+        ["# AAPL", "Intro\nFirst.", "Prices\nSecond."],
+        [{"data": "https://example.com/end.png"}, {"data": "https://example.com/intro.png", "section": 1}],
+    )
+    intro, prices = html.index("First."), html.index("Second.")
+    assert intro < html.index("intro.png") < prices
+    assert html.index("end.png") > prices
+
+
+def test_bare_base64_images_get_a_data_uri():
+    html = render(["# AAPL"], ["/9j/4AAQ"])
+    assert 'src="data:image/jpeg;base64,/9j/4AAQ"' in html
+
+
+def test_non_string_input_is_skipped():
+    html = render(["# AAPL", 42, None, "Outlook\nSteady."], [{"data": 123}, 7, {"data": "https://example.com/a.png", "caption": 5}])
+    assert "Steady." in html
+    assert html.count("<figure") == 1
+    assert "<figcaption>5</figcaption>" in html
+
+
+def test_find_ticker():
+    assert find_ticker("Shares of $MSFT rose") == "MSFT"
+    assert find_ticker("Ticker: BRK.B") == "BRK.B"
+    assert find_ticker("no symbol here") is None
+
+
+def test_image_section_indexes_the_input_blocks_before_empty_ones_are_dropped():
+    html = render(
+        ["# AAPL", "", "Prices\nFirst.", "Volume\nSecond."],
+        [{"data": "https://example.com/prices.png", "section": 2}, {"data": "https://example.com/top.png", "section": 1}],
+    )
+    prices, volume = html.index("First."), html.index("Second.")
+    assert prices < html.index("prices.png") < volume
+    # An image following a dropped block goes after the last block kept before it
+    assert html.index("top.png") < prices
@@ -0,0 +1,171 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.backend import tool_cache
+from src.backend.tool_cache import ToolResultCache, tool_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(tool_cache.time, "monotonic", fake.monotonic)
+    return fake
+
+
+class CountingTool:
+    def __init__(self, result="price: 100"):
+        self.calls = 0
+        self.result = result
+
+    async def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+def test_key_ignores_argument_order():
+    assert tool_cache_key("quote", {"a": 1, "b": 2}) == tool_cache_key("quote", {"b": 2, "a": 1})
+    assert tool_cache_key("quote", {"a": 1}) != tool_cache_key("history", {"a": 1})
+
+
+def test_result_is_served_from_cache_until_ttl(clock):
+    async def scenario():
+        cache = ToolResultCache()
+        tool = CountingTool()
+
+        assert await cache.get_or_call("quote", {"ticker": "AAPL"}, 60, tool) == ("price: 100", False)
+        clock.now += 59
+        assert await cache.get_or_call("quote", {"ticker": "AAPL"}, 60, tool) == ("price: 100", True)
+        assert tool.calls == 1
+
+        clock.now += 2
+        assert await cache.get_or_call("quote", {"ticker": "AAPL"}, 60, tool) == ("price: 100", False)
+        assert tool.calls == 2
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    asyncio.run(scenario())
+
+
+def test_different_arguments_are_cached_separately(clock):
+    async def scenario():
+        cache = ToolResultCache()
+        tool = CountingTool()
+        await cache.get_or_call("quote", {"ticker": "AAPL"}, 60, tool)
+        await cache.get_or_call("quote", {"ticker": "MSFT"}, 60, tool)
+        assert tool.calls == 2
+        assert len(cache) == 2
+
+    asyncio.run(scenario())
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    async def scenario():
+        cache = ToolResultCache(max_entries=2)
+        tool = CountingTool()
+        await cache.get_or_call("quote", {"ticker": "A"}, 60, tool)
+        await cache.get_or_call("quote", {"ticker": "B"}, 60, tool)
+        # Touch A so B is the least recently used
+        await cache.get_or_call("quote", {"ticker": "A"}, 60, tool)
+        await cache.get_or_call("quote", {"ticker": "C"}, 60, tool)
+        assert tool.calls == 3
+
+        _, cached = await cache.get_or_call("quote", {"ticker": "A"}, 60, tool)
+        assert cached
+        _, cached = await cache.get_or_call("quote", {"ticker": "B"}, 60, tool)
+        assert not cached
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_identical_calls_share_one_request():
+    async def scenario():
+        cache = ToolResultCache()
+        started = asyncio.Event()
+        release = asyncio.Event()
+        calls = 0
+
+        async def slow_tool():
+            nonlocal calls
+            calls += 1
+            started.set()
+            await release.wait()
+            return "result"
+
+        first = asyncio.create_task(cache.get_or_call("quote", {"ticker": "AAPL"}, 60, slow_tool))
+        await started.wait()
+        second = asyncio.create_task(cache.get_or_call("quote", {"ticker": "AAPL"}, 60, slow_tool))
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await first == ("result", False)
+        assert await second == ("result", True)
+        assert calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_shared_call():
+    async def scenario():
+        cache = ToolResultCache()
+        release = asyncio.Event()
+
+        async def slow_tool():
+            await release.wait()
+            return "result"
+
+        first = asyncio.create_task(cache.get_or_call("quote", {}, 60, slow_tool))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_call("quote", {}, 60, slow_tool))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+
+        assert await second == ("result", True)
+
+    asyncio.run(scenario())
+
+
+def test_errors_are_shared_but_not_cached():
+    async def scenario():
+        cache = ToolResultCache()
+        error_result = SimpleNamespace(isError=True)
+        calls = 0
+
+        async def failing_tool():
+            nonlocal calls
+            calls += 1
+            return error_result
+
+        async def raising_tool():
+            raise ValueError("upstream down")
+
+        assert (await cache.get_or_call("quote", {}, 60, failing_tool))[0] is error_result
+        assert (await cache.get_or_call("quote", {}, 60, failing_tool))[0] is error_result
+        assert calls == 2
+
+        with pytest.raises(ValueError):
+            await cache.get_or_call("history", {}, 60, raising_tool)
+        assert len(cache) == 0
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_drops_one_entry(clock):
+    async def scenario():
+        cache = ToolResultCache()
+        tool = CountingTool()
+        await cache.get_or_call("quote", {"ticker": "AAPL"}, 60, tool)
+        cache.invalidate("quote", {"ticker": "AAPL"})
+        _, cached = await cache.get_or_call("quote", {"ticker": "AAPL"}, 60, tool)
+        assert not cached
+
+    asyncio.run(scenario())
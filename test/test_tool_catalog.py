@@ -0,0 +1,60 @@
+import json
+from types import SimpleNamespace
+
+from src.backend.tool_catalog import ToolCatalog, server_fingerprint
+
+TOOLS = [{"name": "quote", "description": "Latest price", "input_schema": {"type": "object"}}]
+
+
+def server(**overrides):
+    config = {"name": "quotes", "command": "python", "args": ["quotes.py"], "env": {}, "transport": "stdio", "url": None}
+    config.update(overrides)
+    return SimpleNamespace(**config)
+
+
+def test_fingerprint_follows_the_launch_configuration():
+    assert server_fingerprint(server()) == server_fingerprint(server())
+    assert server_fingerprint(server()) == server_fingerprint(server(name="renamed"))
+    for change in ({"args": ["other.py"]}, {"env": {"KEY": "1"}}, {"transport": "memory"}, {"url": "http://x"}):
+        assert server_fingerprint(server(**change)) != server_fingerprint(server())
+
+
+def test_tools_survive_a_restart(tmp_path):
+    path = tmp_path / "catalog.json"
+    ToolCatalog(str(path)).put(server(), TOOLS)
+    assert ToolCatalog(str(path)).get(server()) == TOOLS
+
+
+def test_changed_launch_configuration_misses(tmp_path):
+    path = tmp_path / "catalog.json"
+    ToolCatalog(str(path)).put(server(), TOOLS)
+    assert ToolCatalog(str(path)).get(server(args=["quotes.py", "--live"])) is None
+    assert ToolCatalog(str(path)).get(server(name="other")) is None
+
+
+def test_unchanged_tools_are_not_rewritten(tmp_path):
+    path = tmp_path / "catalog.json"
+    catalog = ToolCatalog(str(path))
+    catalog.put(server(), TOOLS)
+    path.write_text("sentinel", encoding="utf-8")
+
+    catalog.put(server(), TOOLS)
+    assert path.read_text(encoding="utf-8") == "sentinel"
+    catalog.put(server(), TOOLS[:0])
+    assert path.read_text(encoding="utf-8") != "sentinel"
+
+
+def test_unreadable_or_old_catalogs_are_ignored(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text("{not json", encoding="utf-8")
+    assert ToolCatalog(str(path)).get(server()) is None
+
+    fingerprint = server_fingerprint(server())
+    path.write_text(json.dumps({"version": 0, "servers": {"quotes": {"fingerprint": fingerprint, "tools": TOOLS}}}), encoding="utf-8")
+    assert ToolCatalog(str(path)).get(server()) is None
+
+
+def test_catalog_file_is_replaced_atomically(tmp_path):
+    path = tmp_path / "nested" / "catalog.json"
+    ToolCatalog(str(path)).put(server(), TOOLS)
+    assert [p.name for p in path.parent.iterdir()] == ["catalog.json"]
@@ -0,0 +1,126 @@
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from google.generativeai import protos
+
+from src.backend import tool_registry
+from src.backend.tool_registry import MAX_SCHEMA_DEPTH, SchemaConverter, ToolRegistry
+
+
+def convert(schema, root=None):
+    return SchemaConverter(root or schema).convert(schema)
+
+
+def tool(name, **properties):
+    return {
+        "name": name,
+        "description": f"{name} tool",
+        "input_schema": {"type": "object", "properties": properties or {"symbol": {"type": "string"}}},
+    }
+
+
+def test_refs_resolve_against_the_root_schema():
+    root = {
+        "type": "object",
+        "properties": {"chart": {"$ref": "#/$defs/Image", "description": "Price chart"}},
+        "$defs": {"Image": {"type": "object", "properties": {"url": {"type": "string"}}, "required": ["url"]}},
+    }
+    chart = convert(root).properties["chart"]
+    assert chart.type_ == protos.Type.OBJECT
+    assert chart.description == "Price chart"
+    assert chart.properties["url"].type_ == protos.Type.STRING
+    assert list(chart.required) == ["url"]
+
+
+def test_unresolvable_refs_become_strings():
+    assert convert({"$ref": "#/$defs/Missing"}).type_ == protos.Type.STRING
+    assert convert({"$ref": "https://example.com/schema.json"}).type_ == protos.Type.STRING
+
+
+def test_recursive_refs_are_cut_off_at_the_depth_bound():
+    root = {"$ref": "#/$defs/Node", "$defs": {"Node": {"type": "object", "properties": {"child": {"$ref": "#/$defs/Node"}}}}}
+    node, depth = convert(root), 0
+    while node.type_ == protos.Type.OBJECT:
+        node, depth = node.properties["child"], depth + 1
+    assert node.type_ == protos.Type.STRING
+    assert depth == MAX_SCHEMA_DEPTH + 1
+
+
+def test_deeply_nested_arrays_are_flattened_to_strings():
+    schema = {"type": "string"}
+    for _ in range(MAX_SCHEMA_DEPTH + 5):
+        schema = {"type": "array", "items": schema}
+    node = convert(schema)
+    for _ in range(MAX_SCHEMA_DEPTH + 1):
+        assert node.type_ == protos.Type.ARRAY
+        node = node.items
+    assert node.type_ == protos.Type.STRING
+
+
+def test_optional_any_of_becomes_a_nullable_type():
+    schema = convert({"anyOf": [{"type": "integer"}, {"type": "null"}], "description": "Limit"})
+    assert schema.type_ == protos.Type.INTEGER
+    assert schema.nullable
+    assert schema.description == "Limit"
+
+
+def test_one_of_takes_the_first_variant():
+    schema = convert({"oneOf": [{"type": "number"}, {"type": "string"}]})
+    assert schema.type_ == protos.Type.NUMBER
+    assert not schema.nullable
+
+
+def test_all_of_merges_its_parts():
+    schema = convert({"allOf": [{"properties": {"symbol": {"type": "string"}}}, {"required": ["symbol", "other"]}]})
+    assert schema.type_ == protos.Type.OBJECT
+    assert list(schema.properties) == ["symbol"]
+    assert list(schema.required) == ["symbol"]
+
+
+def test_type_lists_with_null_are_nullable():
+    schema = convert({"type": ["null", "boolean"]})
+    assert schema.type_ == protos.Type.BOOLEAN
+    assert schema.nullable
+
+
+def test_enums_become_string_enums():
+    schema = convert({"type": "integer", "enum": [1, "two", None]})
+    assert schema.type_ == protos.Type.STRING
+    assert schema.format_ == "enum"
+    assert list(schema.enum) == ["1", "two"]
+
+
+def test_only_supported_formats_are_kept():
+    assert convert({"type": "string", "format": "date-time"}).format_ == "date-time"
+    assert convert({"type": "string", "format": "uri"}).format_ == ""
+
+
+def test_sync_rebuilds_only_changed_tools():
+    registry = ToolRegistry()
+    assert registry.sync({"a": tool("a"), "b": tool("b")}) == 2
+    tools, fingerprint = registry.gemini_tools(), registry.fingerprint
+
+    assert registry.sync({"a": tool("a"), "b": tool("b")}) == 0
+    assert registry.gemini_tools() is tools
+    assert registry.fingerprint == fingerprint
+
+    assert registry.sync({"a": tool("a", limit={"type": "integer"}), "b": tool("b")}) == 1
+    assert registry.fingerprint != fingerprint
+    assert registry.sync({"a": tool("a", limit={"type": "integer"})}) == 1
+    assert [d.name for d in registry.gemini_tools()[0].function_declarations] == ["a"]
+
+    assert registry.sync({}) == 1
+    assert registry.gemini_tools() is None
+
+
+def test_failed_rebuild_drops_the_stale_declaration(monkeypatch):
+    registry = ToolRegistry()
+    registry.sync({"a": tool("a"), "b": tool("b")})
+
+    def build(tool_info):
+        raise ValueError("bad schema")
+
+    monkeypatch.setattr(tool_registry, "build_function_declaration", build)
+    assert registry.sync({"a": tool("a", limit={"type": "integer"}), "b": tool("b")}) == 1
+    assert [d.name for d in registry.gemini_tools()[0].function_declarations] == ["b"]
@@ -0,0 +1,156 @@
+import asyncio
+import json
+
+import pytest
+
+from src.backend.tracing import (
+    InMemoryExporter,
+    JsonLinesExporter,
+    LatencyHistogram,
+    PrometheusExporter,
+    Tracer,
+    current_span,
+    record_usage,
+)
+
+
+@pytest.fixture
+def exporter():
+    return InMemoryExporter()
+
+
+@pytest.fixture
+def tracer(exporter):
+    return Tracer([exporter])
+
+
+def test_nested_spans_share_the_trace(tracer, exporter):
+    with tracer.span("request", mode="single") as outer:
+        with tracer.span("gemini.send") as inner:
+            assert current_span() is inner
+        assert current_span() is outer
+    assert current_span() is None
+
+    inner, outer = exporter.spans
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_id == outer.span_id
+    assert outer.parent_id is None
+    assert outer.attributes == {"mode": "single"}
+    assert outer.duration >= inner.duration >= 0
+
+
+def test_failed_span_records_the_error(tracer, exporter):
+    with pytest.raises(ValueError):
+        with tracer.span("tool.call"):
+            raise ValueError("boom")
+    assert exporter.spans[0].error == "ValueError: boom"
+
+
+def test_concurrent_tasks_get_separate_traces(tracer, exporter):
+    async def request(name):
+        with tracer.span(name):
+            await asyncio.sleep(0)
+            with tracer.span(f"{name}.child"):
+                await asyncio.sleep(0)
+
+    async def scenario():
+        await asyncio.gather(request("a"), request("b"))
+
+    asyncio.run(scenario())
+    by_name = {span.name: span for span in exporter.spans}
+    assert by_name["a.child"].parent_id == by_name["a"].span_id
+    assert by_name["b.child"].parent_id == by_name["b"].span_id
+    assert by_name["a"].trace_id != by_name["b"].trace_id
+
+
+def test_failing_exporter_does_not_break_the_span(exporter):
+    class Broken:
+        def export(self, span):
+            raise OSError("disk full")
+
+    with Tracer([Broken(), exporter]).span("request"):
+        pass
+    assert len(exporter.spans) == 1
+
+
+def test_record_usage_copies_token_counts(tracer, exporter):
+    class Usage:
+        prompt_token_count = 120
+        candidates_token_count = 30
+        cached_content_token_count = 0
+
+    class Response:
+        usage_metadata = Usage()
+
+    with tracer.span("gemini.send") as span:
+        record_usage(span, Response())
+    assert exporter.spans[0].attributes == {"prompt_tokens": 120, "output_tokens": 30}
+
+
+def test_json_lines_are_buffered_until_flushed(tmp_path):
+    path = tmp_path / "traces" / "spans.jsonl"
+    jsonl = JsonLinesExporter(str(path), flush_interval=3600)
+    tracer = Tracer([jsonl])
+    with tracer.span("a"):
+        pass
+    with tracer.span("b"):
+        pass
+    assert path.read_text(encoding="utf-8") == ""
+
+    tracer.close()
+    assert [json.loads(line)["name"] for line in path.read_text(encoding="utf-8").splitlines()] == ["a", "b"]
+
+    # Spans after close reopen the file and append
+    with tracer.span("c"):
+        pass
+    jsonl.close()
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 3
+
+
+def test_json_lines_flush_after_the_interval(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    tracer = Tracer([JsonLinesExporter(str(path), flush_interval=0)])
+    with tracer.span("a"):
+        pass
+    assert json.loads(path.read_text(encoding="utf-8"))["name"] == "a"
+    tracer.close()
+
+
+def test_histogram_quantiles_are_bucket_bounds():
+    histogram = LatencyHistogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+    assert LatencyHistogram().quantile(0.5) == 0.0
+
+
+def test_prometheus_exposition(tracer):
+    prometheus = PrometheusExporter(buckets=(0.1, 1.0), metric_name="stage_seconds")
+    tracer.add_exporter(prometheus)
+    with tracer.span("pdf.render"):
+        pass
+    with pytest.raises(RuntimeError):
+        with tracer.span("pdf.render"):
+            raise RuntimeError("crashed")
+
+    text = prometheus.render()
+    assert "# TYPE stage_seconds histogram" in text
+    assert 'stage_seconds_bucket{stage="pdf.render",status="ok",le="0.1"} 1' in text
+    assert 'stage_seconds_count{stage="pdf.render",status="error"} 1' in text
+
+
+def test_prometheus_close_writes_what_the_interval_held_back(tmp_path):
+    path = tmp_path / "metrics.prom"
+    prometheus = PrometheusExporter(str(path), write_interval=3600)
+    tracer = Tracer([prometheus])
+    with tracer.span("a"):
+        pass
+    # The first span is written right away, later ones wait for the interval
+    with tracer.span("b"):
+        pass
+    assert 'stage="b"' not in path.read_text(encoding="utf-8")
+
+    tracer.close()
+    assert 'stage="b"' in path.read_text(encoding="utf-8")
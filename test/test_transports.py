@@ -0,0 +1,93 @@
+import asyncio
+import os
+import sys
+import textwrap
+
+import pytest
+
+from src.backend import transports
+from src.backend.transports import _server_module_target, _sibling_imports, load_server
+
+
+@pytest.fixture(autouse=True)
+def forget_loaded_servers():
+    yield
+    transports._loaded_servers.clear()
+    transports._server_shutdowns.clear()
+    sys.modules.pop("mcp_server_quotes", None)
+
+
+def write_server(directory, sibling="helper_settings"):
+    """A script-style server importing a sibling module that reads its env at import time."""
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"{sibling}.py").write_text("import os\nLEVEL = os.environ.get('FAKE_SERVER_LEVEL')\n", encoding="utf-8")
+    (directory / "server.py").write_text(textwrap.dedent(f"""
+        from {sibling} import LEVEL
+
+        class LowLevel:
+            def create_initialization_options(self):
+                return {{}}
+
+        class FastMCP:
+            _mcp_server = LowLevel()
+
+        mcp = FastMCP()
+        shutdowns = []
+
+        async def shutdown():
+            shutdowns.append(True)
+    """), encoding="utf-8")
+    return directory / "server.py"
+
+
+def test_server_module_target():
+    assert _server_module_target(["-m", "pkg.server", "--port", "1"]) == ("module", "pkg.server")
+    assert _server_module_target(["-u", "servers/quotes.py"]) == ("path", "servers/quotes.py")
+    with pytest.raises(ValueError, match="memory transport"):
+        _server_module_target(["node", "server.js"])
+
+
+def test_sibling_imports_are_only_visible_while_loading(tmp_path):
+    (tmp_path / "sibling_only_here.py").write_text("VALUE = 1\n", encoding="utf-8")
+    with _sibling_imports(tmp_path.resolve(), keep="main"):
+        import sibling_only_here
+        assert sibling_only_here.VALUE == 1
+    assert str(tmp_path.resolve()) not in sys.path
+    assert "sibling_only_here" not in sys.modules
+
+
+def test_load_server_from_path(tmp_path):
+    path = write_server(tmp_path / "quotes")
+    server = load_server("quotes", ["python", str(path)], {})
+    assert hasattr(server, "create_initialization_options")
+    # Loaded once; replicas and reconnects reuse it
+    assert load_server("quotes", ["python", str(path)], {}) is server
+    assert "helper_settings" not in sys.modules
+    assert str(path) in transports._server_shutdowns
+
+
+def test_load_server_env_applies_only_while_loading(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_SERVER_LEVEL", "client")
+    path = write_server(tmp_path / "quotes")
+    load_server("quotes", ["python", str(path)], {"FAKE_SERVER_LEVEL": "server", "FAKE_SERVER_ONLY": "1"})
+
+    assert sys.modules["mcp_server_quotes"].LEVEL == "server"
+    assert os.environ["FAKE_SERVER_LEVEL"] == "client"
+    assert "FAKE_SERVER_ONLY" not in os.environ
+
+
+def test_load_server_without_fastmcp_fails(tmp_path):
+    path = tmp_path / "plain.py"
+    path.write_text("VALUE = 1\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="No FastMCP server"):
+        load_server("plain", ["python", str(path)], {})
+
+
+def test_shutdown_runs_the_hooks_of_loaded_servers(tmp_path):
+    path = write_server(tmp_path / "quotes")
+    load_server("quotes", ["python", str(path)], {})
+    module = sys.modules["mcp_server_quotes"]
+
+    asyncio.run(transports.shutdown_loaded_servers())
+    assert module.shutdowns == [True]
+    assert transports._loaded_servers == {}